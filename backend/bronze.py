@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import importlib
+from sqlalchemy import func, select, update
+from backend.models import BronzeBlob, Object
+
+# Content-addressed bronze storage for uploaded files.
+#
+# Each distinct upload, identified by the SHA-256 of its bytes, is converted once into a
+# Parquet blob under BLOB_DIR. An object's data_path is a hard link to its blob (a copy
+# where the filesystem cannot link), so uploading the same file again skips the conversion
+# and takes no extra space, while every object keeps a path (and silver table) of its own.
+# bronze_blobs.ref_count counts the objects linked to a blob; the blob is removed together
+# with its last reference, and collect_garbage() repairs counts and removes leftovers.
+
+BLOB_DIR = os.getenv('ODP_BRONZE_BLOB_DIR', 'delta-lake/bronze/blobs')
+HASH_CHUNK_SIZE = 1024 * 1024
+# Blob files without a row that are younger than this may belong to a conversion in progress
+ORPHAN_MIN_AGE_SECONDS = int(os.getenv('ODP_BRONZE_ORPHAN_MIN_AGE_SECONDS', 3600))
+
+
+def copy_hashed(source, target=None):
+    """Reads source to the end, copying it to target if given; returns (sha256 hex digest, size)."""
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = source.read(HASH_CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+        if target is not None:
+            target.write(chunk)
+    return digest.hexdigest(), size
+
+
+def blob_path(content_hash):
+    """Where the converted blob of content_hash is stored; its directory is created."""
+    directory = os.path.join(BLOB_DIR, content_hash[:2])
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, content_hash + '.parquet')
+
+
+def new_blob(content_hash, size, profiles, row_count):
+    """A BronzeBlob for a file just converted to blob_path(content_hash), for link_blob()."""
+    return BronzeBlob(
+        content_hash=content_hash,
+        data_path=blob_path(content_hash),
+        size_bytes=size,
+        row_count=row_count,
+        profiles=json.dumps(profiles, default=str)
+    )
+
+
+def find_blob(session, content_hash):
+    """Returns the stored blob of content_hash, or None if it has to be converted."""
+    blob = session.get(BronzeBlob, content_hash)
+    if blob is None or not os.path.exists(blob.data_path):
+        return None
+    return blob
+
+
+def _link_file(source, path):
+    if os.path.exists(path):
+        if os.path.samefile(source, path):
+            return path
+        # The name is taken by other content (e.g. a changed file uploaded again the same day)
+        root, ext = os.path.splitext(path)
+        path = f"{root}-{os.path.basename(source)[:12]}{ext}"
+        if os.path.exists(path) and os.path.samefile(source, path):
+            return path
+    tmp_path = path + '.tmp'
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _add_reference(session, values):
+    # Insert the blob row with one reference, or count one more reference on the existing row
+    table = BronzeBlob.__table__
+    dialect = session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = importlib.import_module(f'sqlalchemy.dialects.{dialect}').insert
+        session.execute(insert(table).values(ref_count=1, **values).on_conflict_do_update(
+            index_elements=[table.c.content_hash],
+            set_={'ref_count': table.c.ref_count + 1, 'data_path': values['data_path']}
+        ))
+    elif session.execute(
+        update(table).where(table.c.content_hash == values['content_hash']).values(ref_count=table.c.ref_count + 1)
+    ).rowcount == 0:
+        session.execute(table.insert().values(ref_count=1, **values))
+
+
+def link_blob(session, blob, path):
+    """Makes path refer to the blob's Parquet file and counts the reference.
+
+    Returns the path actually used, which gets a suffix when path already holds other content.
+    The caller stores it as the object's data_path (with content_hash) in the same transaction.
+    """
+    path = _link_file(blob.data_path, path)
+    _add_reference(session, {
+        'content_hash': blob.content_hash,
+        'data_path': blob.data_path,
+        'size_bytes': blob.size_bytes,
+        'row_count': blob.row_count,
+        'profiles': blob.profiles
+    })
+    if not os.path.exists(blob.data_path):
+        # The blob lost its last reference in between; the new link still holds the data
+        _link_file(path, blob.data_path)
+    return path
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def release_blob(session, obj):
+    """Drops obj's reference to a blob, removing the blob row with its last reference.
+
+    Call before deleting obj. Returns the files that are no longer needed: obj's data file
+    unless another object shares it, and the blob's file once unreferenced. The caller
+    removes them with remove_files() after committing, so a failed commit loses no data.
+    """
+    paths = []
+    if obj.data_path:
+        shared = session.query(Object).filter(Object.data_path == obj.data_path, Object.id != obj.id).count()
+        if not shared:
+            paths.append(obj.data_path)
+    if not obj.content_hash:
+        return paths
+    table = BronzeBlob.__table__
+    session.execute(
+        update(table).where(table.c.content_hash == obj.content_hash).values(ref_count=table.c.ref_count - 1)
+    )
+    blob = session.get(BronzeBlob, obj.content_hash, populate_existing=True)
+    if blob is not None and blob.ref_count <= 0:
+        session.delete(blob)
+        paths.append(blob.data_path)
+    return paths
+
+
+def remove_files(paths):
+    for path in paths:
+        _remove(path)
+
+
+def collect_garbage(session, min_age=ORPHAN_MIN_AGE_SECONDS):
+    """Recounts blob references from the objects table, then removes unreferenced blobs and
+    blob files without a row. Returns the number of files removed; commits."""
+    counts = dict(session.execute(
+        select(Object.content_hash, func.count()).where(Object.content_hash.is_not(None)).group_by(Object.content_hash)
+    ).all())
+    removed = 0
+    unreferenced = set()
+    for blob in session.query(BronzeBlob).all():
+        blob.ref_count = counts.get(blob.content_hash, 0)
+        if blob.ref_count == 0:
+            session.delete(blob)
+            unreferenced.add(blob.data_path)
+    session.flush()
+    known = set(session.execute(select(BronzeBlob.content_hash)).scalars())
+    cutoff = time.time() - min_age
+    for root, _, files in os.walk(BLOB_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            if name.split('.', 1)[0] not in known and path not in unreferenced and os.path.getmtime(path) < cutoff:
+                _remove(path)
+                removed += 1
+    session.commit()
+    # Only once the rows are gone for good
+    for path in unreferenced:
+        if os.path.exists(path):
+            _remove(path)
+            removed += 1
+    return removed
+
+
+def blob_stats(session):
+    blobs, references, stored, uploaded = session.execute(select(
+        func.count(), func.coalesce(func.sum(BronzeBlob.ref_count), 0),
+        func.coalesce(func.sum(BronzeBlob.size_bytes), 0),
+        func.coalesce(func.sum(BronzeBlob.size_bytes * BronzeBlob.ref_count), 0)
+    )).one()
+    return {
+        "blobs": blobs,
+        "references": references,
+        "conversionsSaved": references - blobs,
+        "uploadBytes": uploaded,
+        "uniqueUploadBytes": stored
+    }
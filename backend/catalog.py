@@ -0,0 +1,367 @@
+import json
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+# Built-in steps: typed operations stored as step_type + JSON step_params on TransformationStep
+# instead of free-form pandas code. Consecutive built-in steps compile into a Plan of stages.
+# Row-local steps (filter, select, rename, cast, fill_null, derive) fold into one filter
+# expression and one column -> expression projection, evaluated by a single Arrow scan (with
+# row-group skipping when it reads a Parquet file directly). dedupe and promote_header need the
+# whole table and end a stage.
+#
+#   filter          {"column": "Country", "op": "==", "value": "Norway"}
+#                   op: == != < <= > >= in, not in (value is a list), is null, not null,
+#                   contains, starts with, ends with. Rows where the condition is missing are
+#                   dropped, except for != and not in, which keep them (as pandas does).
+#   select          {"columns": ["a", "b"]}
+#   rename          {"columns": {"old": "new"}}
+#   cast            {"columns": {"a": "int64", "b": "date32"}, "safe": true}
+#   fill_null       {"columns": {"a": 0, "b": "unknown"}}
+#   derive          {"column": "Full Name", "expression": {"function": "binary_join_element_wise",
+#                    "args": [{"column": "First Name"}, {"column": "Last Name"}, {"value": " "}]}}
+#                   expression: {"column": name}, {"value": literal} or {"function": name of a
+#                   scalar (elementwise) pyarrow.compute function, "args": [...], "options": {...}}
+#   dedupe          {"columns": ["a"]} (optional; all columns by default), keeps the first row
+#   promote_header  {} the first row becomes the column names
+
+
+class CatalogError(ValueError):
+    """Invalid built-in step parameters, or a step that does not fit the data it runs on."""
+
+
+class PlanError(Exception):
+    """Raised when a plan fails; index is the position of the failing step in the plan."""
+
+    def __init__(self, index, error):
+        super().__init__(str(error))
+        self.index = index
+        self.error = error
+
+
+def _require(params, name, kind, optional=False):
+    value = params.get(name)
+    if value is None and optional:
+        return None
+    if not isinstance(value, kind) or (isinstance(value, (list, dict, str)) and not value):
+        raise CatalogError(f"'{name}' must be a non-empty {kind.__name__}")
+    return value
+
+
+def _type(alias):
+    try:
+        return pa.type_for_alias(alias)
+    except (ValueError, TypeError):
+        raise CatalogError(f"Unknown type: {alias}")
+
+
+class _Projection:
+    """Filter and column expressions over the input of a stage, built up one step at a time."""
+
+    def __init__(self, schema):
+        self.columns = {name: pc.field(name) for name in schema.names}
+        # Known output types, used to give filter literals the column's type (None: unknown)
+        self.types = {field.name: field.type for field in schema}
+        self.filter = None
+
+    def column(self, name):
+        if name not in self.columns:
+            raise CatalogError(f"Unknown column: {name}")
+        return self.columns[name]
+
+    def literal(self, value, name):
+        scalar = pa.scalar(value)
+        if self.types.get(name) is not None and scalar.type != self.types[name]:
+            try:
+                return scalar.cast(self.types[name])
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+                pass
+        return scalar
+
+    def run(self, source):
+        if isinstance(source, str):
+            # Reads only what the stage needs from the Parquet file
+            from backend.datasets import scan_table
+            return scan_table(source, self.columns, self.filter)
+        return ds.dataset(source).to_table(columns=self.columns, filter=self.filter)
+
+
+_COMPARISONS = {
+    '==': pc.equal, '!=': pc.not_equal, '<': pc.less, '<=': pc.less_equal, '>': pc.greater, '>=': pc.greater_equal,
+}
+_PATTERNS = {'contains': pc.match_substring, 'starts with': pc.starts_with, 'ends with': pc.ends_with}
+_FILTER_OPS = set(_COMPARISONS) | set(_PATTERNS) | {'in', 'not in', 'is null', 'not null'}
+
+
+def _validate_filter(params):
+    _require(params, 'column', str)
+    op = params.get('op')
+    if op not in _FILTER_OPS:
+        raise CatalogError(f"'op' must be one of {sorted(_FILTER_OPS)}")
+    if op in ('in', 'not in'):
+        _require(params, 'value', list)
+    elif op in _PATTERNS:
+        _require(params, 'value', str)
+    elif op in _COMPARISONS and params.get('value') is None:
+        raise CatalogError("'value' is required")
+
+
+def _fuse_filter(projection, params):
+    name, op, value = params['column'], params['op'], params.get('value')
+    field = projection.column(name)
+    if op in _COMPARISONS:
+        condition = _COMPARISONS[op](field, projection.literal(value, name))
+    elif op in _PATTERNS:
+        condition = _PATTERNS[op](field, pattern=value)
+    elif op in ('in', 'not in'):
+        value_set = pa.array(value)
+        if projection.types.get(name) is not None:
+            try:
+                value_set = value_set.cast(projection.types[name])
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+                pass
+        condition = pc.is_in(field, value_set=value_set)
+    else:
+        condition = pc.is_null(field, nan_is_null=True)
+    if op in ('not in', 'not null'):
+        condition = ~condition
+    condition = pc.coalesce(condition, op in ('!=', 'not in'))
+    projection.filter = condition if projection.filter is None else projection.filter & condition
+
+
+def _validate_columns(params):
+    names = _require(params, 'columns', list)
+    if not all(isinstance(name, str) for name in names) or len(set(names)) != len(names):
+        raise CatalogError("'columns' must be distinct column names")
+
+
+def _fuse_select(projection, params):
+    columns = {name: projection.column(name) for name in params['columns']}
+    projection.types = {name: projection.types.get(name) for name in columns}
+    projection.columns = columns
+
+
+def _validate_mapping(params):
+    return _require(params, 'columns', dict)
+
+
+def _validate_rename(params):
+    mapping = _validate_mapping(params)
+    if not all(isinstance(name, str) and name for name in mapping.values()):
+        raise CatalogError("New column names must be non-empty strings")
+
+
+def _fuse_rename(projection, params):
+    mapping = params['columns']
+    for name in mapping:
+        projection.column(name)
+    columns = {mapping.get(name, name): expr for name, expr in projection.columns.items()}
+    if len(columns) != len(projection.columns):
+        raise CatalogError("Renaming would give two columns the same name")
+    projection.columns = columns
+    projection.types = {mapping.get(name, name): t for name, t in projection.types.items()}
+
+
+def _validate_cast(params):
+    for alias in _validate_mapping(params).values():
+        _type(alias)
+
+
+def _fuse_cast(projection, params):
+    safe = params.get('safe', True)
+    for name, alias in params['columns'].items():
+        target = _type(alias)
+        projection.columns[name] = projection.column(name).cast(target, safe=safe)
+        projection.types[name] = target
+
+
+def _fuse_fill_null(projection, params):
+    for name, value in params['columns'].items():
+        projection.columns[name] = pc.coalesce(projection.column(name), projection.literal(value, name))
+
+
+def _validate_expression(expression):
+    if not isinstance(expression, dict):
+        raise CatalogError("An expression is {'column': ...}, {'value': ...} or {'function': ..., 'args': [...]}")
+    if 'column' in expression or 'value' in expression:
+        return
+    name = expression.get('function')
+    try:
+        kind = pc.get_function(name).kind
+    except (pa.ArrowInvalid, pa.ArrowKeyError, TypeError):
+        raise CatalogError(f"Unknown function: {name}")
+    # Only elementwise functions keep derive row-local
+    if kind != 'scalar' or not callable(getattr(pc, name, None)):
+        raise CatalogError(f"{name} is not an elementwise function")
+    if not isinstance(expression.get('args', []), list) or not isinstance(expression.get('options', {}), dict):
+        raise CatalogError("'args' must be a list and 'options' an object")
+    for argument in expression.get('args', []):
+        _validate_expression(argument)
+
+
+def _expression(projection, expression):
+    if 'column' in expression:
+        return projection.column(expression['column'])
+    if 'value' in expression:
+        return pc.scalar(expression['value'])
+    args = [_expression(projection, argument) for argument in expression.get('args', [])]
+    return getattr(pc, expression['function'])(*args, **expression.get('options', {}))
+
+
+def _validate_derive(params):
+    _require(params, 'column', str)
+    _validate_expression(params.get('expression'))
+
+
+def _fuse_derive(projection, params):
+    projection.columns[params['column']] = _expression(projection, params['expression'])
+    projection.types[params['column']] = None
+
+
+def _validate_dedupe(params):
+    if params.get('columns') is not None:
+        _validate_columns(params)
+
+
+def _dedupe(table, params):
+    keys = params.get('columns') or table.column_names
+    missing = [name for name in keys if name not in table.column_names]
+    if missing:
+        raise CatalogError(f"Unknown columns: {missing}")
+    if table.num_rows == 0:
+        return table
+    row = '__row__'
+    indexed = table.select(keys).append_column(row, pa.array(range(table.num_rows), pa.int64()))
+    first = indexed.group_by(keys, use_threads=False).aggregate([(row, 'min')])[f'{row}_min']
+    return table.take(pc.take(first, pc.sort_indices(first)))
+
+
+def _promote_header(table, params):
+    if table.num_rows == 0:
+        raise CatalogError("There is no first row to use as the header")
+    names = []
+    for column in table.columns:
+        value = column[0].as_py()
+        name = '' if value is None else str(value)
+        # Repeated names get a .1, .2, ... suffix, as pandas.read_csv does
+        candidate, n = name, 0
+        while candidate in names:
+            n += 1
+            candidate = f"{name}.{n}"
+        names.append(candidate)
+    return table.slice(1).rename_columns(names)
+
+
+class StepType:
+    def __init__(self, description, row_local, validate, fuse=None, apply=None):
+        self.description = description
+        self.row_local = row_local
+        self.validate = validate
+        self.fuse = fuse  # folds the step into a _Projection
+        self.apply = apply  # runs the step on a whole Arrow table
+
+
+STEP_TYPES = {
+    'filter': StepType("Keep the rows matching a condition", True, _validate_filter, fuse=_fuse_filter),
+    'select': StepType("Keep only the given columns, in that order", True, _validate_columns, fuse=_fuse_select),
+    'rename': StepType("Rename columns", True, _validate_rename, fuse=_fuse_rename),
+    'cast': StepType("Convert columns to other types", True, _validate_cast, fuse=_fuse_cast),
+    'fill_null': StepType("Replace missing values of columns", True, _validate_mapping, fuse=_fuse_fill_null),
+    'derive': StepType("Add or replace a column computed from other columns", True, _validate_derive, fuse=_fuse_derive),
+    'dedupe': StepType("Drop repeated rows, keeping the first", False, _validate_dedupe, apply=_dedupe),
+    'promote_header': StepType("Use the first row as the column names", False, lambda params: None, apply=_promote_header),
+}
+# Steps stored before the catalog existed, recognized by name when they have no command
+LEGACY_STEP_NAMES = {"First Row Promote to Header": "promote_header"}
+
+
+class Step:
+    """A built-in step: a catalog type and its (validated) parameters."""
+
+    def __init__(self, step_type, params=None):
+        if step_type not in STEP_TYPES:
+            raise CatalogError(f"Unknown step type: {step_type}")
+        params = params or {}
+        if not isinstance(params, dict):
+            raise CatalogError("Step parameters must be an object")
+        STEP_TYPES[step_type].validate(params)
+        self.step_type = step_type
+        self.params = params
+        # Stands in for the command text in checkpoint keys and publish digests
+        self.key = 'builtin:' + json.dumps([step_type, params], sort_keys=True, default=str)
+
+    @property
+    def row_local(self):
+        return STEP_TYPES[self.step_type].row_local
+
+    def __repr__(self):
+        return f"Step({self.step_type!r}, {self.params!r})"
+
+
+def step_operation(step):
+    """What a TransformationStep runs: a catalog Step, a pandas command, or None (no-op)."""
+    if step.step_type:
+        return Step(step.step_type, json.loads(step.step_params) if step.step_params else {})
+    if not step.step_command and step.step_name in LEGACY_STEP_NAMES:
+        return Step(LEGACY_STEP_NAMES[step.step_name])
+    return step.step_command
+
+
+def catalog():
+    return {
+        name: {"description": step_type.description, "rowLocal": step_type.row_local}
+        for name, step_type in STEP_TYPES.items()
+    }
+
+
+class Plan:
+    """Consecutive built-in steps compiled into stages.
+
+    Row-local steps are fused into one projection per stage; each dedupe / promote_header
+    step is a stage of its own. A failure in a fused stage is reported for its first step.
+    """
+
+    def __init__(self, steps):
+        self.stages = []  # (index of the first step, _Projection steps or a whole-table Step)
+        for index, step in enumerate(steps):
+            if STEP_TYPES[step.step_type].fuse is None:
+                self.stages.append((index, step))
+            elif self.stages and isinstance(self.stages[-1][1], list):
+                self.stages[-1][1].append((index, step))
+            else:
+                self.stages.append((index, [(index, step)]))
+
+    def execute(self, source):
+        """Runs the plan over an Arrow table, or a Parquet file path, and returns an Arrow table."""
+        data = source
+        for first, stage in self.stages:
+            try:
+                if isinstance(stage, list):
+                    projection = _Projection(_schema(data))
+                    for index, step in stage:
+                        try:
+                            STEP_TYPES[step.step_type].fuse(projection, step.params)
+                        except Exception as e:
+                            raise PlanError(index, e)
+                    data = projection.run(data)
+                else:
+                    data = STEP_TYPES[stage.step_type].apply(_table(data), stage.params)
+            except PlanError:
+                raise
+            except Exception as e:
+                raise PlanError(first, e)
+        return _table(data)
+
+
+def _schema(data):
+    if isinstance(data, str):
+        from backend.datasets import parquet_footer
+        return parquet_footer(data)[0].schema.to_arrow_schema()
+    return data.schema
+
+
+def _table(data):
+    if isinstance(data, str):
+        from backend.datasets import load_table
+        return load_table(data)
+    return data
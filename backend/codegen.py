@@ -0,0 +1,260 @@
+import os
+import re
+import json
+import difflib
+import hashlib
+import threading
+from collections import Counter
+from sqlalchemy import update
+from dotenv import load_dotenv
+from backend.models import StepCode
+
+load_dotenv()
+
+# Which backend translates step descriptions into pandas code: "openai" or "rules"
+CODEGEN_BACKEND = os.getenv('ODP_CODEGEN_BACKEND', 'openai')
+# Cache hits are counted in memory and added to step_code_cache.hits once this many are pending
+HIT_FLUSH_COUNT = int(os.getenv('ODP_CODEGEN_HIT_FLUSH_COUNT', 100))
+
+
+class CodeGenerationError(Exception):
+    """Raised when a step description cannot be translated into code."""
+
+
+class CodeGenerator:
+    """Translates a step description into a single line of pandas code operating on `df`."""
+
+    name = None
+
+    def generate(self, description, columns):
+        # columns is a list of (name, dtype) pairs describing `df`
+        raise NotImplementedError
+
+
+class OpenAICodeGenerator(CodeGenerator):
+    name = 'openai'
+
+    def generate(self, description, columns):
+        import openai
+        openai.api_key = os.getenv("OPENAI_API_KEY")
+        prompt = (
+            f"You are a Python data scientist. "
+            f"Given the following pandas DataFrame 'df', write a single line of pandas code to {description}. "
+            f"The available columns in 'df' are: {[name for name, _ in columns]}. "
+            f"If the user makes a typo or mistake in a column name, use the closest matching column name from the available columns. "
+            f"Do not include any explanations, only the code. "
+            f"Example: df = df[df['column'] == 'value']"
+        )
+        response = openai.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant for pandas data transformations."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=100,
+            temperature=0
+        )
+        return response.choices[0].message.content.strip()
+
+
+_OPERATORS = [
+    ('is not equal to', '!='), ('not equal to', '!='), ('is not', '!='), ('!=', '!='),
+    ('is greater than or equal to', '>='), ('greater than or equal to', '>='), ('>=', '>='),
+    ('is less than or equal to', '<='), ('less than or equal to', '<='), ('<=', '<='),
+    ('is greater than', '>'), ('greater than', '>'), ('above', '>'), ('>', '>'),
+    ('is less than', '<'), ('less than', '<'), ('below', '<'), ('<', '<'),
+    ('contains', 'contains'), ('starts with', 'startswith'), ('ends with', 'endswith'),
+    ('is equal to', '=='), ('equal to', '=='), ('equals', '=='), ('==', '=='), ('=', '=='), ('is', '=='),
+]
+
+
+class RuleBasedCodeGenerator(CodeGenerator):
+    """Deterministic, offline translation of common step descriptions.
+
+    Column names are matched case-insensitively, falling back to the closest name,
+    the same tolerance the LLM prompt asks for.
+    """
+
+    name = 'rules'
+
+    def generate(self, description, columns):
+        self.columns = dict(columns)
+        text = description.strip().rstrip('.')
+        for pattern, handler in self._rules():
+            match = re.fullmatch(pattern, text, re.IGNORECASE)
+            if match:
+                return handler(match)
+        raise CodeGenerationError(f"No rule matches step description: {description!r}")
+
+    def _rules(self):
+        return [
+            (r'show all rows', lambda m: "df = df"),
+            (r'skip the first row and use it as headers?|(?:use|promote) (?:the )?first row (?:as|to) headers?',
+             lambda m: "df = df.iloc[1:].set_axis(df.iloc[0].astype(str).tolist(), axis=1)"),
+            (r'(?:keep|select|show) (?:only )?(?:the )?columns? (.+)',
+             lambda m: f"df = df[{self._column_list(m.group(1))!r}]"),
+            (r'(?:drop|remove|delete) (?:the )?columns? (.+)',
+             lambda m: f"df = df.drop(columns={self._column_list(m.group(1))!r})"),
+            (r'rename (?:the )?(?:column )?(.+?) (?:to|as) (.+)',
+             lambda m: f"df = df.rename(columns={{{self._column(m.group(1))!r}: {self._unquote(m.group(2))!r}}})"),
+            (r'(?:sort|order) (?:rows )?by (.+?)(?: (asc|ascending|desc|descending))?',
+             lambda m: f"df = df.sort_values({self._column(m.group(1))!r}, ascending={not (m.group(2) or '').lower().startswith('desc')})"),
+            (r'(?:remove|drop) duplicate(?: rows|s)?(?: (?:by|on|in) (.+))?',
+             lambda m: "df = df.drop_duplicates()" if not m.group(1)
+             else f"df = df.drop_duplicates(subset={self._column_list(m.group(1))!r})"),
+            (r'(?:remove|drop) rows with (?:missing|null|empty|nan) values?(?: in (.+))?',
+             lambda m: "df = df.dropna()" if not m.group(1)
+             else f"df = df.dropna(subset={self._column_list(m.group(1))!r})"),
+            (r'fill (?:missing|null|empty|nan) values? in (.+?) with (.+)',
+             lambda m: f"df = df.fillna({{{self._column(m.group(1))!r}: {self._value(m.group(1), m.group(2))!r}}})"),
+            (r'(?:show |keep |limit to )?(?:the )?(?:first|top) (\d+) rows',
+             lambda m: f"df = df.head({int(m.group(1))})"),
+            (r'(upper|lower)case (?:the )?(?:column )?(.+)|convert (?:the )?(?:column )?(.+?) to (upper|lower)case',
+             self._change_case),
+            (r'(?:filter|keep|show|select) (?:only )?(?:the )?rows (?:where|with) (.+)',
+             lambda m: self._filter(m.group(1))),
+            (r'(?:remove|drop|exclude|delete) (?:the )?rows (?:where|with) (.+)',
+             lambda m: self._filter(m.group(1), negate=True)),
+        ]
+
+    def _unquote(self, text):
+        return text.strip().strip('\'"`')
+
+    def _column(self, text):
+        name = self._unquote(text)
+        if name in self.columns:
+            return name
+        lowered = {c.lower(): c for c in self.columns}
+        if name.lower() in lowered:
+            return lowered[name.lower()]
+        close = difflib.get_close_matches(name, list(self.columns), n=1, cutoff=0.6)
+        if not close:
+            raise CodeGenerationError(f"Unknown column: {name!r}")
+        return close[0]
+
+    def _column_list(self, text):
+        parts = re.split(r',|\band\b', text)
+        return [self._column(part) for part in parts if part.strip()]
+
+    def _value(self, column, text):
+        value = text.strip()
+        quoted = value[:1] in ('"', "'", '`')
+        value = self._unquote(value)
+        dtype = self.columns.get(self._column(column), 'object')
+        if not quoted and (dtype.startswith('int') or dtype.startswith('float')):
+            try:
+                return int(value) if re.fullmatch(r'-?\d+', value) else float(value)
+            except ValueError:
+                pass
+        return value
+
+    def _change_case(self, m):
+        case, column = (m.group(1), m.group(2)) if m.group(1) else (m.group(4), m.group(3))
+        column = self._column(column)
+        return f"df = df.assign(**{{{column!r}: df[{column!r}].str.{case.lower()}()}})"
+
+    def _filter(self, condition, negate=False):
+        lowered = condition.lower()
+        for phrase, operator in _OPERATORS:
+            index = lowered.find(f' {phrase} ')
+            if index <= 0:
+                continue
+            column = self._column(condition[:index])
+            value = self._value(column, condition[index + len(phrase) + 2:])
+            if operator in ('contains', 'startswith', 'endswith'):
+                if operator == 'contains':
+                    mask = f"df[{column!r}].astype(str).str.contains({str(value)!r}, regex=False)"
+                else:
+                    mask = f"df[{column!r}].astype(str).str.{operator}({str(value)!r})"
+            else:
+                mask = f"df[{column!r}] {operator} {value!r}"
+            return f"df = df[~({mask})]" if negate else f"df = df[{mask}]"
+        raise CodeGenerationError(f"Unsupported filter condition: {condition!r}")
+
+
+GENERATORS = {
+    OpenAICodeGenerator.name: OpenAICodeGenerator,
+    RuleBasedCodeGenerator.name: RuleBasedCodeGenerator,
+}
+
+
+def get_generator(name=None):
+    name = name or CODEGEN_BACKEND
+    if name not in GENERATORS:
+        raise CodeGenerationError(f"Unknown code generator: {name!r}")
+    return GENERATORS[name]()
+
+
+class CodeCacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._pending = Counter()  # cache key -> hits not yet written to the database
+
+    def record(self, hit, key=None):
+        with self._lock:
+            if hit:
+                self.hits += 1
+                if key is not None:
+                    self._pending[key] += 1
+            else:
+                self.misses += 1
+
+    def take_pending(self, min_count=1):
+        """Returns and forgets the unwritten hits per key, if there are at least min_count."""
+        with self._lock:
+            if sum(self._pending.values()) < min_count:
+                return {}
+            pending, self._pending = self._pending, Counter()
+            return pending
+
+
+code_cache_stats = CodeCacheStats()
+
+
+def normalize_description(description):
+    return re.sub(r'\s+', ' ', description.strip().rstrip('.')).lower()
+
+
+def cache_key(generator_name, description, columns):
+    payload = json.dumps([generator_name, normalize_description(description), columns])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def flush_hits(session, min_count=1):
+    """Adds the cache hits counted in memory to step_code_cache.hits. Commits when it writes."""
+    pending = code_cache_stats.take_pending(min_count)
+    if not pending:
+        return
+    for key, count in pending.items():
+        session.execute(update(StepCode).where(StepCode.cache_key == key).values(hits=StepCode.hits + count))
+    session.commit()
+
+
+def generate_step_code(session, description, df, generator=None):
+    """Returns pandas code for a step description over df, served from the persistent cache when possible."""
+    generator = generator or get_generator()
+    columns = [[str(name), str(dtype)] for name, dtype in df.dtypes.items()]
+    key = cache_key(generator.name, description, columns)
+
+    cached = session.get(StepCode, key)
+    if cached is not None:
+        command = cached.step_command
+        code_cache_stats.record(hit=True, key=key)
+        flush_hits(session, HIT_FLUSH_COUNT)
+        return command
+
+    code_cache_stats.record(hit=False)
+    code = generator.generate(description, columns)
+    if not code.startswith("df ="):
+        return code
+    session.merge(StepCode(
+        cache_key=key,
+        generator=generator.name,
+        step_description=description,
+        columns=json.dumps(columns),
+        step_command=code
+    ))
+    session.commit()
+    return code
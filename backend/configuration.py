@@ -1,19 +1,17 @@
 from fastapi import APIRouter, HTTPException, Depends
 from sqlmodel import Session
-from backend.database import get_db_session
+from backend.database import get_session
 from backend.models import Configuration
 
 router = APIRouter()
 
 @router.get('/list')
-def get_configurations():
-    session = get_db_session()
+def get_configurations(session: Session = Depends(get_session)):
     configurations = session.query(Configuration).all()
     return configurations
 
 @router.get('/configuration-detail/{id}')
-def get_configuration_detail(id: int):
-    session = get_db_session()
+def get_configuration_detail(id: int, session: Session = Depends(get_session)):
     configuration = session.query(Configuration).filter(Configuration.id == id).first()
 
     if not configuration:
@@ -22,15 +20,13 @@ def get_configuration_detail(id: int):
     return configuration
 
 @router.post('/add-configuration')
-def add_configuration(configuration: Configuration):
-    session = get_db_session()
+def add_configuration(configuration: Configuration, session: Session = Depends(get_session)):
     session.add(configuration)
     session.commit()
     return {"message": "Configuration added successfully."}
 
 @router.put('/update-configuration/{id}')
-def update_configuration(id: int, updated_configuration: Configuration):
-    session = get_db_session()
+def update_configuration(id: int, updated_configuration: Configuration, session: Session = Depends(get_session)):
     existing_configuration = session.query(Configuration).filter(Configuration.id == id).first()
 
     if not existing_configuration:
@@ -43,8 +39,7 @@ def update_configuration(id: int, updated_configuration: Configuration):
     return existing_configuration
 
 @router.delete('/delete-configuration/{id}')
-def delete_configuration(id: int):
-    session = get_db_session()
+def delete_configuration(id: int, session: Session = Depends(get_session)):
     configuration = session.query(Configuration).filter(Configuration.id == id).first()
 
     if not configuration:
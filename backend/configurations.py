@@ -1,19 +1,17 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from sqlmodel import Session
-from backend.database import get_db_session
+from backend.database import get_session
 from backend.models import Space
+from backend.listing import list_rows
 
 router = APIRouter()
 
 @router.get('/spaces/list')
-def get_spaces():
-    session = get_db_session()
-    spaces = session.query(Space).all()
-    return spaces
+def get_spaces(request: Request, session: Session = Depends(get_session)):
+    return list_rows(request, session, Space)
 
 @router.get('/space-detail/{id}')
-def get_space_detail(id: int):
-    session = get_db_session()
+def get_space_detail(id: int, session: Session = Depends(get_session)):
     space = session.query(Space).filter(Space.id == id).first()
 
     if not space:
@@ -22,15 +20,13 @@ def get_space_detail(id: int):
     return space
 
 @router.post('/add-space')
-def add_space(space: Space):
-    session = get_db_session()
+def add_space(space: Space, session: Session = Depends(get_session)):
     session.add(space)
     session.commit()
     return {"message": "Space added successfully."}
 
 @router.delete('/delete-space/{id}')
-def delete_space(id: int):
-    session = get_db_session()
+def delete_space(id: int, session: Session = Depends(get_session)):
     space = session.query(Space).filter(Space.id == id).first()
 
     if not space:
@@ -0,0 +1,348 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from datetime import date, datetime, timezone
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import sqlalchemy as sa
+from sqlalchemy.engine import URL
+from backend.ingest import ROW_GROUP_SIZE
+from backend.profiling import TableProfiler
+
+# Extraction of tables from registered Systems into bronze Parquet, chosen by System.connector.
+#
+# Rows are read through a server-side (streaming) cursor in chunks of EXTRACT_CHUNK_ROWS and
+# written to Parquet batch by batch, so memory stays bounded by the chunk size. With a
+# watermark column only rows above the last extracted value are read and appended.
+
+EXTRACT_CHUNK_ROWS = int(os.getenv('ODP_EXTRACT_CHUNK_ROWS', 50000))
+CONNECTOR_POOL_SIZE = int(os.getenv('ODP_CONNECTOR_POOL_SIZE', 5))
+# Largest bronze file an incremental sync rewrites to append to (see _append_parquet)
+APPEND_MAX_BYTES = int(os.getenv('ODP_APPEND_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+
+
+class ConnectorError(Exception):
+    """Raised when a system cannot be reached or a table cannot be extracted."""
+
+
+def _arrow_type(column_type):
+    # Column types reflected from the source decide the Parquet schema up front, so every
+    # chunk is written with the same types regardless of which values it happens to hold
+    if isinstance(column_type, sa.Boolean):
+        return pa.bool_()
+    if isinstance(column_type, sa.Integer):
+        return pa.int64()
+    if isinstance(column_type, (sa.Float, sa.Numeric)):
+        return pa.float64()
+    if isinstance(column_type, sa.DateTime):
+        return pa.timestamp('us')
+    if isinstance(column_type, sa.Date):
+        return pa.date32()
+    if isinstance(column_type, sa.LargeBinary):
+        return pa.binary()
+    return pa.string()
+
+
+def _column_array(values, arrow_type):
+    try:
+        return pa.array(values, type=arrow_type, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError):
+        # Loosely typed sources (e.g. SQLite) can hold values that do not match the declared type
+        if arrow_type == pa.string():
+            return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+        return pa.array([None if v is None else str(v) for v in values]).cast(arrow_type, safe=False)
+
+
+def _watermark_value(value, column_type):
+    # Watermarks are stored as JSON; dates come back as ISO strings
+    if isinstance(value, str) and isinstance(column_type, sa.DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(value, str) and isinstance(column_type, sa.Date):
+        return date.fromisoformat(value)
+    return value
+
+
+def encode_watermark(value):
+    return json.dumps(value.isoformat() if isinstance(value, (datetime, date)) else value, default=str)
+
+
+class Connector:
+    """Reads tables of one System through a pooled SQLAlchemy engine."""
+
+    name = None
+
+    def __init__(self, system):
+        self.system = system
+
+    def url(self):
+        raise NotImplementedError
+
+    def engine_options(self):
+        return {'pool_size': CONNECTOR_POOL_SIZE, 'pool_pre_ping': True}
+
+    @property
+    def schema(self):
+        return self.system.db_schema or None
+
+    def engine(self):
+        return _engine(self.url(), self.engine_options())
+
+    def list_tables(self):
+        try:
+            return sorted(sa.inspect(self.engine()).get_table_names(schema=self.schema))
+        except sa.exc.SQLAlchemyError as e:
+            raise ConnectorError(f"Cannot list tables of system {self.system.id}: {e}")
+
+    def reflect(self, connection, table_name):
+        try:
+            return sa.Table(table_name, sa.MetaData(), autoload_with=connection, schema=self.schema)
+        except sa.exc.NoSuchTableError:
+            raise ConnectorError(f"Table not found: {table_name}")
+
+    def extract(self, table_name, parquet_path, watermark_column=None, since=None, chunk_rows=None, on_batch=None):
+        """Streams rows of table_name into a new Parquet file at parquet_path.
+
+        With watermark_column, only rows whose value is greater than since are read, in
+        watermark order. Returns (row_count, highest watermark value or None).
+        """
+        chunk_rows = chunk_rows or EXTRACT_CHUNK_ROWS
+        tmp_path = parquet_path + '.tmp'
+        writer = None
+        row_count = 0
+        watermark = None
+        try:
+            with self.engine().connect() as connection:
+                table = self.reflect(connection, table_name)
+                schema = pa.schema([(column.name, _arrow_type(column.type)) for column in table.columns])
+                query = sa.select(table)
+                if watermark_column:
+                    if watermark_column not in table.c:
+                        raise ConnectorError(f"Unknown watermark column: {watermark_column}")
+                    column = table.c[watermark_column]
+                    if since is not None:
+                        query = query.where(column > sa.literal(_watermark_value(since, column.type), column.type))
+                    query = query.order_by(column)
+                result = connection.execution_options(stream_results=True, max_row_buffer=chunk_rows).execute(query)
+                writer = pq.ParquetWriter(tmp_path, schema)
+                for rows in result.partitions(chunk_rows):
+                    columns = list(zip(*rows))
+                    batch = pa.RecordBatch.from_arrays(
+                        [_column_array(list(values), field.type) for values, field in zip(columns, schema)],
+                        schema=schema
+                    )
+                    if on_batch is not None:
+                        on_batch(batch)
+                    writer.write_batch(batch, row_group_size=ROW_GROUP_SIZE)
+                    row_count += batch.num_rows
+                    if watermark_column:
+                        highest = pc.max(batch.column(watermark_column)).as_py()
+                        if highest is not None and (watermark is None or highest > watermark):
+                            watermark = highest
+            writer.close()
+            writer = None
+            os.replace(tmp_path, parquet_path)
+        except sa.exc.SQLAlchemyError as e:
+            raise ConnectorError(f"Extraction of {table_name} failed: {e}")
+        finally:
+            if writer is not None:
+                writer.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return row_count, watermark
+
+
+class SQLiteConnector(Connector):
+    """SQLite database file; System.url or System.hostname holds its path."""
+
+    name = 'sqlite'
+
+    def url(self):
+        if self.system.url and '://' in self.system.url:
+            return self.system.url
+        return f"sqlite:///{self.system.url or self.system.hostname}"
+
+    def engine_options(self):
+        return {'pool_size': CONNECTOR_POOL_SIZE, 'connect_args': {'check_same_thread': False}}
+
+    @property
+    def schema(self):
+        return None
+
+
+class PostgresConnector(Connector):
+    """PostgreSQL through psycopg2; System.sid is the database and System.db_schema the schema.
+
+    stream_results makes psycopg2 use a named server-side cursor, so chunks are fetched
+    from the server as they are written instead of buffering the whole result.
+    """
+
+    name = 'postgres'
+
+    def url(self):
+        if self.system.url and '://' in self.system.url:
+            return self.system.url
+        return URL.create(
+            'postgresql+psycopg2',
+            username=self.system.username,
+            password=self.system.password,
+            host=self.system.hostname,
+            port=self.system.port,
+            database=self.system.sid
+        ).render_as_string(hide_password=False)
+
+
+CONNECTORS = {
+    'sqlite': SQLiteConnector,
+    'postgres': PostgresConnector,
+    'postgresql': PostgresConnector,
+}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def _engine(url, options):
+    # One pooled engine per source database, shared by every extraction from it
+    with _engines_lock:
+        engine = _engines.get(url)
+        if engine is None:
+            try:
+                engine = _engines[url] = sa.create_engine(url, **options)
+            except (sa.exc.ArgumentError, ImportError) as e:
+                raise ConnectorError(f"Cannot connect to {sa.engine.make_url(url).render_as_string()}: {e}")
+        return engine
+
+
+def get_connector(system):
+    name = (system.connector or '').lower()
+    if name not in CONNECTORS:
+        raise ConnectorError(f"Unknown connector: {system.connector!r}")
+    return CONNECTORS[name](system)
+
+
+def _append_parquet(path, new_path):
+    """Appends the row groups of new_path to the Parquet file at path, one row group at a time.
+
+    A Parquet footer cannot be extended in place, so this rewrites the whole file: each sync
+    costs a pass over everything extracted so far (memory stays at one row group). In return
+    an object stays a single file whose leading row groups never change, which readers and
+    incremental publishing rely on. sync_table refuses to append to files larger than
+    APPEND_MAX_BYTES; those tables need a full sync.
+    """
+    existing = pq.ParquetFile(path)
+    added = pq.ParquetFile(new_path)
+    schema = existing.schema_arrow
+    tmp_path = path + '.tmp'
+    try:
+        with pq.ParquetWriter(tmp_path, schema) as writer:
+            for source in (existing, added):
+                for i in range(source.num_row_groups):
+                    writer.write_table(source.read_row_group(i).cast(schema))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def bronze_file_name(table_name):
+    """File name for a source table: its name reduced to safe characters, plus a digest of the
+    full name so that names which reduce alike (schema.a/b and schema.a_b) stay apart."""
+    slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', table_name).strip('._')[:100] or 'table'
+    digest = hashlib.sha256(table_name.encode('utf-8')).hexdigest()[:12]
+    return f"{slug}-{digest}.parquet"
+
+
+def bronze_table_path(system, table_name):
+    directory = f"delta-lake/bronze/{system.connector.lower()}/{system.id}"
+    path = f"{directory}/{bronze_file_name(table_name)}"
+    if os.path.dirname(os.path.realpath(path)) != os.path.realpath(directory):
+        raise ConnectorError(f"Invalid table name: {table_name!r}")
+    os.makedirs(directory, exist_ok=True)
+    return path
+
+
+def sync_table(session, system, table_name, watermark_column=None, full=False, chunk_rows=None):
+    """Extracts a table of a System into its bronze object, creating the object on first sync.
+
+    Incremental syncs (a watermark column and an earlier watermark) read only newer rows
+    and append them to the object's Parquet file. Returns the SyncState row.
+    """
+    from backend.models import Object, ObjectAttribute, SyncState
+
+    connector = get_connector(system)
+    state = session.query(SyncState).filter(
+        SyncState.system_id == system.id, SyncState.source_table == table_name
+    ).first()
+    if state is None:
+        state = SyncState(system_id=system.id, source_table=table_name)
+        session.add(state)
+    watermark_column = watermark_column or state.watermark_column
+    obj = session.get(Object, state.object_id) if state.object_id else None
+    incremental = (
+        not full and obj is not None and os.path.exists(obj.data_path or '')
+        and watermark_column and watermark_column == state.watermark_column and state.watermark is not None
+    )
+
+    data_path = obj.data_path if obj is not None else bronze_table_path(system, table_name)
+    if incremental and os.path.getsize(data_path) > APPEND_MAX_BYTES:
+        raise ConnectorError(
+            f"{table_name} has outgrown incremental syncs ({os.path.getsize(data_path)} bytes, "
+            f"limit {APPEND_MAX_BYTES}); run a full sync or raise ODP_APPEND_MAX_BYTES"
+        )
+    since = json.loads(state.watermark) if incremental else None
+    target = data_path + '.new' if incremental else data_path
+    profiler = None
+
+    def profile_batch(batch):
+        nonlocal profiler
+        if profiler is None:
+            profiler = TableProfiler(batch.schema)
+        profiler.update(batch)
+
+    try:
+        row_count, watermark = connector.extract(
+            table_name, target, watermark_column, since, chunk_rows,
+            on_batch=None if incremental else profile_batch
+        )
+        if incremental and row_count:
+            _append_parquet(data_path, target)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OSError) as e:
+        raise ConnectorError(f"Cannot write {table_name} to bronze: {e}")
+    finally:
+        if incremental and os.path.exists(target):
+            os.remove(target)
+
+    if obj is None:
+        obj = Object(
+            objectName=table_name,
+            objectCategory="System Table",
+            connector=system.connector,
+            systemId=system.id,
+            dataLayer="Bronze",
+            data_path=data_path
+        )
+        session.add(obj)
+        session.flush()
+        state.object_id = obj.id
+    if not incremental:
+        # A full extraction replaces the column profiles
+        session.query(ObjectAttribute).filter(ObjectAttribute.object_id == obj.id).delete()
+        if profiler is not None:
+            session.execute(sa.insert(ObjectAttribute), [
+                dict(profile, object_id=obj.id, attribute_value="") for profile in profiler.results()
+            ])
+        state.rows_extracted = 0
+    state.watermark_column = watermark_column
+    if watermark is not None:
+        state.watermark = encode_watermark(watermark)
+    elif not incremental:
+        state.watermark = None
+    state.rows_extracted += row_count
+    state.last_rows = row_count
+    state.last_synced_at = datetime.now(timezone.utc)
+    session.commit()
+    session.refresh(state)
+    return state
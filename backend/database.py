@@ -1,19 +1,140 @@
 from sqlmodel import create_engine, SQLModel, Session
+from sqlalchemy import event, inspect, insert, select, text, update
+from sqlalchemy.pool import StaticPool
+from datetime import datetime, timezone
 import os
-from backend.models import ObjectAttribute, ObjectRelation
+import threading
+from backend.models import ObjectAttribute, ObjectRelation, TableVersion
+from backend.metrics import instrument_engine
 
-DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///dna.db').replace('sqlite:///', '')
-engine = create_engine(f'sqlite:///{DATABASE_URL}')
+# A bare file path is treated as a SQLite database; anything else is a SQLAlchemy URL (e.g. postgresql://...)
+DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///dna.db')
+if '://' not in DATABASE_URL:
+    DATABASE_URL = f'sqlite:///{DATABASE_URL}'
 
-# Create a session factory
-SessionLocal = Session(bind=engine)
+# Connection pool settings
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', 5000))
 
-def get_db_session():
-    return SessionLocal
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers run alongside a writer; NORMAL sync is safe under WAL
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f'PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute('PRAGMA cache_size=-65536')
+    cursor.execute('PRAGMA mmap_size=268435456')
+    cursor.close()
 
-def init_db():
-    """Initializes the database schema."""
-    SQLModel.metadata.create_all(engine)
+def _create_engine(url):
+    if url.startswith('sqlite'):
+        if url in ('sqlite://', 'sqlite:///:memory:'):
+            # An in-memory database only exists on a single shared connection
+            return create_engine(url, connect_args={'check_same_thread': False}, poolclass=StaticPool)
+        engine = create_engine(
+            url,
+            connect_args={'check_same_thread': False, 'timeout': DB_BUSY_TIMEOUT_MS / 1000},
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT
+        )
+        event.listen(engine, 'connect', _set_sqlite_pragmas)
+        return engine
+    return create_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=True
+    )
+
+engine = _create_engine(DATABASE_URL)
+instrument_engine(engine)
+
+def get_session():
+    """FastAPI dependency that yields a session scoped to a single request."""
+    with Session(engine) as session:
+        yield session
+
+# Tables written too often for list caching to pay off
+UNVERSIONED_TABLES = {'table_versions', 'jobs', 'step_code_cache', 'login_sessions', 'bronze_blobs', 'publish_states'}
+
+def _insert_version(connection, name, version, now):
+    if connection.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        connection.execute(insert(TableVersion.__table__).values(table_name=name, version=version, updated_at=now))
+        return
+    # Another worker may create the same row first
+    connection.execute(
+        dialect_insert(TableVersion.__table__).values(table_name=name, version=version, updated_at=now)
+        .on_conflict_do_nothing(index_elements=['table_name'])
+    )
+
+def _bump_table_versions(connection, table_names):
+    """Increments the change counter of each table inside the writing transaction."""
+    versions = TableVersion.__table__
+    now = datetime.now(timezone.utc)
+    # Fixed order so concurrent writers take row locks in the same sequence
+    for name in sorted(set(table_names) - UNVERSIONED_TABLES):
+        result = connection.execute(
+            update(versions).where(versions.c.table_name == name).values(version=versions.c.version + 1, updated_at=now)
+        )
+        if result.rowcount == 0:
+            _insert_version(connection, name, 1, now)
 
-# Automatically initialize the database schema on application start
-init_db()
+@event.listens_for(Session, 'after_flush')
+def _track_flushed_tables(session, flush_context):
+    changed = [obj for obj in session.new | session.deleted]
+    changed += [obj for obj in session.dirty if session.is_modified(obj)]
+    table_names = {obj.__table__.name for obj in changed if hasattr(obj, '__table__')}
+    if table_names:
+        _bump_table_versions(session.connection(), table_names)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_bulk_statements(orm_execute_state):
+    # Bulk insert(...)/update(...)/delete(...) statements bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None and hasattr(table, 'name'):
+            _bump_table_versions(orm_execute_state.session.connection(), [table.name])
+
+def _seed_table_versions():
+    versions = TableVersion.__table__
+    with engine.begin() as connection:
+        existing = set(connection.execute(select(versions.c.table_name)).scalars())
+        for table in SQLModel.metadata.sorted_tables:
+            if table.name not in existing and table.name not in UNVERSIONED_TABLES:
+                _insert_version(connection, table.name, 0, datetime.now(timezone.utc))
+
+def _add_missing_columns():
+    # create_all only creates missing tables; add columns introduced since a table was created
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+def init_db():
+    """Initializes the database schema; only the first call in a process does any work."""
+    global _schema_ready
+    with _schema_lock:
+        if _schema_ready:
+            return
+        SQLModel.metadata.create_all(engine)
+        _add_missing_columns()
+        _seed_table_versions()
+        _schema_ready = True
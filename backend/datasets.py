@@ -0,0 +1,209 @@
+import os
+import bisect
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from backend.metrics import dataset_read_bytes, registry
+
+# Memory budget for fully loaded tables shared by previews and publishing
+TABLE_CACHE_BYTES = int(os.getenv('ODP_TABLE_CACHE_BYTES', 1024 * 1024 * 1024))
+
+
+def file_signature(path):
+    """Returns (path, mtime, size) so cached file state is dropped when the file changes."""
+    stat = os.stat(path)
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=256)
+def _parquet_footer(path, mtime_ns, size):
+    # Footer metadata plus the first row index of every row group
+    metadata = pq.read_metadata(path)
+    starts = []
+    total = 0
+    for i in range(metadata.num_row_groups):
+        starts.append(total)
+        total += metadata.row_group(i).num_rows
+    return metadata, starts
+
+
+def parquet_footer(path):
+    return _parquet_footer(*file_signature(path))
+
+
+def parquet_null_counts(path):
+    """Null count per top-level column from footer statistics (None where statistics are missing)."""
+    metadata, _ = parquet_footer(path)
+    counts = {}
+    for i in range(metadata.num_columns):
+        name = metadata.schema.column(i).path
+        total = 0
+        for rg in range(metadata.num_row_groups):
+            stats = metadata.row_group(rg).column(i).statistics
+            if stats is None or not stats.has_null_count:
+                total = None
+                break
+            total += stats.null_count
+        counts[name] = total
+    return counts
+
+
+class TableCache:
+    """In-process LRU cache of Arrow tables bounded by their total size in bytes.
+
+    Tables are immutable, so callers share cached entries and take their own pandas
+    copy when they need to mutate data.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            table = self._entries.get(key)
+            if table is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return table
+
+    def peek(self, key):
+        # Lookup that neither counts towards the stats nor refreshes the LRU position
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key, table):
+        size = table.nbytes
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous.nbytes
+            self._entries[key] = table
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+table_cache = TableCache(TABLE_CACHE_BYTES)
+
+
+@registry.collector
+def _table_cache_metrics():
+    stats = table_cache.stats()
+    return [
+        ('odp_table_cache_bytes', 'gauge', 'Bytes held by the shared table cache.', stats['bytes']),
+        ('odp_table_cache_entries', 'gauge', 'Tables held by the shared table cache.', stats['entries']),
+        ('odp_table_cache_hits_total', 'counter', 'Shared table cache hits.', stats['hits']),
+        ('odp_table_cache_misses_total', 'counter', 'Shared table cache misses.', stats['misses']),
+        ('odp_table_cache_evictions_total', 'counter', 'Shared table cache evictions.', stats['evictions']),
+    ]
+
+
+def _read_table(path):
+    if path.endswith('.parquet'):
+        return pq.read_table(path)
+    # CSV keeps pandas type inference so results match the original loader
+    return pa.Table.from_pandas(pd.read_csv(path), preserve_index=False)
+
+
+def load_table(path):
+    """Loads a whole dataset as an Arrow table through the shared cache."""
+    key = file_signature(path)
+    table = table_cache.get(key)
+    if table is None:
+        table = _read_table(path)
+        dataset_read_bytes.inc('table', amount=table.nbytes)
+        table_cache.put(key, table)
+    return table
+
+
+def scan_table(path, columns=None, filter=None):
+    """Reads only the given columns and matching rows of a Parquet dataset.
+
+    Row groups whose statistics exclude the filter are skipped by the scanner. columns may
+    also map output names to expressions. When the whole file is already cached the filter
+    and projection are applied in memory instead.
+    """
+    cached = table_cache.peek(file_signature(path))
+    if cached is not None:
+        if isinstance(columns, dict):
+            return ds.dataset(cached).to_table(columns=columns, filter=filter)
+        table = cached.filter(filter) if filter is not None else cached
+        return table.select(columns) if columns is not None else table
+    table = ds.dataset(path, format='parquet').to_table(columns=columns, filter=filter)
+    dataset_read_bytes.inc('scan', amount=table.nbytes)
+    return table
+
+
+def load_dataframe(path):
+    """Loads a whole dataset as a fresh pandas DataFrame through the shared cache."""
+    return load_table(path).to_pandas()
+
+
+def read_parquet_page(path, offset, limit, columns=None):
+    """Reads rows [offset, offset + limit) from a Parquet file.
+
+    The row count and row-group boundaries come from the (cached) footer, so only the
+    row groups overlapping the window are decoded, and only for the requested columns.
+    Returns (table, total_rows).
+    """
+    metadata, starts = parquet_footer(path)
+    total_rows = metadata.num_rows
+    if columns:
+        missing = [c for c in columns if c not in metadata.schema.names]
+        if missing:
+            raise ValueError(f"Unknown columns: {missing}")
+
+    # Serve from memory when a preview or publish already loaded the whole file
+    cached = table_cache.peek(file_signature(path))
+    if cached is not None:
+        table = cached.select(columns) if columns else cached
+        return table.slice(offset, limit), total_rows
+    if offset >= total_rows or not starts:
+        schema = metadata.schema.to_arrow_schema()
+        if columns:
+            schema = pa.schema([schema.field(c) for c in columns])
+        return schema.empty_table(), total_rows
+
+    first = bisect.bisect_right(starts, offset) - 1
+    last = bisect.bisect_right(starts, offset + limit - 1) - 1
+    parquet_file = pq.ParquetFile(path, metadata=metadata)
+    table = parquet_file.read_row_groups(list(range(first, last + 1)), columns=columns)
+    dataset_read_bytes.inc('page', amount=table.nbytes)
+    return table.slice(offset - starts[first], limit), total_rows
+
+
+def table_rows(table):
+    """Converts an Arrow table into a list of row lists."""
+    return [list(row) for row in zip(*(column.to_pylist() for column in table.columns))]
@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import uuid
+import base64
+import threading
+from collections import OrderedDict
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from backend.datasets import read_parquet_page
+
+# Minimal Delta-style table format: Parquet data files plus an ordered JSON transaction log.
+#
+#   <table>/_delta_log/00000000000000000000.json   one action per line (commitInfo, metaData, add, remove)
+#   <table>/_delta_log/00000000000000000010.checkpoint.json   full table state every CHECKPOINT_INTERVAL commits
+#   <table>/_delta_log/_last_checkpoint            version of the latest checkpoint
+#
+# A commit is the atomic creation of the next log file, so readers only ever see complete versions.
+
+LOG_DIR = '_delta_log'
+CHECKPOINT_INTERVAL = int(os.getenv('ODP_DELTA_CHECKPOINT_INTERVAL', 10))
+MAX_ROWS_PER_FILE = int(os.getenv('ODP_DELTA_MAX_ROWS_PER_FILE', 1000000))
+COMMIT_RETRIES = 10
+
+
+class DeltaError(Exception):
+    """Raised for invalid table operations."""
+
+
+class ConcurrentCommitError(DeltaError):
+    """Raised when another writer committed the same version first."""
+
+
+def _serialize_schema(schema):
+    return base64.b64encode(schema.serialize().to_pybytes()).decode('ascii')
+
+
+def _deserialize_schema(data):
+    return pa.ipc.read_schema(pa.py_buffer(base64.b64decode(data)))
+
+
+class Snapshot:
+    """Immutable state of a table at one version."""
+
+    def __init__(self, table_path, version, metadata, files):
+        self.table_path = table_path
+        self.version = version
+        self.metadata = metadata
+        self.files = files  # relative path -> add action, in the order the rows were written
+
+    def apply(self, version, actions):
+        metadata = self.metadata
+        files = dict(self.files)
+        for action in actions:
+            if 'metaData' in action:
+                metadata = action['metaData']
+            elif 'add' in action:
+                files[action['add']['path']] = action['add']
+            elif 'remove' in action:
+                files.pop(action['remove']['path'], None)
+        return Snapshot(self.table_path, version, metadata, files)
+
+    @property
+    def schema(self):
+        return _deserialize_schema(self.metadata['schema']) if self.metadata else None
+
+    @property
+    def num_rows(self):
+        return sum(f['numRecords'] for f in self.files.values())
+
+    def file_paths(self):
+        return [os.path.join(self.table_path, path) for path in self.files]
+
+    def to_dataset(self):
+        return ds.dataset(self.file_paths(), schema=self.schema, format='parquet')
+
+    def to_table(self, columns=None, filter=None):
+        if self.version < 0:
+            raise DeltaError(f"Table has no versions: {self.table_path}")
+        return self.to_dataset().to_table(columns=columns, filter=filter)
+
+    def read_page(self, offset, limit):
+        """Reads rows [offset, offset + limit) in to_table() order. The add actions' row counts
+        locate the data files that hold the window, and only those files' overlapping row
+        groups are decoded."""
+        if self.version < 0:
+            raise DeltaError(f"Table has no versions: {self.table_path}")
+        pages = []
+        start = 0
+        for path in self.files:
+            rows = self.files[path]['numRecords']
+            if start + rows > offset and start < offset + limit:
+                first = max(offset - start, 0)
+                page, _ = read_parquet_page(os.path.join(self.table_path, path), first, offset + limit - start - first)
+                pages.append(page)
+            start += rows
+        if not pages:
+            return self.schema.empty_table()
+        return pa.concat_tables(pages).cast(self.schema)
+
+    def to_state(self):
+        return {'version': self.version, 'metaData': self.metadata, 'files': list(self.files.values())}
+
+
+class DeltaTable:
+    def __init__(self, table_path):
+        self.table_path = table_path
+        self.log_path = os.path.join(table_path, LOG_DIR)
+
+    def _commit_file(self, version):
+        return os.path.join(self.log_path, f"{version:020d}.json")
+
+    def _checkpoint_file(self, version):
+        return os.path.join(self.log_path, f"{version:020d}.checkpoint.json")
+
+    def exists(self):
+        return os.path.exists(self._commit_file(0))
+
+    def _read_commit(self, version):
+        with open(self._commit_file(version)) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _read_checkpoint(self, version):
+        try:
+            with open(self._checkpoint_file(version)) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        return Snapshot(self.table_path, state['version'], state['metaData'],
+                        {a['path']: a for a in state['files']})
+
+    def _last_checkpoint(self):
+        try:
+            with open(os.path.join(self.log_path, '_last_checkpoint')) as f:
+                return json.load(f)['version']
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def _replay(self, base, version=None):
+        # Apply commits after base until version (or until the log ends)
+        snapshot = base
+        while version is None or snapshot.version < version:
+            next_version = snapshot.version + 1
+            try:
+                actions = self._read_commit(next_version)
+            except FileNotFoundError:
+                break
+            snapshot = snapshot.apply(next_version, actions)
+        if version is not None and snapshot.version != version:
+            raise DeltaError(f"Version {version} does not exist for {self.table_path}")
+        return snapshot
+
+    def _empty(self):
+        return Snapshot(self.table_path, -1, None, {})
+
+    def snapshot(self, version=None):
+        """Returns the latest snapshot, or the snapshot at a given version."""
+        if version is not None:
+            return _version_cache.get((self.table_path, version), lambda: self._load_version(version))
+        with _latest_lock:
+            cached = _latest_snapshots.get(self.table_path)
+        if cached is None:
+            checkpoint = self._last_checkpoint()
+            cached = self._read_checkpoint(checkpoint) if checkpoint is not None else None
+            cached = cached or self._empty()
+        # Only the commits newer than the cached state are read
+        snapshot = self._replay(cached)
+        with _latest_lock:
+            current = _latest_snapshots.get(self.table_path)
+            if current is None or current.version < snapshot.version:
+                _latest_snapshots[self.table_path] = snapshot
+        return snapshot
+
+    def _load_version(self, version):
+        if version < 0:
+            raise DeltaError(f"Version {version} does not exist for {self.table_path}")
+        checkpoint_version = version - version % CHECKPOINT_INTERVAL
+        base = self._read_checkpoint(checkpoint_version) if checkpoint_version > 0 else None
+        return self._replay(base or self._empty(), version)
+
+    def history(self):
+        snapshot = self.snapshot()
+        entries = []
+        for version in range(snapshot.version, -1, -1):
+            for action in self._read_commit(version):
+                if 'commitInfo' in action:
+                    entries.append(dict(action['commitInfo'], version=version))
+        return entries
+
+    def _write_files(self, table, version):
+        actions = []
+        for i, offset in enumerate(range(0, max(table.num_rows, 1), MAX_ROWS_PER_FILE)):
+            part = table.slice(offset, MAX_ROWS_PER_FILE)
+            relative_path = f"part-{version:05d}-{i:05d}-{uuid.uuid4().hex}.parquet"
+            full_path = os.path.join(self.table_path, relative_path)
+            pq.write_table(part, full_path)
+            actions.append({'add': {
+                'path': relative_path,
+                'size': os.path.getsize(full_path),
+                'numRecords': part.num_rows,
+                'modificationTime': int(time.time() * 1000)
+            }})
+        return actions
+
+    def _try_commit(self, version, actions):
+        os.makedirs(self.log_path, exist_ok=True)
+        tmp_path = os.path.join(self.log_path, f".{version:020d}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, 'w') as f:
+            for action in actions:
+                f.write(json.dumps(action) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            # link() fails if the version already exists, which makes the commit atomic
+            os.link(tmp_path, self._commit_file(version))
+        except FileExistsError:
+            raise ConcurrentCommitError(f"Version {version} was committed concurrently")
+        finally:
+            os.remove(tmp_path)
+
+    def write(self, table, mode='append'):
+        """Writes an Arrow table as a new version; mode is 'append' or 'overwrite'. Returns the version."""
+        if mode not in ('append', 'overwrite'):
+            raise DeltaError(f"Unsupported write mode: {mode}")
+        os.makedirs(self.table_path, exist_ok=True)
+        for _ in range(COMMIT_RETRIES):
+            current = self.snapshot()
+            version = current.version + 1
+            if mode == 'append' and current.metadata and not current.schema.equals(table.schema):
+                raise DeltaError("Schema mismatch: use mode='overwrite' to replace the table schema")
+            actions = [{'commitInfo': {'timestamp': int(time.time() * 1000), 'operation': 'WRITE',
+                                       'mode': mode, 'numRows': table.num_rows}}]
+            if not current.metadata or mode == 'overwrite':
+                actions.append({'metaData': {'schema': _serialize_schema(table.schema),
+                                             'columns': table.schema.names}})
+            if mode == 'overwrite':
+                now = int(time.time() * 1000)
+                actions.extend({'remove': {'path': path, 'deletionTimestamp': now}} for path in current.files)
+            add_actions = self._write_files(table, version)
+            try:
+                self._try_commit(version, actions + add_actions)
+            except ConcurrentCommitError:
+                for action in add_actions:
+                    os.remove(os.path.join(self.table_path, action['add']['path']))
+                continue
+            snapshot = current.apply(version, actions + add_actions)
+            with _latest_lock:
+                _latest_snapshots[self.table_path] = snapshot
+            if version > 0 and version % CHECKPOINT_INTERVAL == 0:
+                self._write_checkpoint(snapshot)
+            return version
+        raise ConcurrentCommitError(f"Gave up committing to {self.table_path} after {COMMIT_RETRIES} attempts")
+
+    def _write_checkpoint(self, snapshot):
+        path = self._checkpoint_file(snapshot.version)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot.to_state(), f)
+        os.replace(tmp_path, path)
+        pointer = os.path.join(self.log_path, '_last_checkpoint')
+        with open(pointer + '.tmp', 'w') as f:
+            json.dump({'version': snapshot.version}, f)
+        os.replace(pointer + '.tmp', pointer)
+
+
+class _VersionCache:
+    # Committed versions never change, so their snapshots can be cached indefinitely (bounded LRU)
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, load):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = load()
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+
+_latest_snapshots = {}
+_latest_lock = threading.Lock()
+_version_cache = _VersionCache(128)
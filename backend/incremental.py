@@ -0,0 +1,105 @@
+import hashlib
+from datetime import datetime, timezone
+from backend.datasets import file_signature, parquet_footer
+from backend.catalog import Step
+from backend.models import PublishState
+from backend.pipeline import command_key, partial_dtypes_known
+from backend.pushdown import is_row_local
+
+# Incremental publish to silver.
+#
+# After every publish, an object's PublishState records the steps that ran, how many bronze rows
+# went into silver (the high-water mark) and a fingerprint of the Parquet row groups that held
+# them. Bronze files only grow by gaining row groups at the end (incremental system syncs), so
+# when the next publish finds the same steps, the same leading row groups and the silver table
+# still at the version it wrote, it runs the steps over the new row groups only and appends the
+# result. Edited steps, a step that is not row-local (pushdown.is_row_local, or a built-in step
+# whose catalog type is not), a rewritten source file or a silver table written by something
+# else fall back to a full rebuild.
+
+CURRENT = 'current'  # silver already holds the result
+APPEND = 'append'  # run the steps over rows [start_row, end) and append them
+FULL = 'full'  # rebuild silver from the whole source
+
+
+class PublishPlan:
+    def __init__(self, action, start_row=0, reason=None):
+        self.action = action
+        self.start_row = start_row
+        self.reason = reason
+
+
+def steps_digest(commands):
+    digest = hashlib.sha256()
+    for command in commands:
+        if command:
+            digest.update(command_key(command).encode('utf-8') + b'\0')
+    return digest.hexdigest()
+
+
+def source_fingerprint(data_path, row_groups=None):
+    """Returns (rows, row groups, digest) for the first row_groups row groups of a Parquet file
+    (all of them by default). Other formats are fingerprinted as a whole by their signature."""
+    if not data_path.endswith('.parquet'):
+        _, mtime_ns, size = file_signature(data_path)
+        return None, None, hashlib.sha256(f"{mtime_ns}:{size}".encode('utf-8')).hexdigest()
+    metadata, _ = parquet_footer(data_path)
+    if row_groups is None:
+        row_groups = metadata.num_row_groups
+    row_groups = min(row_groups, metadata.num_row_groups)
+    digest = hashlib.sha256(repr(metadata.schema.to_arrow_schema()).encode('utf-8'))
+    rows = 0
+    # Row counts and column statistics change whenever the data of a row group does
+    for i in range(row_groups):
+        row_group = metadata.row_group(i)
+        rows += row_group.num_rows
+        digest.update(f"\0{row_group.num_rows}".encode('utf-8'))
+        for c in range(row_group.num_columns):
+            stats = row_group.column(c).statistics
+            if stats is not None and stats.has_min_max:
+                digest.update(repr((stats.min, stats.max, stats.null_count)).encode('utf-8'))
+            else:
+                digest.update(repr(row_group.column(c).total_compressed_size).encode('utf-8'))
+    return rows, row_groups, digest.hexdigest()
+
+
+def plan_publish(state, data_path, commands, silver_version):
+    """Decides how to bring silver (currently at silver_version, -1 if empty) up to date."""
+    if state is None:
+        return PublishPlan(FULL, reason="first publish")
+    if state.silver_version != silver_version:
+        return PublishPlan(FULL, reason="silver table was written by another publish")
+    if state.steps_digest != steps_digest(commands):
+        return PublishPlan(FULL, reason="steps changed")
+    rows, _, fingerprint = source_fingerprint(data_path, state.source_row_groups)
+    if rows != state.source_rows or fingerprint != state.source_fingerprint:
+        return PublishPlan(FULL, reason="source was rewritten")
+    if rows is None or parquet_footer(data_path)[0].num_rows == rows:
+        return PublishPlan(CURRENT)
+    for i, command in enumerate(commands):
+        if not (command.row_local if isinstance(command, Step) else is_row_local(command)):
+            return PublishPlan(FULL, reason=f"step {i + 1} is not row-local")
+    if not partial_dtypes_known(data_path):
+        return PublishPlan(FULL, reason="source has no column statistics")
+    return PublishPlan(APPEND, start_row=rows)
+
+
+def record_publish(session, object_id, data_path, commands, silver_version, fingerprint):
+    """Stores the high-water mark after a publish; fingerprint is source_fingerprint() of the
+    data it read. Commits."""
+    rows, row_groups, digest = fingerprint
+    state = session.get(PublishState, object_id) or PublishState(object_id=object_id)
+    state.steps_digest = steps_digest(commands)
+    state.source_rows = rows if rows is not None else 0
+    state.source_row_groups = row_groups
+    state.source_fingerprint = digest
+    state.silver_version = silver_version
+    state.published_at = datetime.now(timezone.utc)
+    session.add(state)
+    session.commit()
+
+
+def clear_publish(session, object_id):
+    """Forgets the high-water mark, so that the next publish rebuilds silver. Commits."""
+    session.query(PublishState).filter(PublishState.object_id == object_id).delete()
+    session.commit()
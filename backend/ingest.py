@@ -0,0 +1,297 @@
+import os
+import re
+import tarfile
+import zipfile
+import threading
+import multiprocessing
+from backend.bronze import copy_hashed
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+from backend.profiling import TableProfiler
+
+# Streaming CSV -> Parquet conversion settings (overridable through the environment)
+ROW_GROUP_SIZE = int(os.getenv('ODP_INGEST_ROW_GROUP_SIZE', 131072))
+BLOCK_SIZE = int(os.getenv('ODP_INGEST_BLOCK_SIZE', 8 * 1024 * 1024))
+MAX_MEMORY = int(os.getenv('ODP_INGEST_MAX_MEMORY', 512 * 1024 * 1024))
+# Processes converting the files of a batch upload in parallel
+INGEST_WORKERS = int(os.getenv('ODP_INGEST_WORKERS', os.cpu_count() or 1))
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz')
+
+
+class IngestError(Exception):
+    """Raised when an upload cannot be converted to Parquet."""
+
+
+class IngestMemoryError(IngestError):
+    """Raised when a conversion would exceed the configured memory cap."""
+
+
+def unique_names(names):
+    """Renames repeated column names to name.1, name.2, ... the way pandas.read_csv does,
+    skipping suffixed names that the header already contains."""
+    taken = set(names)
+    seen = set()
+    next_suffix = {}
+    result = []
+    for name in names:
+        if name in seen:
+            suffix = next_suffix.get(name, 1)
+            while f"{name}.{suffix}" in taken:
+                suffix += 1
+            next_suffix[name] = suffix + 1
+            name = f"{name}.{suffix}"
+            taken.add(name)
+        seen.add(name)
+        result.append(name)
+    return result
+
+
+class _ConversionFailed(Exception):
+    # A block after the first had a value that does not fit its column's inferred type
+    def __init__(self, names, schema, column, error):
+        super().__init__(str(error))
+        self.names = names
+        self.schema = schema
+        self.column = column
+        self.error = error
+
+
+_FAILED_COLUMN = re.compile(r'In CSV column #(\d+): .*CSV conversion error')
+
+
+def _convert(source, tmp_path, row_group_size, block_size, max_memory, on_batch, names, column_types):
+    writer = None
+    pending = []
+    pending_rows = 0
+    pending_bytes = 0
+    row_count = 0
+
+    def flush():
+        nonlocal pending, pending_rows, pending_bytes
+        if pending:
+            writer.write_table(pa.Table.from_batches(pending), row_group_size=row_group_size)
+        pending, pending_rows, pending_bytes = [], 0, 0
+
+    # Once the header is known it is passed in, so that repeated names can carry their own types
+    read_options = pv.ReadOptions(block_size=block_size, column_names=names, skip_rows=1 if names else 0)
+    reader = pv.open_csv(source, read_options=read_options,
+                         convert_options=pv.ConvertOptions(column_types=column_types))
+    names = unique_names(reader.schema.names)
+    schema = pa.schema([field.with_name(name) for field, name in zip(reader.schema, names)])
+    try:
+        writer = pq.ParquetWriter(tmp_path, schema)
+        while True:
+            try:
+                batch = reader.read_next_batch()
+            except StopIteration:
+                break
+            except pa.ArrowInvalid as e:
+                match = _FAILED_COLUMN.search(str(e))
+                raise _ConversionFailed(names, schema, int(match.group(1)) if match else None, e)
+            batch = pa.RecordBatch.from_arrays(batch.columns, schema=schema)
+            # Counts what this conversion holds (raw block, decoded batch, pending row group),
+            # not the process-wide allocations that concurrent conversions share
+            if block_size + pending_bytes + batch.nbytes > max_memory:
+                raise IngestMemoryError(f"Conversion exceeded the memory cap of {max_memory} bytes.")
+            if on_batch is not None:
+                on_batch(batch)
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            pending_bytes += batch.nbytes
+            row_count += batch.num_rows
+            # Flush a full row group, or earlier if buffered batches approach the cap
+            if pending_rows >= row_group_size or pending_bytes >= max_memory // 2:
+                flush()
+        flush()
+    finally:
+        if writer is not None:
+            writer.close()
+    return names, row_count
+
+
+def _failing_columns(source, schema, block_size):
+    """Names of the columns of schema (as inferred from the first block) that some value of
+    the file does not fit. Reads the file once as text and converts each block of those
+    columns again with the CSV reader's own rules."""
+    names = schema.names
+    candidates = {
+        i: field.type for i, field in enumerate(schema)
+        if not (pa.types.is_string(field.type) or pa.types.is_large_string(field.type))
+    }
+    read_options = pv.ReadOptions(block_size=block_size, column_names=names, skip_rows=1)
+    reader = pv.open_csv(source, read_options=read_options,
+                         convert_options=pv.ConvertOptions(column_types={name: pa.string() for name in names}))
+    failing = set()
+    for batch in reader:
+        for i, arrow_type in list(candidates.items()):
+            text = pa.BufferOutputStream()
+            pv.write_csv(pa.table({'value': batch.column(i)}), text)
+            try:
+                pv.read_csv(pa.BufferReader(text.getvalue()),
+                            convert_options=pv.ConvertOptions(column_types={'value': arrow_type}))
+            except pa.ArrowInvalid:
+                failing.add(names[i])
+                del candidates[i]
+        if not candidates:
+            break
+    return failing
+
+
+def csv_to_parquet(source, parquet_path, row_group_size=None, block_size=None, max_memory=None, on_batch=None):
+    """Converts a CSV file object or path to Parquet one record batch at a time.
+
+    Only one block of raw CSV plus at most one pending row group is held in memory.
+    Column types are inferred from the first block; when a later block has a value that
+    does not fit, one pass over the file finds every such column and the file is read again
+    with those columns as text (file objects must be seekable for this). Repeated header
+    names get pandas-style .1, .2 suffixes.
+    Returns (headers, row_count).
+    """
+    row_group_size = row_group_size or ROW_GROUP_SIZE
+    max_memory = max_memory or MAX_MEMORY
+    # Keep a single raw block well under the cap so decoding has headroom
+    block_size = min(block_size or BLOCK_SIZE, max(max_memory // 4, 1024 * 1024))
+
+    # Unique per writer: identical uploads may be converted to the same blob concurrently
+    tmp_path = f"{parquet_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    start = None if isinstance(source, (str, os.PathLike)) else source.tell()
+    names = None
+    column_types = {}
+    try:
+        while True:
+            try:
+                headers, row_count = _convert(source, tmp_path, row_group_size, block_size, max_memory,
+                                              on_batch, names, column_types)
+                break
+            except _ConversionFailed as e:
+                if e.column is None or e.names[e.column] in column_types \
+                        or (start is not None and not source.seekable()):
+                    raise IngestError(str(e.error))
+                names = e.names
+                if start is not None:
+                    source.seek(start)
+                failing = _failing_columns(source, e.schema, block_size) | {names[e.column]}
+                column_types.update((name, pa.string()) for name in failing)
+                if start is not None:
+                    source.seek(start)
+        os.replace(tmp_path, parquet_path)
+    except IngestError:
+        raise
+    except (pa.ArrowInvalid, pa.ArrowTypeError, UnicodeDecodeError) as e:
+        raise IngestError(str(e))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return headers, row_count
+
+
+def ingest_csv(source, parquet_path):
+    """Converts a CSV to Parquet while profiling its columns; returns (profiles, row_count)."""
+    profiler = None
+
+    def profile_batch(batch):
+        nonlocal profiler
+        # A conversion that is read again with wider types starts a new profile
+        if profiler is None or not profiler.schema.equals(batch.schema):
+            profiler = TableProfiler(batch.schema)
+        profiler.update(batch)
+
+    headers, row_count = csv_to_parquet(source, parquet_path, on_batch=profile_batch)
+    profiles = profiler.results() if profiler else [{"attribute_name": header} for header in headers]
+    return profiles, row_count
+
+
+def is_archive(filename):
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _archive_members(fileobj, filename):
+    # (name, open member) pairs for the regular files of a zip or tar archive
+    if filename.lower().endswith('.zip'):
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    with archive.open(info) as member:
+                        yield info.filename, member
+    else:
+        with tarfile.open(fileobj=fileobj, mode='r:*') as archive:
+            for info in archive:
+                if info.isfile():
+                    with archive.extractfile(info) as member:
+                        yield info.name, member
+
+
+def stage_upload(fileobj, filename, staging_dir):
+    """Copies an uploaded CSV, or the CSVs inside an archive, into staging_dir.
+
+    Returns (name, path, content_hash, size) tuples, hashing each file while it is copied;
+    path and content_hash are None for archive members that are not CSV files. Member paths
+    are flattened to their base name.
+    """
+    if not is_archive(filename):
+        path = os.path.join(staging_dir, f"{len(os.listdir(staging_dir))}-{os.path.basename(filename)}")
+        with open(path, 'wb') as f:
+            content_hash, size = copy_hashed(fileobj, f)
+        return [(os.path.basename(filename), path, content_hash, size)]
+    staged = []
+    try:
+        for member_name, member in _archive_members(fileobj, filename):
+            name = os.path.basename(member_name)
+            if not name or name.startswith('.') or '__MACOSX' in member_name.split('/'):
+                continue
+            if not name.lower().endswith('.csv'):
+                staged.append((name, None, None, 0))
+                continue
+            path = os.path.join(staging_dir, f"{len(os.listdir(staging_dir))}-{name}")
+            with open(path, 'wb') as f:
+                content_hash, size = copy_hashed(member, f)
+            staged.append((name, path, content_hash, size))
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError) as e:
+        raise IngestError(f"Invalid archive: {e}")
+    return staged
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=INGEST_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        _executor = None
+
+
+def convert_batch(items):
+    """Converts (csv_path, parquet_path) pairs on the ingest process pool.
+
+    Returns one (profiles, row_count) tuple or IngestError per item, in order.
+    """
+    executor = _get_executor()
+    futures = [executor.submit(ingest_csv, csv_path, parquet_path) for csv_path, parquet_path in items]
+    results = []
+    for (csv_path, _), future in zip(items, futures):
+        try:
+            results.append(future.result())
+        except IngestError as e:
+            results.append(e)
+        except BrokenProcessPool as e:
+            # A worker died (e.g. out of memory); the remaining files of this batch fail too
+            _reset_executor()
+            results.append(IngestError(f"Conversion worker failed: {e}"))
+        except Exception as e:
+            # Any other error fails this file only
+            results.append(IngestError(f"Cannot convert {os.path.basename(csv_path)}: {e}"))
+    return results
@@ -0,0 +1,178 @@
+from fastapi import APIRouter, HTTPException, Depends
+from sqlmodel import Session
+from backend.database import get_session, engine
+from backend.models import Job
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import multiprocessing
+import threading
+import os
+import uuid
+import json
+
+router = APIRouter()
+
+# Maximum number of jobs running at once; further jobs wait in the queue
+JOB_WORKERS = int(os.getenv('ODP_JOB_WORKERS', 2))
+
+_executor = None
+_executor_lock = threading.Lock()
+_futures = {}
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned workers do not inherit the server's threads or pooled connections
+            _executor = ProcessPoolExecutor(max_workers=JOB_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        _executor = None
+
+
+def _run_publish(session, job, progress):
+    from backend.transformations import publish_object
+    params = json.loads(job.params) if job.params else {}
+    return publish_object(session, job.object_id, progress, **params)
+
+
+JOB_HANDLERS = {
+    "publish-to-silver": _run_publish,
+}
+
+
+def run_job(job_id):
+    """Entry point executed inside a worker process."""
+    from backend.pipeline import PipelineCancelled
+
+    with Session(engine) as session:
+        job = session.get(Job, job_id)
+        if job is None or job.status != "queued":
+            return
+        if job.cancel_requested:
+            job.status = "cancelled"
+            job.finished_at = _now()
+            session.commit()
+            return
+        job.status = "running"
+        job.started_at = _now()
+        session.commit()
+
+        def progress(done, total):
+            # Progress updates double as cancellation checkpoints between steps
+            session.refresh(job)
+            if job.cancel_requested:
+                raise PipelineCancelled()
+            job.progress = done / total if total else 1.0
+            session.commit()
+
+        try:
+            result = JOB_HANDLERS[job.job_type](session, job, progress)
+        except PipelineCancelled:
+            job.status = "cancelled"
+            job.message = "Job cancelled."
+        except Exception as e:
+            session.rollback()
+            job.status = "failed"
+            job.message = str(e)
+        else:
+            job.status = "succeeded" if result.get("status") == "success" else "failed"
+            job.message = result.get("message")
+            if job.status == "succeeded":
+                job.progress = 1.0
+        job.finished_at = _now()
+        session.commit()
+
+
+def _job_done(job_id, future):
+    _futures.pop(job_id, None)
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is None:
+        return
+    # The worker died (e.g. killed or out of memory) before it could record the outcome
+    if error.__class__.__name__ == 'BrokenProcessPool':
+        _reset_executor()
+    with Session(engine) as session:
+        job = session.get(Job, job_id)
+        if job is not None and job.status in ("queued", "running"):
+            job.status = "failed"
+            job.message = f"Job worker failed: {error}"
+            job.finished_at = _now()
+            session.commit()
+
+
+def submit_job(session, job_type, object_id, **params):
+    """Records a job and queues it on the worker pool; returns the Job row."""
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job type: {job_type}")
+    job = Job(id=uuid.uuid4().hex, job_type=job_type, object_id=object_id, params=json.dumps(params) if params else None)
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+
+    future = _get_executor().submit(run_job, job.id)
+    _futures[job.id] = future
+    future.add_done_callback(lambda f, job_id=job.id: _job_done(job_id, f))
+    return job
+
+
+@router.get('/list')
+def get_jobs(object_id: int = None, status: str = None, limit: int = 100, session: Session = Depends(get_session)):
+    query = session.query(Job)
+    if object_id is not None:
+        query = query.filter(Job.object_id == object_id)
+    if status:
+        query = query.filter(Job.status == status)
+    return query.order_by(Job.created_at.desc()).limit(limit).all()
+
+
+@router.get('/{job_id}')
+def get_job(job_id: str, session: Session = Depends(get_session)):
+    job = session.get(Job, job_id)
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job
+
+
+@router.get('/{job_id}/progress')
+def get_job_progress(job_id: str, session: Session = Depends(get_session)):
+    job = session.get(Job, job_id)
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return {"jobId": job.id, "status": job.status, "progress": job.progress, "message": job.message}
+
+
+@router.post('/{job_id}/cancel')
+def cancel_job(job_id: str, session: Session = Depends(get_session)):
+    job = session.get(Job, job_id)
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status not in ("queued", "running"):
+        return {"message": f"Job already {job.status}.", "status": job.status}
+
+    future = _futures.get(job_id)
+    if future is not None and future.cancel():
+        job.status = "cancelled"
+        job.finished_at = _now()
+    else:
+        # Running (or owned by another server process): the worker stops at its next step
+        job.cancel_requested = True
+    session.commit()
+
+    return {"message": "Job cancellation requested.", "status": job.status}
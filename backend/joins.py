@@ -0,0 +1,356 @@
+import os
+import math
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from backend.datasets import file_signature, load_table, parquet_footer, table_cache
+from backend.metrics import dataset_read_bytes
+
+# Hash joins over object files for previewing related objects.
+#
+# The first object is the probe side and is streamed in record batches; every other object
+# is a build side. A build side that fits the memory budget is held as one Arrow table,
+# otherwise it is hash partitioned into Arrow IPC files on disk and each probe batch is
+# joined partition by partition against memory-mapped reads of those files. The key hash of
+# a build table (or partition) is built once and reused by every probe batch.
+
+JOIN_MEMORY_BYTES = int(os.getenv('ODP_JOIN_MEMORY_BYTES', 256 * 1024 * 1024))
+JOIN_BATCH_ROWS = int(os.getenv('ODP_JOIN_BATCH_ROWS', 65536))
+JOIN_SPILL_DIR = os.getenv('ODP_JOIN_SPILL_DIR') or None
+MAX_PARTITIONS = 256
+
+JOIN_TYPES = {'inner': 'inner', 'left': 'left outer'}
+
+
+class JoinError(Exception):
+    """Raised when the requested objects cannot be joined."""
+
+
+def _is_parquet(path):
+    return path.endswith('.parquet')
+
+
+def source_schema(path):
+    if _is_parquet(path):
+        metadata, _ = parquet_footer(path)
+        return metadata.schema.to_arrow_schema()
+    return load_table(path).schema
+
+
+def _estimated_bytes(path, columns):
+    cached = table_cache.peek(file_signature(path))
+    if cached is not None or not _is_parquet(path):
+        return 0 if cached is not None else load_table(path).select(columns).nbytes
+    metadata, _ = parquet_footer(path)
+    wanted = set(columns)
+    total = 0
+    for rg in range(metadata.num_row_groups):
+        row_group = metadata.row_group(rg)
+        for i in range(row_group.num_columns):
+            column = row_group.column(i)
+            if column.path_in_schema in wanted:
+                total += column.total_uncompressed_size
+    return total
+
+
+def _iter_batches(path, columns):
+    cached = table_cache.peek(file_signature(path))
+    if cached is None and _is_parquet(path):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=JOIN_BATCH_ROWS, columns=columns):
+            dataset_read_bytes.inc('join', amount=batch.nbytes)
+            yield batch
+        return
+    table = cached if cached is not None else load_table(path)
+    yield from table.select(columns).to_batches(max_chunksize=JOIN_BATCH_ROWS)
+
+
+def key_type(left, right):
+    """Common type both sides of a join key are cast to before hashing and matching."""
+    if pa.types.is_integer(left) and pa.types.is_integer(right):
+        return pa.int64()
+    if (pa.types.is_integer(left) or pa.types.is_floating(left)) \
+            and (pa.types.is_integer(right) or pa.types.is_floating(right)):
+        return pa.float64()
+    return pa.string()
+
+
+def _resolve(qualified, schemas):
+    """Splits `object.column` into (object, column); object names may themselves contain dots."""
+    for name in sorted(schemas, key=len, reverse=True):
+        if qualified.startswith(f'{name}.') and qualified[len(name) + 1:] in schemas[name].names:
+            return name, qualified[len(name) + 1:]
+    return None, None
+
+
+def _key_name(i):
+    return f'__join_key_{i}'
+
+
+def _with_keys(table, sources, types):
+    # Keys are joined on typed copies so the original columns stay in the output
+    for i, (source, arrow_type) in enumerate(zip(sources, types)):
+        table = table.append_column(_key_name(i), pc.cast(table.column(source), arrow_type))
+    return table
+
+
+def _partition_ids(table, count, partitions):
+    hashes = np.zeros(table.num_rows, dtype=np.uint64)
+    for i in range(count):
+        values = pc.cast(table.column(_key_name(i)), pa.string()).to_numpy(zero_copy_only=False)
+        hashes = hashes * np.uint64(1000003) ^ pd.util.hash_array(values, categorize=False)
+    return (hashes % np.uint64(partitions)).astype(np.int64)
+
+
+def _split(table, partition_ids, partitions):
+    """Yields (partition, rows) for every partition that has rows in the table."""
+    order = np.argsort(partition_ids, kind='stable')
+    counts = np.bincount(partition_ids, minlength=partitions)
+    table = table.take(pa.array(order))
+    offset = 0
+    for partition, count in enumerate(counts):
+        if count:
+            yield partition, table.slice(offset, int(count))
+        offset += int(count)
+
+
+def _key_arrays(table, count):
+    # Key columns as numpy arrays (nulls filled) plus a mask of rows whose keys are all valid
+    arrays = []
+    valid = np.ones(table.num_rows, dtype=bool)
+    for i in range(count):
+        column = table.column(_key_name(i))
+        valid &= pc.is_valid(column).to_numpy(zero_copy_only=False)
+        fill = '' if pa.types.is_string(column.type) else 0
+        arrays.append(pc.fill_null(column, fill).to_numpy(zero_copy_only=False))
+    if count == 1:
+        return pd.Index(arrays[0]), valid
+    return pd.MultiIndex.from_arrays(arrays), valid
+
+
+class _HashIndex:
+    """The rows of a build table grouped by join key, hashed once and probed by every batch.
+
+    pandas keeps the hash table of an Index after the first lookup, where Table.join would
+    rebuild one for each probe batch. Null keys match nothing, as in Table.join.
+    """
+
+    def __init__(self, table, count):
+        keys, valid = _key_arrays(table, count)
+        codes, uniques = pd.factorize(keys)
+        codes = np.where(valid, codes, -1)
+        self.keys = pd.Index(uniques) if count == 1 else uniques
+        self.count = count
+        # Build rows ordered by key: the rows of key k are order[starts[k]:starts[k] + sizes[k]]
+        self.order = np.argsort(codes, kind='stable')[np.count_nonzero(codes < 0):]
+        self.sizes = np.bincount(codes[codes >= 0], minlength=len(self.keys))
+        self.starts = np.cumsum(self.sizes) - self.sizes
+        self.values = table.drop_columns([_key_name(i) for i in range(count)])
+
+    def join(self, probe, join_type):
+        keys, valid = _key_arrays(probe, self.count)
+        positions = self.keys.get_indexer(keys) if len(self.keys) else np.full(probe.num_rows, -1)
+        positions = np.where(valid, positions, -1)
+        matched = positions >= 0
+        sizes = np.where(matched, self.sizes[np.maximum(positions, 0)], 0)
+        if join_type == 'left outer':
+            # Probe rows without a match are kept once, with nulls for the build columns
+            repeats = np.maximum(sizes, 1)
+        else:
+            repeats = sizes
+        probe_rows = np.repeat(np.arange(probe.num_rows), repeats)
+        # Offset of each output row within its key's run of build rows
+        within = np.arange(len(probe_rows)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        take = np.repeat(np.where(matched, self.starts[np.maximum(positions, 0)], 0), repeats) + within
+        rows = self.order[take] if len(self.order) else np.zeros(len(take), dtype=np.int64)
+        build_rows = pa.array(rows, mask=~np.repeat(matched, repeats))
+        joined = probe.take(pa.array(probe_rows))
+        values = self.values.take(build_rows)
+        for name, column in zip(values.column_names, values.columns):
+            joined = joined.append_column(name, column)
+        return joined
+
+
+class BuildSide:
+    """One object to join: its projected columns, held in memory or spilled to partitions."""
+
+    def __init__(self, name, path, columns, left_keys, right_keys, types, join_type):
+        self.name = name
+        self.path = path
+        self.columns = columns
+        self.left_keys = left_keys
+        self.right_keys = right_keys
+        self.types = types
+        self.join_type = join_type
+        self.table = None
+        self.index = None
+        self.partitions = 0
+        self.partition_dir = None
+        self._partition_indexes = {}
+
+    def _prepare(self, table):
+        table = table.rename_columns([f'{self.name}.{c}' for c in table.column_names])
+        return _with_keys(table, [f'{self.name}.{c}' for c in self.right_keys], self.types)
+
+    def load(self, memory_bytes, spill_dir):
+        self.schema = self._prepare(source_schema(self.path).empty_table().select(self.columns)).schema
+        estimated = _estimated_bytes(self.path, self.columns)
+        if estimated <= memory_bytes:
+            self.table = self._prepare(self._read_all())
+            self.index = _HashIndex(self.table, len(self.types))
+            return
+        # Twice as many partitions as needed so skewed partitions still tend to fit
+        self.partitions = min(MAX_PARTITIONS, max(2, math.ceil(2 * estimated / memory_bytes)))
+        self.partition_dir = tempfile.mkdtemp(prefix='build-', dir=spill_dir)
+        writers = {}
+        try:
+            for batch in _iter_batches(self.path, self.columns):
+                table = self._prepare(pa.Table.from_batches([batch]))
+                ids = _partition_ids(table, len(self.types), self.partitions)
+                for partition, rows in _split(table, ids, self.partitions):
+                    writer = writers.get(partition)
+                    if writer is None:
+                        writer = pa.ipc.new_file(self._partition_path(partition), self.schema)
+                        writers[partition] = writer
+                    writer.write_table(rows)
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+    def _read_all(self):
+        batches = list(_iter_batches(self.path, self.columns))
+        if not batches:
+            return source_schema(self.path).empty_table().select(self.columns)
+        return pa.Table.from_batches(batches)
+
+    def _partition_path(self, partition):
+        return os.path.join(self.partition_dir, f'{partition}.arrow')
+
+    def _partition(self, partition):
+        index = self._partition_indexes.get(partition)
+        if index is None:
+            path = self._partition_path(partition)
+            if os.path.exists(path):
+                # Memory mapped, so partition data is paged in from disk rather than copied
+                table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+            else:
+                table = self.schema.empty_table()
+            index = self._partition_indexes[partition] = _HashIndex(table, len(self.types))
+        return index
+
+    def join(self, probe):
+        probe = _with_keys(probe, self.left_keys, self.types)
+        keys = [_key_name(i) for i in range(len(self.types))]
+        if self.index is not None:
+            joined = self.index.join(probe, self.join_type)
+        else:
+            ids = _partition_ids(probe, len(self.types), self.partitions)
+            parts = [
+                self._partition(partition).join(rows, self.join_type)
+                for partition, rows in _split(probe, ids, self.partitions)
+            ]
+            if not parts:
+                return probe.drop_columns(keys)
+            joined = pa.concat_tables(parts)
+        return joined.drop_columns(keys)
+
+
+class RelationJoin:
+    """Joins a probe object with a chain of build sides and streams the joined rows.
+
+    `steps` is a list of (name, path, left_keys, right_keys) where left_keys are qualified
+    `object.column` names already present in the joined result and right_keys are column
+    names of the object being joined. Output columns are qualified as `object.column`.
+    """
+
+    def __init__(self, probe_name, probe_path, steps, columns=None, how='inner', memory_bytes=None, spill_dir=None):
+        if how not in JOIN_TYPES:
+            raise JoinError(f"Unsupported join type: {how}")
+        self.probe_name = probe_name
+        self.probe_path = probe_path
+        self.memory_bytes = memory_bytes or JOIN_MEMORY_BYTES
+        self.spill_dir = spill_dir or JOIN_SPILL_DIR
+        self._work_dir = None
+
+        schemas = {probe_name: source_schema(probe_path)}
+        for name, path, _, _ in steps:
+            schemas[name] = source_schema(path)
+        if columns:
+            self.columns = list(columns)
+        else:
+            self.columns = [f'{name}.{c}' for name, schema in schemas.items() for c in schema.names]
+
+        # Each object reads only its output columns plus the keys it takes part in
+        needed = {name: set() for name in schemas}
+        for qualified in self.columns:
+            name, column = _resolve(qualified, schemas)
+            if name is None:
+                raise JoinError(f"Unknown column: {qualified}")
+            needed[name].add(column)
+        joined = {probe_name: schemas[probe_name]}
+        key_types = []
+        for name, path, left_keys, right_keys in steps:
+            types = []
+            for left, right in zip(left_keys, right_keys):
+                owner, column = _resolve(left, joined)
+                if owner is None or right not in schemas[name].names:
+                    raise JoinError(f"Unknown join key: {left} = {name}.{right}")
+                needed[owner].add(column)
+                needed[name].add(right)
+                types.append(key_type(schemas[owner].field(column).type, schemas[name].field(right).type))
+            key_types.append(types)
+            joined[name] = schemas[name]
+        self.builds = [
+            BuildSide(
+                name, path, [c for c in schemas[name].names if c in needed[name]],
+                list(left_keys), list(right_keys), types, JOIN_TYPES[how]
+            )
+            for (name, path, left_keys, right_keys), types in zip(steps, key_types)
+        ]
+        self.probe_columns = [c for c in schemas[probe_name].names if c in needed[probe_name]]
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def open(self):
+        for build in self.builds:
+            if build.table is None and build.partitions == 0:
+                if self._work_dir is None:
+                    self._work_dir = tempfile.mkdtemp(prefix='odp-join-', dir=self.spill_dir)
+                build.load(self.memory_bytes, self._work_dir)
+
+    def close(self):
+        for build in self.builds:
+            build._partition_indexes.clear()
+        if self._work_dir is not None:
+            shutil.rmtree(self._work_dir, ignore_errors=True)
+            self._work_dir = None
+
+    @property
+    def spilled(self):
+        return [build.name for build in self.builds if build.partitions]
+
+    def batches(self, limit):
+        """Yields joined tables until `limit` rows have been produced."""
+        remaining = limit
+        for batch in _iter_batches(self.probe_path, self.probe_columns):
+            table = pa.Table.from_batches([batch])
+            table = table.rename_columns([f'{self.probe_name}.{c}' for c in table.column_names])
+            for build in self.builds:
+                table = build.join(table)
+                if table.num_rows == 0:
+                    break
+            if table.num_rows == 0:
+                continue
+            table = table.select(self.columns).slice(0, remaining)
+            remaining -= table.num_rows
+            yield table
+            if remaining <= 0:
+                return
@@ -0,0 +1,103 @@
+import threading
+from collections import deque
+from sqlalchemy import func, select
+from backend.models import ObjectRelation
+
+
+def _edge(relation):
+    return {
+        'id': relation.id,
+        'object_id': relation.object_id,
+        'related_object_id': relation.related_object_id,
+        'source_attribute_id': relation.source_attribute_id,
+        'target_attribute_id': relation.target_attribute_id,
+        'relation_type': relation.relation_type,
+        'status': relation.status
+    }
+
+
+class RelationIndex:
+    """In-memory forward/reverse adjacency lists over object_relations.
+
+    Each access compares max(id) and count(*) with the indexed state: new rows (from any
+    worker process) are loaded incrementally, and only deletions force a rebuild.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.edges = {}
+        self.forward = {}
+        self.reverse = {}
+        self.max_id = 0
+        self._edge_list = None
+
+    def _add(self, edge):
+        if edge['id'] in self.edges:
+            return
+        self.edges[edge['id']] = edge
+        self.forward.setdefault(edge['object_id'], []).append(edge)
+        self.reverse.setdefault(edge['related_object_id'], []).append(edge)
+        self.max_id = max(self.max_id, edge['id'])
+        self._edge_list = None
+
+    def _rebuild(self, session):
+        self.edges, self.forward, self.reverse, self.max_id = {}, {}, {}, 0
+        self._edge_list = None
+        for relation in session.query(ObjectRelation).order_by(ObjectRelation.id):
+            self._add(_edge(relation))
+
+    def refresh(self, session):
+        max_id, count = session.execute(select(func.max(ObjectRelation.id), func.count(ObjectRelation.id))).one()
+        max_id = max_id or 0
+        with self._lock:
+            if max_id == self.max_id and count == len(self.edges):
+                return self
+            if count < len(self.edges) or max_id < self.max_id:
+                self._rebuild(session)
+            else:
+                for relation in session.query(ObjectRelation).filter(ObjectRelation.id > self.max_id).order_by(ObjectRelation.id):
+                    self._add(_edge(relation))
+                if count != len(self.edges):
+                    # Rows were deleted and re-added in between; start over
+                    self._rebuild(session)
+        return self
+
+    def add(self, relation):
+        with self._lock:
+            self._add(_edge(relation))
+
+    def all_edges(self):
+        with self._lock:
+            if self._edge_list is None:
+                self._edge_list = sorted(self.edges.values(), key=lambda edge: edge['id'])
+            return self._edge_list
+
+    def outgoing(self, object_id):
+        with self._lock:
+            return list(self.forward.get(object_id, []))
+
+    def traverse(self, object_id, direction='downstream', max_depth=3):
+        """Breadth-first walk; returns nodes as (object_id, depth, relation_ids) ordered by depth."""
+        adjacency, key = (self.forward, 'related_object_id') if direction == 'downstream' else (self.reverse, 'object_id')
+        nodes = []
+        seen = {object_id}
+        frontier = deque([(object_id, 0)])
+        with self._lock:
+            while frontier:
+                current, depth = frontier.popleft()
+                if depth >= max_depth:
+                    continue
+                discovered = {}
+                for edge in adjacency.get(current, []):
+                    neighbor = edge[key]
+                    if neighbor in seen:
+                        continue
+                    discovered.setdefault(neighbor, []).append(edge['id'])
+                for neighbor in sorted(discovered):
+                    seen.add(neighbor)
+                    nodes.append({'objectId': neighbor, 'depth': depth + 1, 'relationIds': discovered[neighbor]})
+                    frontier.append((neighbor, depth + 1))
+        return nodes
+
+
+relation_index = RelationIndex()
@@ -0,0 +1,194 @@
+import base64
+import hashlib
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import and_, false, or_, select
+from backend.models import TableVersion
+
+# Shared implementation of the catalog list endpoints:
+#
+#   ?fields=id,name            only return these fields
+#   ?sort=-name                order by a field (prefix with - for descending); id breaks ties
+#   ?limit=50&cursor=...       keyset pagination; the next cursor is sent in X-Next-Cursor
+#   ?name=a,b  ?port__gte=1    filters: equality/IN, __ne, __gt, __gte, __lt, __lte, __contains
+#
+# Responses carry an ETag and Last-Modified derived from the table's change counter, so a
+# conditional request for an unchanged table is answered with 304 before the table is read.
+
+RESERVED_PARAMS = {'fields', 'sort', 'limit', 'cursor'}
+MAX_LIMIT = 1000
+
+_OPERATORS = {
+    'ne': lambda column, value: column != value,
+    'gt': lambda column, value: column > value,
+    'gte': lambda column, value: column >= value,
+    'lt': lambda column, value: column < value,
+    'lte': lambda column, value: column <= value,
+    'contains': lambda column, value: column.contains(value, autoescape=True),
+}
+
+
+def table_version(session, table_name):
+    """Returns (version, updated_at) of a table's change counter."""
+    row = session.execute(
+        select(TableVersion.version, TableVersion.updated_at).where(TableVersion.table_name == table_name)
+    ).first()
+    if row is None:
+        return 0, None
+    updated_at = row.updated_at
+    if updated_at is not None and updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+    return row.version, updated_at
+
+
+def _not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def _encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _convert(column, value):
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is object:
+        # Untyped columns such as sqlmodel's AutoString compare as text
+        return value
+    if python_type is bool:
+        return value.lower() in ('1', 'true', 'yes')
+    if python_type is datetime:
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid value for {column.name}: {value}")
+    try:
+        return python_type(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Invalid value for {column.name}: {value}")
+
+
+def list_rows(request: Request, session, model, aliases=None, exclude=()):
+    """Runs a list query for `model` driven by the request's query parameters.
+
+    `aliases` maps response field names to model attributes where the two differ;
+    `exclude` lists attributes that are never returned.
+    """
+    table = model.__table__
+    version, updated_at = table_version(session, table.name)
+    # The query string is part of the tag since every parameter changes the representation
+    digest = hashlib.sha1(str(request.url.query).encode()).hexdigest()[:16]
+    etag = f'W/"{table.name}-{version}-{digest}"'
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if updated_at is not None:
+        headers['Last-Modified'] = format_datetime(updated_at.astimezone(timezone.utc), usegmt=True)
+    if _not_modified(request, etag, updated_at):
+        return Response(status_code=304, headers=headers)
+
+    aliases = aliases or {}
+    columns = {}
+    for column in table.columns:
+        if column.key in exclude:
+            continue
+        name = next((alias for alias, key in aliases.items() if key == column.key), column.key)
+        columns[name] = column
+    primary_key = list(table.primary_key.columns)[0]
+
+    params = request.query_params
+    fields = [f.strip() for f in params['fields'].split(',') if f.strip()] if params.get('fields') else list(columns)
+    unknown = [f for f in fields if f not in columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {unknown}")
+
+    query = select()
+    for key, raw in params.multi_items():
+        if key in RESERVED_PARAMS:
+            continue
+        name, _, operator = key.partition('__')
+        if name not in columns or (operator and operator not in _OPERATORS):
+            raise HTTPException(status_code=400, detail=f"Unknown filter: {key}")
+        column = columns[name]
+        if operator:
+            value = raw if operator == 'contains' else _convert(column, raw)
+            query = query.where(_OPERATORS[operator](column, value))
+        else:
+            values = [_convert(column, v) for v in raw.split(',')]
+            query = query.where(column == values[0] if len(values) == 1 else column.in_(values))
+
+    sort = params.get('sort') or primary_key.key
+    descending = sort.startswith('-')
+    sort_name = sort.lstrip('-+')
+    if sort_name not in columns:
+        raise HTTPException(status_code=400, detail=f"Unknown sort field: {sort_name}")
+    sort_column = columns[sort_name]
+    keys = [sort_column] if sort_column is primary_key else [sort_column, primary_key]
+    if descending:
+        # Nulls go last either way so the keyset condition below matches the ordering
+        query = query.order_by(*(key.desc().nulls_last() for key in keys))
+    else:
+        query = query.order_by(*(key.asc().nulls_first() for key in keys))
+    # Only the requested fields are read, plus the sort keys needed for the next cursor
+    query = query.add_columns(*dict.fromkeys([columns[field] for field in fields] + keys))
+
+    limit = params.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="limit must be an integer")
+        if not 1 <= limit <= MAX_LIMIT:
+            raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_LIMIT}")
+        query = query.limit(limit + 1)
+
+    cursor = params.get('cursor')
+    if cursor:
+        values = _decode_cursor(cursor)
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(_after(keys, [None if v is None else _convert(k, str(v)) for k, v in zip(keys, values)], descending))
+
+    rows = session.execute(query).all()
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]._mapping
+        headers['X-Next-Cursor'] = _encode_cursor([last[key] for key in keys])
+
+    content = [{field: row._mapping[columns[field]] for field in fields} for row in rows]
+    return JSONResponse(content=jsonable_encoder(content), headers=headers)
+
+
+def _after(keys, values, descending):
+    """Keyset condition selecting rows ordered after `values` (nulls first ascending, last descending)."""
+    key, value = keys[0], values[0]
+    if value is None:
+        after_key = false() if descending else key.is_not(None)
+        same_key = key.is_(None)
+    else:
+        after_key = or_(key < value, key.is_(None)) if descending else key > value
+        same_key = key == value
+    if len(keys) == 1:
+        return after_key
+    return or_(after_key, and_(same_key, _after(keys[1:], values[1:], descending)))
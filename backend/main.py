@@ -1,40 +1,77 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from backend.routes import router
 from backend.database import init_db
+from backend.metrics import metrics_middleware
+from backend.sandbox import STEP_SANDBOX, step_sandbox
+from contextlib import asynccontextmanager
+import importlib
+import os
 
-app = FastAPI()
-
-# Simplified CORS configuration
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Allow all origins for debugging
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+# Route modules import pandas, pyarrow and the other data libraries when a data endpoint is
+# first called. Set ODP_PREWARM=1 to import them while the app is built instead, e.g. in the
+# master of a preforking server (gunicorn --preload) so every worker inherits them.
+PREWARM = os.getenv('ODP_PREWARM', '0') == '1'
+PREWARM_MODULES = (
+    'backend.datasets',
+    'backend.pipeline',
+    'backend.delta',
+    'backend.joins',
+    'backend.ingest',
+    'backend.connectors',
+    'backend.codegen',
 )
 
-@app.middleware("http")
-async def log_request_headers(request: Request, call_next):
-    print("Request headers:", request.headers)
-    response = await call_next(request)
-    print("Response headers:", response.headers)
-    return response
+def prewarm():
+    """Imports the modules behind the data endpoints ahead of the first request."""
+    for name in PREWARM_MODULES:
+        importlib.import_module(name)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Start the step worker processes before the first preview needs them
+    if STEP_SANDBOX:
+        step_sandbox.warm()
+    yield
+    step_sandbox.shutdown()
+
+def create_app(prewarm_modules=PREWARM):
+    """Builds the API app; the database schema is set up once per process."""
+    app = FastAPI(lifespan=lifespan)
+
+    # Simplified CORS configuration
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Allow all origins for debugging
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["ETag", "Last-Modified", "X-Next-Cursor", "X-Preview-Offset", "X-Preview-Limit",
+                        "X-Preview-Total-Rows", "X-Preview-Version", "X-Preview-Message"],
+    )
+
+    # Request latency, in-flight and per-request query metrics, served at /metrics
+    app.middleware("http")(metrics_middleware)
+
+    @app.get("/api/hello")
+    def read_root():
+        return {"message": "Hello from FastAPI!"}
 
-@app.get("/api/hello")
-def read_root():
-    return {"message": "Hello from FastAPI!"}
+    @app.options("/api/hello")
+    def options_hello():
+        return {}
 
+    # Initialize the database
+    init_db()
 
-@app.options("/api/hello")
-def options_hello():
-    return {}
+    # Include the router
+    app.include_router(router)
 
-# Initialize the database
-init_db()
+    if prewarm_modules:
+        prewarm()
+    return app
 
-# Include the router
-app.include_router(router)
+app = create_app()
 
 # Bind FastAPI to all interfaces for accessibility
 if __name__ == "__main__":
@@ -0,0 +1,365 @@
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter as StackCounter
+from contextvars import ContextVar
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRoute
+
+# In-process request instrumentation, served in the Prometheus text format at /metrics.
+#
+#   odp_http_request_duration_seconds   latency histogram per method, route template and status
+#   odp_http_requests_in_flight         requests currently being handled, per method
+#   odp_db_queries_per_request          query count histogram per route
+#   odp_db_query_duration_seconds       time spent in the database per request, per route
+#   odp_dataset_read_bytes_total        Arrow bytes loaded from data files, per reader
+#
+# Every process keeps its own values, so with several server workers each one is scraped
+# separately. /metrics/profile runs an opt-in sampling profiler for a single route.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250)
+PROFILE_INTERVAL_MS = int(os.getenv('ODP_PROFILE_INTERVAL_MS', 5))
+PROFILE_MAX_DEPTH = 64
+
+router = APIRouter()
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.extend(self._render_sample(labels, value))
+        return lines
+
+    def _render_sample(self, labels, value):
+        return [f'{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}']
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Per-bucket counts (the last one is +Inf), then the sum
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def _render_sample(self, labels, value):
+        counts, total = value[0][:], value[1]
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = 'le="' + _format_value(bound) + '"'
+            lines.append(f'{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}')
+        suffix = _format_labels(self.label_names, labels)
+        lines.append(f'{self.name}_sum{suffix} {_format_value(total)}')
+        lines.append(f'{self.name}_count{suffix} {cumulative}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def collector(self, func):
+        """Registers a function returning (name, type, help, value) tuples read at scrape time."""
+        with self._lock:
+            self._collectors.append(func)
+        return func
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics):
+            lines.extend(metric.render())
+        for collect in list(self._collectors):
+            for name, type, help, value in collect():
+                lines.extend([f'# HELP {name} {help}', f'# TYPE {name} {type}', f'{name} {_format_value(value)}'])
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def counter(name, help, labels=()):
+    return registry.register(Counter(name, help, labels))
+
+
+def gauge(name, help, labels=()):
+    return registry.register(Gauge(name, help, labels))
+
+
+def histogram(name, help, labels=(), buckets=LATENCY_BUCKETS):
+    return registry.register(Histogram(name, help, labels, buckets))
+
+
+request_duration = histogram(
+    'odp_http_request_duration_seconds', 'Request latency.', ('method', 'route', 'status')
+)
+requests_in_flight = gauge('odp_http_requests_in_flight', 'Requests currently being handled.', ('method',))
+request_queries = histogram(
+    'odp_db_queries_per_request', 'Database queries issued per request.', ('method', 'route'), QUERY_COUNT_BUCKETS
+)
+request_query_seconds = histogram(
+    'odp_db_query_duration_seconds', 'Time spent in database queries per request.', ('method', 'route')
+)
+queries_total = counter('odp_db_queries_total', 'Database queries executed.')
+dataset_read_bytes = counter('odp_dataset_read_bytes_total', 'Bytes of Arrow data loaded from data files.', ('reader',))
+
+
+class RequestStats:
+    __slots__ = ('queries', 'query_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+# Set by the middleware; sync endpoints run in threads with a copy of the context, which
+# still points at the same RequestStats object
+_request_stats = ContextVar('odp_request_stats', default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('odp_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('odp_query_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    queries_total.inc()
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.query_seconds += elapsed
+
+
+def instrument_engine(engine):
+    """Counts and times the queries of an engine against the current request."""
+    from sqlalchemy import event
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def _route_template(request):
+    # Route templates keep label cardinality bounded; unmatched paths share one label
+    route = request.scope.get('route')
+    template = getattr(route, 'path_format', None)
+    if not template:
+        return 'unmatched'
+    # Routes of included routers may report their template without the (static) router prefix
+    segments = request.scope.get('path', '').strip('/').split('/')
+    extra = len(segments) - len(template.strip('/').split('/'))
+    return '/' + '/'.join(segments[:extra]) + template if extra > 0 else template
+
+
+async def metrics_middleware(request: Request, call_next):
+    method = request.method
+    stats = RequestStats()
+    token = _request_stats.set(stats)
+    requests_in_flight.inc(method)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        requests_in_flight.dec(method)
+        _request_stats.reset(token)
+        route = _route_template(request)
+        profiler = _profiler
+        if profiler is not None and profiler.code is None and profiler.matches(method, route):
+            endpoint = request.scope.get('endpoint')
+            profiler.code = getattr(endpoint, '__code__', None)
+        request_duration.observe(elapsed, method, route, str(status))
+        request_queries.observe(stats.queries, method, route)
+        request_query_seconds.observe(stats.query_seconds, method, route)
+
+
+class RouteProfiler:
+    """Samples the stacks of threads running one endpoint at a fixed interval.
+
+    A sample is kept when a thread's stack contains the endpoint's code object, so sync
+    endpoints in the threadpool and async endpoints on the event loop are both attributed
+    to the route. When the endpoint cannot be looked up in the app's routes, the first
+    finished request for the route supplies it. Stacks are aggregated in the collapsed format used by flame graph tools.
+    """
+
+    def __init__(self, method, route, code, interval):
+        self.method = method
+        self.route = route
+        self.code = code
+        self.interval = interval
+        self.samples = 0
+        self.stacks = StackCounter()
+        self.started_at = time.time()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='odp-route-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            if self.code is None:
+                continue
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own:
+                    self._sample(frame)
+
+    def matches(self, method, route):
+        return method == self.method and route == self.route
+
+    def _sample(self, frame):
+        names = []
+        matched = False
+        while frame is not None:
+            code = frame.f_code
+            if code is self.code:
+                matched = True
+            names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+            frame = frame.f_back
+        if matched:
+            self.samples += 1
+            self.stacks[';'.join(reversed(names[:PROFILE_MAX_DEPTH]))] += 1
+
+    def to_dict(self):
+        return {
+            "method": self.method,
+            "route": self.route,
+            "intervalMs": self.interval * 1000,
+            "startedAt": self.started_at,
+            "bound": self.code is not None,
+            "samples": self.samples
+        }
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+@router.get('/metrics', response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(registry.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@router.post('/metrics/profile')
+def start_profile(
+    request: Request,
+    route: str = Query(..., description="Route template to profile, e.g. /objects/preview-data/{object_id}"),
+    method: str = Query('GET'),
+    interval_ms: int = Query(PROFILE_INTERVAL_MS, ge=1, le=1000)
+):
+    global _profiler
+    method = method.upper()
+    endpoint = next((
+        r.endpoint for r in request.app.routes
+        if isinstance(r, APIRoute) and r.path == route and method in r.methods
+    ), None)
+    profiler = RouteProfiler(method, route, getattr(endpoint, '__code__', None), interval_ms / 1000)
+    with _profiler_lock:
+        # Only one route is profiled at a time; starting a new profile replaces the old one
+        if _profiler is not None:
+            _profiler.stop()
+        _profiler = profiler
+        profiler.start()
+    return profiler.to_dict()
+
+
+@router.get('/metrics/profile')
+def get_profile(collapsed: bool = False):
+    profiler = _profiler
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="No profile is running")
+    if collapsed:
+        return PlainTextResponse(profiler.collapsed())
+    return {**profiler.to_dict(), "stacks": dict(profiler.stacks.most_common(50))}
+
+
+@router.delete('/metrics/profile')
+def stop_profile():
+    global _profiler
+    with _profiler_lock:
+        profiler, _profiler = _profiler, None
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="No profile is running")
+    profiler.stop()
+    return {**profiler.to_dict(), "stacks": dict(profiler.stacks.most_common(50))}
@@ -1,3 +1,5 @@
+from typing import Optional
+from datetime import datetime, timezone
 from sqlmodel import SQLModel, Field
 
 class User(SQLModel, table=True):
@@ -15,6 +17,7 @@ class Object(SQLModel, table=True):
     systemId: int = Field(nullable=False)
     dataLayer: str = Field(nullable=True)
     data_path: str = Field(nullable=True)  # New field for file location
+    content_hash: Optional[str] = Field(default=None, nullable=True)  # BronzeBlob behind data_path, if any
 
 class System(SQLModel, table=True):
     __tablename__ = "systems"
@@ -36,6 +39,13 @@ class ObjectAttribute(SQLModel, table=True):
     object_id: int = Field(foreign_key="objects.id")
     attribute_name: str
     attribute_value: str
+    # Column profile computed at ingest
+    data_type: Optional[str] = Field(default=None)
+    null_count: Optional[int] = Field(default=None)
+    distinct_count: Optional[int] = Field(default=None)
+    min_value: Optional[str] = Field(default=None)
+    max_value: Optional[str] = Field(default=None)
+    top_values: Optional[str] = Field(default=None)  # JSON list of [value, count] pairs
 
 class ObjectRelation(SQLModel, table=True):
     __tablename__ = "object_relations"
@@ -61,7 +71,78 @@ class TransformationStep(SQLModel, table=True):
     step_description: str
     step_order: int
     status: str = Field(default="Open")
-    step_command: str = Field(default=None)
+    step_command: Optional[str] = Field(default=None)
+    step_type: Optional[str] = Field(default=None)  # Built-in step from backend.catalog, run instead of step_command
+    step_params: Optional[str] = Field(default=None)  # JSON-encoded parameters of the built-in step
+
+class StepCode(SQLModel, table=True):
+    __tablename__ = "step_code_cache"  # Generated step commands, keyed by description + column schema
+    cache_key: str = Field(primary_key=True)
+    generator: str
+    step_description: str
+    columns: str  # JSON list of [name, dtype] pairs
+    step_command: str
+    hits: int = Field(default=0)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class Job(SQLModel, table=True):
+    __tablename__ = "jobs"  # Background work such as publish-to-silver
+    id: str = Field(primary_key=True)
+    job_type: str
+    object_id: int = Field(foreign_key="objects.id")
+    status: str = Field(default="queued", index=True)  # queued, running, succeeded, failed, cancelled
+    progress: float = Field(default=0.0)
+    params: Optional[str] = Field(default=None)  # JSON-encoded job arguments
+    message: Optional[str] = Field(default=None)
+    cancel_requested: bool = Field(default=False)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = Field(default=None)
+    finished_at: Optional[datetime] = Field(default=None)
+
+class TableVersion(SQLModel, table=True):
+    __tablename__ = "table_versions"  # Change counter per table, bumped in the writing transaction
+    table_name: str = Field(primary_key=True)
+    version: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class SyncState(SQLModel, table=True):
+    __tablename__ = "sync_states"  # Extraction progress of one source table of a System
+    id: int = Field(default=None, primary_key=True)
+    system_id: int = Field(foreign_key="systems.id", index=True)
+    source_table: str
+    object_id: Optional[int] = Field(default=None, foreign_key="objects.id")
+    watermark_column: Optional[str] = Field(default=None)
+    watermark: Optional[str] = Field(default=None)  # JSON-encoded highest extracted value
+    rows_extracted: int = Field(default=0)
+    last_rows: int = Field(default=0)
+    last_synced_at: Optional[datetime] = Field(default=None)
+
+class LoginSession(SQLModel, table=True):
+    __tablename__ = "login_sessions"  # Cookie sessions shared by all server processes
+    id: str = Field(primary_key=True)
+    email: str
+    expires_at: float = Field(index=True)  # Unix timestamp
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class BronzeBlob(SQLModel, table=True):
+    __tablename__ = "bronze_blobs"  # Converted uploads stored once per distinct CSV content
+    content_hash: str = Field(primary_key=True)  # SHA-256 of the uploaded bytes
+    data_path: str
+    size_bytes: int  # Size of the uploaded CSV
+    row_count: int
+    profiles: str  # JSON list of the column profiles computed at conversion
+    ref_count: int = Field(default=0)  # Objects whose data_path links to this blob
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class PublishState(SQLModel, table=True):
+    __tablename__ = "publish_states"  # What the last publish of an object put into its silver table
+    object_id: int = Field(foreign_key="objects.id", primary_key=True)
+    steps_digest: str  # SHA-256 of the step commands that ran
+    source_rows: int  # High-water mark: bronze rows already in silver
+    source_row_groups: Optional[int] = Field(default=None)  # Parquet row groups holding those rows
+    source_fingerprint: str  # Digest of those row groups (or of the file, for other formats)
+    silver_version: int  # Silver table version that publish wrote
+    published_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 # Add a placeholder for the publish-to-silver logic (to be implemented in transformations.py)
 
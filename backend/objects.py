@@ -1,23 +1,32 @@
-from fastapi import APIRouter, HTTPException, UploadFile, Depends
+from fastapi import APIRouter, HTTPException, UploadFile, Depends, Request
 from sqlmodel import Session
-from backend.database import get_db_session
-from backend.models import Object, ObjectAttribute, ObjectRelation, TransformationStep
+from backend.database import get_session
+from backend.models import Object, ObjectAttribute, ObjectRelation, TransformationStep, SyncState, PublishState
+from backend.lineage import relation_index
+from backend.bronze import copy_hashed, blob_path, find_blob, new_blob, link_blob, release_blob, remove_files, collect_garbage, blob_stats
+from backend.listing import list_rows
+from backend.responses import json_line, preview_format, preview_response, MAX_PREVIEW_ROWS
+from sqlalchemy import insert
 import os
+import csv
+import shutil
+import tempfile
+import json
 from datetime import datetime
 from fastapi import Query
-import pandas as pd
+from fastapi.responses import StreamingResponse
 
 router = APIRouter()
 
+# The data endpoints import backend.ingest, backend.datasets and backend.joins (and with them
+# pandas and pyarrow) when first called, which keeps them out of the server's startup path
+
 @router.get('/list')
-def get_objects():
-    session = get_db_session()
-    objects = session.query(Object).all()
-    return objects
+def get_objects(request: Request, session: Session = Depends(get_session)):
+    return list_rows(request, session, Object)
 
 @router.get('/object-detail/{id}')
-def get_object_detail(id: int):
-    session = get_db_session()
+def get_object_detail(id: int, session: Session = Depends(get_session)):
     object = session.query(Object).filter(Object.id == id).first()
 
     if not object:
@@ -26,29 +35,31 @@ def get_object_detail(id: int):
     return object
 
 @router.post('/upload-file')
-def upload_file(file: UploadFile):
-    session = get_db_session()
+def upload_file(file: UploadFile, session: Session = Depends(get_session)):
+    from backend.ingest import ingest_csv, IngestError, IngestMemoryError
 
-    # Save the uploaded file under delta-lake/bronze/upload/today_date/file (as parquet)
+    # Convert the uploaded CSV under delta-lake/bronze/upload/today_date/file (as parquet)
     today_date = datetime.now().strftime('%Y-%m-%d')
     upload_dir = f"delta-lake/bronze/upload/{today_date}"
     os.makedirs(upload_dir, exist_ok=True)
     file_location = f"{upload_dir}/{file.filename}"
-
-    # Save the uploaded file temporarily
-    with open(file_location, "wb") as f:
-        f.write(file.file.read())
-
-    # Read the CSV file into a DataFrame
-    df = pd.read_csv(file_location, header=0)
-    headers = list(df.columns)
-
-    # Save as parquet
     parquet_location = file_location.rsplit('.', 1)[0] + '.parquet'
-    df.to_parquet(parquet_location, index=False)
 
-    # Remove the original CSV file to keep only parquet
-    os.remove(file_location)
+    # Bronze stores each distinct upload once; a byte-identical file reuses the converted blob
+    content_hash, size = copy_hashed(file.file)
+    file.file.seek(0)
+    blob = find_blob(session, content_hash)
+    converted = blob is None
+    if converted:
+        # Stream the upload straight into a Parquet writer, profiling every batch on the way
+        try:
+            profiles, row_count = ingest_csv(file.file, blob_path(content_hash))
+        except IngestMemoryError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except IngestError as e:
+            raise HTTPException(status_code=400, detail=f"Error processing file: {str(e)}")
+        blob = new_blob(content_hash, size, profiles, row_count)
+    parquet_location = link_blob(session, blob, parquet_location)
 
     # Insert a new object record
     new_object = Object(
@@ -57,82 +68,169 @@ def upload_file(file: UploadFile):
         connector="CSV",  # Default connector
         systemId=0,  # Default system ID
         dataLayer="Bronze",  # Default data layer
-        data_path=parquet_location  # Store the parquet file path
+        data_path=parquet_location,  # Store the parquet file path
+        content_hash=content_hash
     )
     session.add(new_object)
-    session.commit()
-
-    # Populate the object attributes table
-    for header in headers:
-        attribute = ObjectAttribute(
-            object_id=new_object.id,  # Use the newly created object ID
-            attribute_name=header,
-            attribute_value=""  # Default value, can be updated later
-        )
-        session.add(attribute)
+    session.flush()
 
+    # Populate the object attributes table with the column profiles in one statement
+    session.execute(insert(ObjectAttribute), [
+        dict(profile, object_id=new_object.id, attribute_value="") for profile in json.loads(blob.profiles)
+    ])
     session.commit()
 
     return {
         "message": "File uploaded and object/attributes populated successfully.",
         "objectId": new_object.id,
-        "filePath": file_location
+        "filePath": parquet_location,
+        "deduplicated": not converted
+    }
+
+@router.post('/upload-batch')
+def upload_batch(files: list[UploadFile], session: Session = Depends(get_session)):
+    # Several CSVs and/or zip/tar archives of CSVs; conversions run in parallel on the ingest pool
+    from backend.ingest import stage_upload, is_archive, convert_batch, IngestError
+
+    today_date = datetime.now().strftime('%Y-%m-%d')
+    upload_dir = f"delta-lake/bronze/upload/{today_date}"
+    os.makedirs(upload_dir, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix='.staging-', dir=upload_dir)
+
+    report = []
+    pending = []
+    parquet_locations = set()
+    try:
+        for file in files:
+            try:
+                staged = stage_upload(file.file, file.filename, staging_dir)
+            except IngestError as e:
+                report.append({"file": file.filename, "status": "failed", "error": str(e)})
+                continue
+            for name, path, content_hash, size in staged:
+                entry = {"file": name}
+                if is_archive(file.filename):
+                    entry["archive"] = file.filename
+                report.append(entry)
+                parquet_location = f"{upload_dir}/{name.rsplit('.', 1)[0]}.parquet"
+                if path is None:
+                    entry.update(status="skipped", error="Not a CSV file")
+                elif parquet_location in parquet_locations:
+                    entry.update(status="failed", error="Duplicate file name in batch")
+                else:
+                    parquet_locations.add(parquet_location)
+                    pending.append((entry, path, content_hash, size, parquet_location))
+
+        # Only content not yet in bronze is converted, once even if the batch holds it twice
+        blobs = {}
+        to_convert = {}
+        for _, path, content_hash, size, _ in pending:
+            if content_hash not in blobs:
+                blobs[content_hash] = find_blob(session, content_hash)
+                if blobs[content_hash] is None:
+                    to_convert[content_hash] = (path, size)
+        results = convert_batch([(path, blob_path(content_hash)) for content_hash, (path, _) in to_convert.items()])
+        for (content_hash, (_, size)), result in zip(to_convert.items(), results):
+            blobs[content_hash] = result if isinstance(result, IngestError) else new_blob(content_hash, size, *result)
+
+        converted = []
+        for entry, _, content_hash, _, parquet_location in pending:
+            blob = blobs[content_hash]
+            if isinstance(blob, IngestError):
+                entry.update(status="failed", error=f"Error processing file: {blob}")
+                continue
+            new_object = Object(
+                objectName=entry["file"],
+                objectCategory="Uploaded File",
+                connector="CSV",
+                systemId=0,
+                dataLayer="Bronze",
+                data_path=parquet_location,
+                content_hash=content_hash
+            )
+            converted.append((entry, new_object, blob, content_hash not in to_convert))
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    # All objects and their attributes are written in a single transaction
+    if converted:
+        for _, new_object, blob, _ in converted:
+            new_object.data_path = link_blob(session, blob, new_object.data_path)
+        session.add_all([new_object for _, new_object, _, _ in converted])
+        session.flush()
+        session.execute(insert(ObjectAttribute), [
+            dict(profile, object_id=new_object.id, attribute_value="")
+            for _, new_object, blob, _ in converted for profile in json.loads(blob.profiles)
+        ])
+        session.commit()
+    for entry, new_object, blob, deduplicated in converted:
+        entry.update(status="success", objectId=new_object.id, filePath=new_object.data_path, rows=blob.row_count,
+                     deduplicated=deduplicated)
+
+    succeeded = sum(1 for entry in report if entry["status"] == "success")
+    return {
+        "message": f"{succeeded} of {len(report)} files ingested.",
+        "succeeded": succeeded,
+        "failed": sum(1 for entry in report if entry["status"] == "failed"),
+        "files": report
     }
 
 @router.get('/object-attributes/{object_id}')
-def get_object_attributes(object_id: int):
-    session = get_db_session()
+def get_object_attributes(object_id: int, session: Session = Depends(get_session)):
     attributes = session.query(ObjectAttribute).filter(ObjectAttribute.object_id == object_id).all()
 
     # Return an empty list if no attributes are found
     return attributes if attributes else []
 
 @router.get('/object-relations/all')
-def get_all_object_relations():
-    session = get_db_session()
+def get_all_object_relations(session: Session = Depends(get_session)):
     try:
-        relations = session.query(ObjectRelation).all()
-        if not relations:
-            return []
-        return [
-            {
-                'id': r.id,
-                'object_id': r.object_id,
-                'related_object_id': r.related_object_id,
-                'source_attribute_id': r.source_attribute_id,
-                'target_attribute_id': r.target_attribute_id,
-                'relation_type': r.relation_type,
-                'status': r.status
-            }
-            for r in relations
-        ]
+        return relation_index.refresh(session).all_edges()
     except Exception:
         return []
 
 @router.get('/object-relations/{object_id}')
-def get_object_relations(object_id: int):
-    session = get_db_session()
-    relations = session.query(ObjectRelation).filter(ObjectRelation.object_id == object_id).all()
-
+def get_object_relations(object_id: int, session: Session = Depends(get_session)):
     # Return an empty list if no relations are found
-    return relations if relations else []
+    return relation_index.refresh(session).outgoing(object_id)
 
 @router.post('/object-relations/add')
-def add_object_relation(relation: ObjectRelation):
-    session = get_db_session()
+def add_object_relation(relation: ObjectRelation, session: Session = Depends(get_session)):
     # Remove id if present to avoid conflicts
     relation.id = None
     session.add(relation)
     session.commit()
     session.refresh(relation)
+    relation_index.add(relation)
     return {
         "message": "Object relation added successfully.",
         "relationId": relation.id
     }
 
+@router.get('/lineage/{object_id}/{direction}')
+def get_object_lineage(
+    object_id: int,
+    direction: str,
+    depth: int = Query(3, ge=1, le=50, description="Maximum number of hops"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    session: Session = Depends(get_session)
+):
+    if direction not in ("upstream", "downstream"):
+        raise HTTPException(status_code=404, detail="Direction must be 'upstream' or 'downstream'")
+    nodes = relation_index.refresh(session).traverse(object_id, direction, depth)
+    return {
+        "objectId": object_id,
+        "direction": direction,
+        "depth": depth,
+        "offset": offset,
+        "limit": limit,
+        "total": len(nodes),
+        "nodes": nodes[offset:offset + limit]
+    }
+
 @router.put('/object-detail/{id}')
-def update_object_detail(id: int, updated_object: Object):
-    session = get_db_session()
+def update_object_detail(id: int, updated_object: Object, session: Session = Depends(get_session)):
     existing_object = session.query(Object).filter(Object.id == id).first()
 
     if not existing_object:
@@ -147,6 +245,37 @@ def update_object_detail(id: int, updated_object: Object):
     session.commit()
     return existing_object
 
+@router.delete('/object-detail/{id}')
+def delete_object(id: int, session: Session = Depends(get_session)):
+    existing_object = session.query(Object).filter(Object.id == id).first()
+
+    if not existing_object:
+        raise HTTPException(status_code=404, detail="Object not found")
+
+    # Its bronze file goes too; a blob shared with other objects stays until its last reference
+    unused_files = release_blob(session, existing_object)
+    session.query(ObjectAttribute).filter(ObjectAttribute.object_id == id).delete()
+    session.query(TransformationStep).filter(TransformationStep.object_id == id).delete()
+    session.query(ObjectRelation).filter(
+        (ObjectRelation.object_id == id) | (ObjectRelation.related_object_id == id)
+    ).delete()
+    session.query(SyncState).filter(SyncState.object_id == id).update({SyncState.object_id: None})
+    session.query(PublishState).filter(PublishState.object_id == id).delete()
+    session.delete(existing_object)
+    session.commit()
+    remove_files(unused_files)
+
+    return {"message": "Object deleted successfully."}
+
+@router.get('/bronze/stats')
+def get_bronze_stats(session: Session = Depends(get_session)):
+    return blob_stats(session)
+
+@router.post('/bronze/gc')
+def collect_bronze_garbage(session: Session = Depends(get_session)):
+    # Repairs blob reference counts and removes unreferenced or orphaned blob files
+    return {"removedFiles": collect_garbage(session)}
+
 @router.post('/preview-file')
 def preview_file(file: UploadFile):
     # Save the uploaded file temporarily
@@ -175,13 +304,25 @@ def preview_file(file: UploadFile):
 
     return {"previewData": preview_data[:10], "suggestions": suggestions}  # Limit preview to first 10 rows
 
+@router.get('/table-cache/stats')
+def get_table_cache_stats():
+    from backend.datasets import table_cache
+    return table_cache.stats()
+
 @router.get('/preview-data/{object_id}')
 def get_preview_data(
     object_id: int,
+    request: Request,
     offset: int = Query(0, ge=0, description="Row offset for pagination"),
-    limit: int = Query(15, ge=1, le=500, description="Number of rows to return (max 500)")
+    limit: int = Query(15, ge=1, le=MAX_PREVIEW_ROWS, description=f"Number of rows to return (max {MAX_PREVIEW_ROWS})"),
+    columns: str = Query(None, description="Comma-separated list of columns to return (default: all)"),
+    format: str = Query(None, description="Response format: rows, columns or arrow (default: from the Accept header)"),
+    session: Session = Depends(get_session)
 ):
-    session = get_db_session()
+    from backend.datasets import read_parquet_page
+    import pyarrow as pa
+
+    format = preview_format(request, format)
     object = session.query(Object).filter(Object.id == object_id).first()
 
     if not object:
@@ -189,44 +330,150 @@ def get_preview_data(
 
     # Fetch the file associated with the object
     file_location = object.data_path  # Use the stored data_path
+    selected_columns = [c.strip() for c in columns.split(',') if c.strip()] if columns else None
 
-    preview_data = []
     total_rows = 0
     try:
-        with open(file_location, "r") as f:
-            reader = csv.reader(f)
-            headers = next(reader)  # Extract column names
-            preview_data.append(headers)
-
-            # Skip rows up to the offset
-            for _ in range(offset):
-                next(reader, None)
-
-            # Fetch the next 'limit' rows for preview
-            for _ in range(limit):
-                row = next(reader, None)
-                if row:
-                    preview_data.append(row)
-                else:
-                    break
-
-            # Count total rows (excluding header)
-            f.seek(0)
-            total_rows = sum(1 for _ in reader) - 1
+        if file_location.endswith('.parquet'):
+            # Seek straight to the row groups covering the requested window
+            table, total_rows = read_parquet_page(file_location, offset, limit, selected_columns)
+        else:
+            # Legacy CSV objects
+            with open(file_location, "r") as f:
+                reader = csv.reader(f)
+                headers = next(reader)  # Extract column names
+                indexes = [headers.index(c) for c in selected_columns] if selected_columns else range(len(headers))
+                page = []
+
+                total_rows = 0
+                for row in reader:
+                    if offset <= total_rows < offset + limit:
+                        page.append(row)
+                    total_rows += 1
+            table = pa.Table.from_arrays(
+                [pa.array([row[i] for row in page], pa.string()) for i in indexes],
+                names=[headers[i] for i in indexes]
+            )
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error processing file: {str(e)}")
 
-    return {
-        "previewData": preview_data,
+    return preview_response(format, table, "previewData", {
         "offset": offset,
         "limit": limit,
         "totalRows": total_rows
-    }
+    }, header_row=True)
+
+def _join_steps(objects, session):
+    """Orders objects into a join chain from their relations, starting with the first object.
+
+    Every relation between an object and those joined before it becomes one key pair of
+    that object's join, so multiple relations between two objects form a composite key.
+    """
+    ids = {o.id for o in objects}
+    names = {}
+    for o in objects:
+        names[o.id] = o.objectName if o.objectName not in names.values() else f"{o.objectName}_{o.id}"
+
+    edges = [
+        e for e in relation_index.refresh(session).all_edges()
+        if e['object_id'] in ids and e['related_object_id'] in ids and e['object_id'] != e['related_object_id']
+    ]
+    attribute_ids = {e['source_attribute_id'] for e in edges} | {e['target_attribute_id'] for e in edges}
+    attributes = {
+        a.id: a.attribute_name
+        for a in session.query(ObjectAttribute).filter(ObjectAttribute.id.in_(attribute_ids)).all()
+    } if attribute_ids else {}
+
+    order = [objects[0].id]
+    steps = []
+    remaining = [o.id for o in objects[1:]]
+    while remaining:
+        for candidate in remaining:
+            left_keys, right_keys = [], []
+            for e in edges:
+                if e['related_object_id'] == candidate and e['object_id'] in order:
+                    left, right = (e['object_id'], e['source_attribute_id']), e['target_attribute_id']
+                elif e['object_id'] == candidate and e['related_object_id'] in order:
+                    left, right = (e['related_object_id'], e['target_attribute_id']), e['source_attribute_id']
+                else:
+                    continue
+                if left[1] in attributes and right in attributes:
+                    left_keys.append(f"{names[left[0]]}.{attributes[left[1]]}")
+                    right_keys.append(attributes[right])
+            if left_keys:
+                break
+        else:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Objects {remaining} have no relation to the other selected objects"
+            )
+        order.append(candidate)
+        remaining.remove(candidate)
+        steps.append((candidate, left_keys, right_keys))
+    return names, steps
+
+@router.get('/join-preview')
+def get_join_preview(
+    object_ids: str = Query(..., description="Comma-separated object ids; the first one drives the join"),
+    columns: str = Query(None, description="Comma-separated `objectName.column` list to return (default: all)"),
+    how: str = Query('inner', description="Join type: inner or left"),
+    limit: int = Query(100, ge=1, le=10000, description="Number of joined rows to return"),
+    session: Session = Depends(get_session)
+):
+    from backend.datasets import table_rows
+    from backend.joins import RelationJoin, JoinError
 
-@router.post('/transformations')
-def create_transformation_step(transformation_step: TransformationStep):
-    session = get_db_session()
+    try:
+        ids = list(dict.fromkeys(int(i) for i in object_ids.split(',') if i.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="object_ids must be a comma-separated list of integers")
+    if len(ids) < 2:
+        raise HTTPException(status_code=400, detail="At least two objects are required for a join")
+
+    found = {o.id: o for o in session.query(Object).filter(Object.id.in_(ids)).all()}
+    missing = [i for i in ids if i not in found]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Objects not found: {missing}")
+    objects = [found[i] for i in ids]
+    for o in objects:
+        if not o.data_path or not os.path.exists(o.data_path):
+            raise HTTPException(status_code=400, detail=f"No data file for object {o.id}")
+
+    names, steps = _join_steps(objects, session)
+    selected_columns = [c.strip() for c in columns.split(',') if c.strip()] if columns else None
+    join = None
+    try:
+        join = RelationJoin(
+            names[objects[0].id], objects[0].data_path,
+            [(names[i], found[i].data_path, left_keys, right_keys) for i, left_keys, right_keys in steps],
+            columns=selected_columns, how=how
+        )
+        join.open()
+    except Exception as e:
+        if join is not None:
+            join.close()
+        if isinstance(e, JoinError):
+            raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=400, detail=f"Error processing file: {str(e)}")
 
+    def stream():
+        # Newline-delimited JSON: a header line, then one row array per line
+        try:
+            yield json.dumps({
+                "headers": join.columns,
+                "joins": [{"object": names[i], "leftKeys": l, "rightKeys": r} for i, l, r in steps],
+                "spilled": join.spilled
+            }) + "\n"
+            for table in join.batches(limit):
+                for row in table_rows(table):
+                    yield json_line(row)
+        finally:
+            join.close()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@router.post('/transformations')
+def create_transformation_step(transformation_step: TransformationStep, session: Session = Depends(get_session)):
     # Add the new transformation step
     session.add(transformation_step)
     session.commit()
@@ -234,22 +481,21 @@ def create_transformation_step(transformation_step: TransformationStep):
     return {"message": "Transformation step created successfully.", "stepId": transformation_step.id}
 
 @router.get('/transformations/{object_id}')
-def get_transformation_steps(object_id: int):
-    session = get_db_session()
+def get_transformation_steps(object_id: int, session: Session = Depends(get_session)):
     steps = session.query(TransformationStep).filter(TransformationStep.object_id == object_id).order_by(TransformationStep.step_order).all()
 
     # Return an empty list if no steps are found
     return steps if steps else []
 
 @router.post('/transformations/first-row-to-header/{object_id}')
-def add_first_row_to_header(object_id: int):
-    session = get_db_session()
-
+def add_first_row_to_header(object_id: int, session: Session = Depends(get_session)):
     # Create a new transformation step
     transformation_step = TransformationStep(
         object_id=object_id,
         step_name="First Row Promote to Header",
         step_description="Skip the first row and use it as headers",
+        step_type="promote_header",
+        step_params="{}",
         step_order=session.query(TransformationStep).filter(TransformationStep.object_id == object_id).count() + 1
     )
     session.add(transformation_step)
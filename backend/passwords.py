@@ -0,0 +1,79 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from fastapi import HTTPException
+
+# bcrypt work factor for new hashes; logins rehash stored passwords that use another factor
+BCRYPT_ROUNDS = int(os.getenv('ODP_BCRYPT_ROUNDS', 12))
+# Threads doing bcrypt work (bcrypt releases the GIL) and how many more requests may wait for one
+HASH_WORKERS = int(os.getenv('ODP_HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+HASH_QUEUE_SIZE = int(os.getenv('ODP_HASH_QUEUE_SIZE', 32))
+HASH_RETRY_AFTER_SECONDS = 1
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full; callers should retry later."""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated, bounded thread pool.
+
+    Hashing is kept off the request threadpool so a burst of logins cannot starve other
+    endpoints. At most workers + queue_size operations are admitted at once; beyond that
+    PasswordHasherBusy is raised immediately instead of queueing without limit.
+    """
+
+    def __init__(self, workers=HASH_WORKERS, queue_size=HASH_QUEUE_SIZE, rounds=BCRYPT_ROUNDS):
+        self.workers = workers
+        self.rounds = rounds
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='odp-bcrypt')
+        self.rejected = 0
+
+    def _submit(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PasswordHasherBusy("Too many password operations in progress")
+        future = self._executor.submit(func, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        return asyncio.wrap_future(future)
+
+    def _hash(self, password):
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.rounds)).decode('utf-8')
+
+    def _verify(self, password, hashed):
+        try:
+            return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+        except ValueError:
+            # Not a bcrypt hash
+            return False
+
+    async def hash(self, password):
+        return await self._submit(self._hash, password)
+
+    async def verify(self, password, hashed):
+        return await self._submit(self._verify, password, hashed)
+
+    def needs_rehash(self, hashed):
+        # Modular crypt format: $2b$<rounds>$<salt+hash>
+        parts = hashed.split('$')
+        return len(parts) < 4 or not parts[2].isdigit() or int(parts[2]) != self.rounds
+
+
+password_hasher = PasswordHasher()
+
+
+async def hash_password(password):
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(HASH_RETRY_AFTER_SECONDS)})
+
+
+async def verify_password(password, hashed):
+    try:
+        return await password_hasher.verify(password, hashed)
+    except PasswordHasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(HASH_RETRY_AFTER_SECONDS)})
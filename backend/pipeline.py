@@ -0,0 +1,317 @@
+import os
+import json
+import hashlib
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+from backend.datasets import (
+    TableCache, file_signature, load_dataframe, load_table, parquet_footer, parquet_null_counts, read_parquet_page,
+    scan_table
+)
+from backend.catalog import Plan, PlanError, Step
+from backend.pushdown import analyze
+from backend.sandbox import STEP_SANDBOX, step_sandbox, step_result, index_as_columns
+
+# Intermediate step results are memoized in memory and optionally spilled to disk
+CHECKPOINT_DIR = os.getenv('ODP_CHECKPOINT_DIR', 'delta-lake/.checkpoints')
+CHECKPOINT_CACHE_BYTES = int(os.getenv('ODP_CHECKPOINT_CACHE_BYTES', 512 * 1024 * 1024))
+CHECKPOINT_DISK_BYTES = int(os.getenv('ODP_CHECKPOINT_DISK_BYTES', 4 * 1024 * 1024 * 1024))
+SPILL_CHECKPOINTS = os.getenv('ODP_SPILL_CHECKPOINTS', '0') == '1'
+
+checkpoint_cache = TableCache(CHECKPOINT_CACHE_BYTES)
+# Schema metadata key holding the names of a DataFrame index stored as leading columns
+INDEX_METADATA = b'odp.index'
+
+
+class StepExecutionError(Exception):
+    """Raised when a step command fails; carries the position of the failing step."""
+
+    def __init__(self, index, error):
+        super().__init__(str(error))
+        self.index = index
+        self.error = error
+
+
+class PipelineCancelled(Exception):
+    """Raised from a progress callback to stop a running pipeline."""
+
+
+def prefix_keys(data_path, commands):
+    """Returns one checkpoint key per step prefix (keys[0] is the untouched source).
+
+    Each key hashes the source file signature and every command up to that step, so
+    editing a step only changes the keys from that step onward. Steps without a
+    command are no-ops and keep the previous key.
+    """
+    digest = hashlib.sha256(repr(file_signature(data_path)).encode('utf-8'))
+    keys = [digest.hexdigest()]
+    for command in commands:
+        if command:
+            digest.update(b'\0' + command_key(command).encode('utf-8'))
+        keys.append(digest.hexdigest())
+    return keys
+
+
+def command_key(command):
+    """Text identifying a command: the pandas code, or the key of a built-in Step."""
+    return command.key if isinstance(command, Step) else command
+
+
+def apply_command(df, command):
+    if STEP_SANDBOX:
+        return step_sandbox.run(df, command)
+    local_vars = {"df": df, "pd": pd}
+    exec(command, {}, local_vars)
+    return step_result(local_vars["df"])
+
+
+def _checkpoint_path(key):
+    return os.path.join(CHECKPOINT_DIR, f"{key}.arrow")
+
+
+def load_checkpoint(key):
+    table = checkpoint_cache.get(key)
+    if table is not None:
+        return table
+    path = _checkpoint_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with pa.memory_map(path) as source:
+            table = ipc.open_file(source).read_all()
+    except (OSError, pa.ArrowInvalid):
+        return None
+    checkpoint_cache.put(key, table)
+    return table
+
+
+def save_checkpoint(key, data):
+    try:
+        table = _as_table(data)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+        # Mixed-type object columns cannot be checkpointed; they are simply recomputed
+        return
+    checkpoint_cache.put(key, table)
+    if SPILL_CHECKPOINTS:
+        spill_checkpoint(key, table)
+
+
+def spill_checkpoint(key, table):
+    """Writes a checkpoint to disk so that it outlives the process. A failed write only costs
+    the recomputation, so disk errors are swallowed."""
+    path = _checkpoint_path(key)
+    # Concurrent publishes can spill the same key; each writer gets its own temporary file
+    tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        prune_checkpoints()
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def prune_checkpoints(max_bytes=None):
+    """Deletes the least recently written spilled checkpoints beyond the disk budget."""
+    max_bytes = CHECKPOINT_DISK_BYTES if max_bytes is None else max_bytes
+    if not os.path.isdir(CHECKPOINT_DIR):
+        return
+    entries = []
+    for name in os.listdir(CHECKPOINT_DIR):
+        if name.endswith('.arrow'):
+            try:
+                stat = os.stat(os.path.join(CHECKPOINT_DIR, name))
+            except FileNotFoundError:
+                continue  # pruned by another writer
+            entries.append((stat.st_mtime, stat.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(CHECKPOINT_DIR, name))
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def partial_dtypes_known(data_path):
+    """Whether a subset of a Parquet file's rows can be given the dtypes of a full load."""
+    if not data_path.endswith('.parquet'):
+        return False
+    metadata, _ = parquet_footer(data_path)
+    null_counts = parquet_null_counts(data_path)
+    # Integer/boolean dtypes after to_pandas() depend on nulls in the whole column, so those need statistics
+    for field in metadata.schema.to_arrow_schema():
+        if (pa.types.is_integer(field.type) or pa.types.is_boolean(field.type)) and null_counts.get(field.name) is None:
+            return False
+    return True
+
+
+def scan_plan(data_path, commands):
+    """Pushdown plan for the leading filter/projection commands (Parquet sources only)."""
+    if not partial_dtypes_known(data_path):
+        return None
+    metadata, _ = parquet_footer(data_path)
+    # Built-in steps scan the file through their own plan
+    leading = []
+    for command in commands:
+        if isinstance(command, Step):
+            break
+        leading.append(command)
+    return analyze(leading, metadata.schema.to_arrow_schema())
+
+
+def scan_dataframe(data_path, plan):
+    """Scans with the plan applied, giving columns the dtypes a full load would have."""
+    return _full_load_dtypes(data_path, scan_table(data_path, plan.columns, plan.filter))
+
+
+def _full_load_dtypes(data_path, table):
+    df = table.to_pandas()
+    null_counts = parquet_null_counts(data_path)
+    for field in table.schema:
+        # A filtered-out null would otherwise turn float64/object columns back into int64/bool
+        if null_counts.get(field.name) and table.column(field.name).null_count == 0:
+            if pa.types.is_integer(field.type):
+                df[field.name] = df[field.name].astype('float64')
+            elif pa.types.is_boolean(field.type):
+                df[field.name] = df[field.name].astype(object)
+    return df
+
+
+def _as_frame(data):
+    if isinstance(data, pd.DataFrame):
+        return data
+    table = _as_table(data)
+    df = table.to_pandas()
+    index = (table.schema.metadata or {}).get(INDEX_METADATA)
+    if index is not None:
+        # A named index kept by a pandas step, stored as leading columns
+        df = df.set_index(json.loads(index))
+    return df
+
+
+def _as_table(data):
+    """Arrow form of step data. A named index becomes leading columns whose names are kept in
+    the schema metadata, so that _as_frame() restores it; output() drops that metadata."""
+    if isinstance(data, str):
+        return load_table(data)
+    if isinstance(data, pd.DataFrame):
+        frame = index_as_columns(data)
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        index = frame.columns[:len(frame.columns) - len(data.columns)].tolist()
+        if index:
+            metadata = dict(table.schema.metadata or {})
+            metadata[INDEX_METADATA] = json.dumps([str(name) for name in index])
+            table = table.replace_schema_metadata(metadata)
+        return table
+    return data
+
+
+def _columns_only(table):
+    # Index columns are plain columns for built-in steps and in output
+    metadata = table.schema.metadata
+    if metadata and INDEX_METADATA in metadata:
+        table = table.replace_schema_metadata({k: v for k, v in metadata.items() if k != INDEX_METADATA})
+    return table
+
+
+def output(data, as_table=False):
+    """Step data as a result: a DataFrame (or Arrow table) with a kept index as columns."""
+    if as_table:
+        return _columns_only(_as_table(data))
+    return index_as_columns(_as_frame(data))
+
+
+def _first_command(commands):
+    return next((command for command in commands if command), None)
+
+
+def _execute(data, commands, start, keys=None, progress=None):
+    # Runs commands[start:] over data (a DataFrame, an Arrow table or, before any step has run,
+    # the Parquet source path). Runs of built-in steps execute as one fused Plan on Arrow data;
+    # pandas commands get a DataFrame. Checkpoints are saved after every pandas command and at
+    # the end of every run of built-in steps when keys are given.
+    if progress is not None:
+        progress(start, len(commands))
+    i = start
+    while i < len(commands):
+        command = commands[i]
+        if isinstance(command, Step):
+            end = i
+            while end < len(commands) and (not commands[end] or isinstance(commands[end], Step)):
+                end += 1
+            positions = [j for j in range(i, end) if commands[j]]
+            source = data if isinstance(data, str) else _columns_only(_as_table(data))
+            try:
+                data = Plan([commands[j] for j in positions]).execute(source)
+            except PlanError as e:
+                raise StepExecutionError(positions[e.index], e.error)
+            if keys is not None:
+                save_checkpoint(keys[end], data)
+            i = end
+        else:
+            if command:
+                try:
+                    data = apply_command(_as_frame(data), command)
+                except Exception as e:
+                    raise StepExecutionError(i, e)
+                if keys is not None:
+                    save_checkpoint(keys[i + 1], data)
+            i += 1
+        if progress is not None:
+            progress(i, len(commands))
+    return data
+
+
+def run_steps(data_path, commands, progress=None, as_table=False):
+    """Replays step commands over the dataset at data_path and returns a DataFrame
+    (an Arrow table with as_table).
+
+    commands are pandas code strings, built-in catalog Steps or None (no-op). Evaluation
+    resumes from the deepest memoized prefix, so only the steps after the first changed
+    (or not yet evaluated) command are executed. progress, if given, is called as
+    progress(steps_done, total_steps) and may raise PipelineCancelled.
+    """
+    keys = prefix_keys(data_path, commands)
+    start = 0
+    data = None
+    for i in range(len(commands), 0, -1):
+        data = load_checkpoint(keys[i])
+        if data is not None:
+            start = i
+            break
+    if data is None and isinstance(_first_command(commands), Step):
+        # The built-in steps' plan scans the source itself, applying its filters while reading
+        data = data_path if data_path.endswith('.parquet') else load_table(data_path)
+    elif data is None:
+        plan = scan_plan(data_path, commands)
+        if plan is not None and plan.consumed:
+            # Leading filters and projections are applied while scanning the file
+            data = scan_dataframe(data_path, plan)
+            start = plan.consumed
+            save_checkpoint(keys[start], data)
+        else:
+            data = load_dataframe(data_path)
+    data = _execute(data, commands, start, keys, progress)
+    return output(data, as_table)
+
+
+def run_rows(data_path, start_row, commands, progress=None):
+    """Runs step commands over the rows of a Parquet file from start_row to the end, without
+    checkpoints (e.g. rows appended since the last publish). Returns an Arrow table.
+
+    The rows start out as run_steps would load them: Arrow data when the first step is a
+    built-in one, otherwise a DataFrame with the dtypes of a full load.
+    """
+    metadata, _ = parquet_footer(data_path)
+    table, _ = read_parquet_page(data_path, start_row, metadata.num_rows - start_row)
+    data = table if isinstance(_first_command(commands), Step) else _full_load_dtypes(data_path, table)
+    return output(_execute(data, commands, 0, progress=progress), as_table=True)
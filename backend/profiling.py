@@ -0,0 +1,125 @@
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Streaming column statistics gathered while a file is converted, one record batch at a time
+
+HLL_PRECISION = 12  # 4096 registers, ~1.6% standard error
+TOP_K = 5
+TOP_K_CAPACITY = 200  # candidates tracked per column before pruning
+
+
+class HyperLogLog:
+    """Approximate distinct counter over 64-bit hashes."""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = np.zeros(self.size, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        if len(hashes) == 0:
+            return
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+        # frexp gives the exact bit length because rest fits in the float64 mantissa
+        _, bit_length = np.frexp(rest.astype(np.float64))
+        rank = (64 - self.precision) - bit_length + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def count(self):
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+def _hash_values(array):
+    values = array.drop_null()
+    if len(values) == 0:
+        return np.empty(0, dtype=np.uint64)
+    if pa.types.is_dictionary(values.type):
+        values = values.cast(values.type.value_type)
+    numpy_values = values.to_numpy(zero_copy_only=False)
+    if numpy_values.dtype.kind in 'mM':
+        numpy_values = numpy_values.view(np.int64)
+    return pd.util.hash_array(numpy_values, categorize=False)
+
+
+def _to_text(value):
+    return None if value is None else str(value)
+
+
+class ColumnProfile:
+    def __init__(self, field):
+        self.field = field
+        self.row_count = 0
+        self.null_count = 0
+        self.min = None
+        self.max = None
+        self.sketch = HyperLogLog()
+        self.counts = {}
+        self.pruned = False
+
+    def update(self, array):
+        self.row_count += len(array)
+        self.null_count += array.null_count
+        if array.null_count == len(array):
+            return
+        try:
+            bounds = pc.min_max(array).as_py()
+            low, high = bounds['min'], bounds['max']
+            if low is not None:
+                self.min = low if self.min is None else min(self.min, low)
+                self.max = high if self.max is None else max(self.max, high)
+        except (pa.ArrowNotImplementedError, TypeError):
+            pass
+        self.sketch.add_hashes(_hash_values(array))
+        counts = pa.RecordBatch.from_struct_array(pc.value_counts(array.drop_null()))
+        if counts.num_rows > TOP_K_CAPACITY:
+            # High-cardinality batch: only its heaviest values can matter for the top-k
+            counts = counts.take(pc.select_k_unstable(counts, TOP_K_CAPACITY, [('counts', 'descending')]))
+            self.pruned = True
+        for value, count in zip(counts.column('values').to_pylist(), counts.column('counts').to_pylist()):
+            self.counts[value] = self.counts.get(value, 0) + count
+        if len(self.counts) > TOP_K_CAPACITY:
+            # Keep the heaviest candidates; counts become lower bounds for long-tail values
+            kept = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:TOP_K_CAPACITY // 2]
+            self.counts = dict(kept)
+            self.pruned = True
+
+    def result(self):
+        top = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:TOP_K]
+        # Exact when every distinct value is still tracked, otherwise the sketch estimate
+        distinct = self.sketch.count() if self.pruned else len(self.counts)
+        return {
+            "attribute_name": self.field.name,
+            "data_type": str(self.field.type),
+            "null_count": self.null_count,
+            "distinct_count": distinct,
+            "min_value": _to_text(self.min),
+            "max_value": _to_text(self.max),
+            "top_values": json.dumps([[_to_text(value), count] for value, count in top])
+        }
+
+
+class TableProfiler:
+    """Profiles every column of a stream of record batches in a single pass."""
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.columns = [ColumnProfile(field) for field in schema]
+
+    def update(self, batch):
+        for profile, array in zip(self.columns, batch.columns):
+            profile.update(array)
+
+    def results(self):
+        return [profile.result() for profile in self.columns]
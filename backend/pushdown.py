@@ -0,0 +1,333 @@
+import ast
+import math
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Recognizes leading step commands that are plain row filters or column selections and turns
+# them into a pyarrow dataset filter expression plus a column list applied at scan time.
+# Anything not provably equivalent to the pandas result ends the pushed-down prefix; the
+# remaining commands still run through pandas.
+#
+#   df = df[df['col'] == 'value']            comparisons (==, !=, <, <=, >, >=) against literals
+#   df = df[df['col'].isin(['a', 'b'])]      membership
+#   df = df[df['col'].notna()]               null checks (isna/isnull/notna/notnull)
+#   df = df[(mask) & (mask)], ~(mask), |     boolean combinations of the above
+#   df = df[['a', 'b']]                      projection
+#   df = df.drop(columns=['a'])              projection by exclusion
+#   df = df[mask][['a', 'b']]                filter followed by projection
+
+_COMPARISONS = {
+    ast.Eq: ('==', lambda f, v: f == v),
+    ast.NotEq: ('!=', lambda f, v: f != v),
+    ast.Lt: ('<', lambda f, v: f < v),
+    ast.LtE: ('<=', lambda f, v: f <= v),
+    ast.Gt: ('>', lambda f, v: f > v),
+    ast.GtE: ('>=', lambda f, v: f >= v),
+}
+_FLIPPED = {ast.Lt: ast.Gt, ast.Gt: ast.Lt, ast.LtE: ast.GtE, ast.GtE: ast.LtE, ast.Eq: ast.Eq, ast.NotEq: ast.NotEq}
+
+
+class NotPushable(Exception):
+    pass
+
+
+class ScanPlan:
+    """Filter and projection for the first `consumed` commands of a pipeline."""
+
+    def __init__(self, consumed=0, filter=None, columns=None):
+        self.consumed = consumed
+        self.filter = filter
+        self.columns = columns
+
+    def to_dict(self):
+        return {
+            "pushedSteps": self.consumed,
+            "filter": str(self.filter) if self.filter is not None else None,
+            "columns": self.columns
+        }
+
+
+def _literal(node):
+    if isinstance(node, ast.Constant) and isinstance(node.value, (bool, int, float, str)):
+        if isinstance(node.value, float) and not math.isfinite(node.value):
+            raise NotPushable()
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) and isinstance(node.operand, ast.Constant) \
+            and type(node.operand.value) in (int, float):
+        return -node.operand.value
+    raise NotPushable()
+
+
+def _compatible(value, arrow_type):
+    # Only comparisons that pandas and Arrow evaluate identically are pushed down
+    if isinstance(value, bool):
+        return pa.types.is_boolean(arrow_type)
+    if isinstance(value, (int, float)):
+        return pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type)
+    return pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type)
+
+
+def _is_df(node):
+    return isinstance(node, ast.Name) and node.id == 'df'
+
+
+def _is_column_attribute(node):
+    # df.col; pandas resolves df.size, df.index, df.sum, ... to the DataFrame attribute even
+    # when a column has that name
+    return isinstance(node, ast.Attribute) and _is_df(node.value) and not hasattr(pd.DataFrame, node.attr)
+
+
+class _Analyzer:
+    def __init__(self, schema):
+        self.schema = schema
+        self.columns = list(schema.names)  # columns visible to the next command
+
+    def column(self, node):
+        # df['col'] or df.col
+        if isinstance(node, ast.Subscript) and _is_df(node.value) and isinstance(node.slice, ast.Constant) \
+                and isinstance(node.slice.value, str):
+            name = node.slice.value
+        elif _is_column_attribute(node):
+            name = node.attr
+        else:
+            raise NotPushable()
+        if name not in self.columns:
+            raise NotPushable()
+        return name
+
+    def mask(self, node):
+        """Translates a boolean mask into an expression that is never null, like a pandas mask."""
+        if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.BitAnd, ast.BitOr)):
+            left, right = self.mask(node.left), self.mask(node.right)
+            return left & right if isinstance(node.op, ast.BitAnd) else left | right
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Invert):
+            return ~self.mask(node.operand)
+        if isinstance(node, ast.Compare) and len(node.ops) == 1:
+            op, left, right = type(node.ops[0]), node.left, node.comparators[0]
+            try:
+                name = self.column(left)
+                value = _literal(right)
+            except NotPushable:
+                name = self.column(right)
+                value = _literal(left)
+                op = _FLIPPED[op]
+            if op not in _COMPARISONS or not _compatible(value, self.schema.field(name).type):
+                raise NotPushable()
+            symbol, build = _COMPARISONS[op]
+            # pandas treats a missing value as unequal to everything
+            return pc.coalesce(build(pc.field(name), value), symbol == '!=')
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and not node.keywords:
+            name = self.column(node.func.value)
+            method = node.func.attr
+            if method in ('isna', 'isnull', 'notna', 'notnull') and not node.args:
+                is_null = pc.is_null(pc.field(name), nan_is_null=True)
+                return is_null if method in ('isna', 'isnull') else ~is_null
+            if method == 'isin' and len(node.args) == 1 and isinstance(node.args[0], (ast.List, ast.Tuple, ast.Set)):
+                values = [_literal(element) for element in node.args[0].elts]
+                arrow_type = self.schema.field(name).type
+                if not values or not all(_compatible(v, arrow_type) for v in values) \
+                        or len({type(v) for v in values}) > 1:
+                    raise NotPushable()
+                return pc.coalesce(pc.is_in(pc.field(name), value_set=pa.array(values)), False)
+        raise NotPushable()
+
+    def projection(self, node):
+        if not isinstance(node, ast.List) or not node.elts:
+            raise NotPushable()
+        names = [_literal(element) for element in node.elts]
+        if not all(isinstance(name, str) and name in self.columns for name in names) or len(set(names)) != len(names):
+            raise NotPushable()
+        return names
+
+    def statement(self, command):
+        """Returns (mask expression or None, projected columns or None) for one command."""
+        try:
+            tree = ast.parse(command)
+        except SyntaxError:
+            raise NotPushable()
+        if len(tree.body) != 1 or not isinstance(tree.body[0], ast.Assign):
+            raise NotPushable()
+        assign = tree.body[0]
+        if len(assign.targets) != 1 or not _is_df(assign.targets[0]):
+            raise NotPushable()
+        value = assign.value
+
+        # df.drop(columns=[...])
+        if isinstance(value, ast.Call) and isinstance(value.func, ast.Attribute) and _is_df(value.func.value) \
+                and value.func.attr == 'drop' and not value.args and len(value.keywords) == 1 \
+                and value.keywords[0].arg == 'columns':
+            dropped = self.projection(value.keywords[0].value)
+            return None, [name for name in self.columns if name not in dropped]
+
+        if not isinstance(value, ast.Subscript):
+            raise NotPushable()
+        # df[mask][[...]]
+        if isinstance(value.value, ast.Subscript) and _is_df(value.value.value):
+            mask = self.mask(value.value.slice)
+            return mask, self.projection(value.slice)
+        if not _is_df(value.value):
+            raise NotPushable()
+        if isinstance(value.slice, ast.List):
+            return None, self.projection(value.slice)
+        return self.mask(value.slice), None
+
+
+def analyze(commands, schema):
+    """Builds a ScanPlan for the longest pushable prefix of commands over a table schema."""
+    analyzer = _Analyzer(schema)
+    plan = ScanPlan()
+    for index, command in enumerate(commands):
+        if not command:
+            # Steps without a command are no-ops
+            continue
+        try:
+            mask, columns = analyzer.statement(command)
+        except NotPushable:
+            break
+        if mask is not None:
+            plan.filter = mask if plan.filter is None else plan.filter & mask
+        if columns is not None:
+            analyzer.columns = columns
+            plan.columns = columns
+        plan.consumed = index + 1
+    return plan
+
+
+# Row-local commands: every output row depends only on the input row it came from, so running
+# the command over a slice of rows gives exactly the matching slice of the full result. Used to
+# decide whether newly arrived rows can be published on their own. The check is conservative:
+# only filters, projections, renames and elementwise column expressions built from the
+# methods below qualify; reductions, sorting, deduplication, positional access and any
+# function or name other than df and pd do not.
+
+_ROW_LOCAL_METHODS = {
+    'astype', 'fillna', 'replace', 'round', 'abs', 'clip', 'isin', 'between', 'where', 'mask', 'map',
+    'isna', 'isnull', 'notna', 'notnull', 'add', 'sub', 'mul', 'div', 'truediv', 'floordiv', 'mod', 'pow',
+    'eq', 'ne', 'lt', 'le', 'gt', 'ge', 'assign', 'rename', 'drop', 'dropna', 'copy', 'infer_objects',
+}
+_ROW_LOCAL_ACCESSOR_METHODS = {
+    'str': {
+        'lower', 'upper', 'title', 'capitalize', 'casefold', 'swapcase', 'strip', 'lstrip', 'rstrip', 'replace',
+        'contains', 'startswith', 'endswith', 'match', 'fullmatch', 'len', 'slice', 'split', 'rsplit', 'get',
+        'zfill', 'pad', 'center', 'ljust', 'rjust', 'extract', 'isdigit', 'isnumeric', 'isalpha', 'isspace',
+    },
+    'dt': {'strftime', 'floor', 'ceil', 'round', 'normalize', 'tz_localize', 'tz_convert', 'day_name', 'month_name'},
+}
+# Row-local only with literal arguments (values, mappings)
+_LOOKUP_METHODS = {'isin', 'map', 'replace'}
+_ROW_LOCAL_TYPES = {'int', 'float', 'str', 'bool'}
+_ROW_LOCAL_FUNCTIONS = {'to_datetime', 'to_numeric', 'to_timedelta', 'isna', 'isnull', 'notna', 'notnull'}
+
+
+def _literal_tree(node):
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        return all(_literal_tree(element) for element in node.elts)
+    if isinstance(node, ast.Dict):
+        return all(key is not None and _literal_tree(key) for key in node.keys) \
+            and all(_literal_tree(value) for value in node.values)
+    try:
+        _literal(node)
+        return True
+    except NotPushable:
+        return isinstance(node, ast.Constant) and node.value is None
+
+
+def _accessor(node):
+    # 'str' / 'dt' for expr.str / expr.dt on a row-local expression
+    if isinstance(node, ast.Attribute) and node.attr in _ROW_LOCAL_ACCESSOR_METHODS and _row_local(node.value):
+        return node.attr
+    return None
+
+
+def _row_local_call(node):
+    arguments = list(node.args) + [keyword.value for keyword in node.keywords]
+    keywords = {keyword.arg: keyword.value for keyword in node.keywords}
+    if not all(_row_local(argument) for argument in arguments):
+        return False
+    func = node.func
+    if not isinstance(func, ast.Attribute):
+        return False
+    if isinstance(func.value, ast.Name) and func.value.id == 'pd':
+        return func.attr in _ROW_LOCAL_FUNCTIONS
+    accessor = _accessor(func.value)
+    if accessor is not None:
+        return func.attr in _ROW_LOCAL_ACCESSOR_METHODS[accessor]
+    if func.attr not in _ROW_LOCAL_METHODS or not _row_local(func.value):
+        return False
+    if func.attr in _LOOKUP_METHODS:
+        # A Series argument is a lookup over the whole column (isin) or its index labels (map, replace)
+        return all(_literal_tree(argument) for argument in arguments)
+    if func.attr in ('rename', 'drop'):
+        # Only column labels; row labels are positions
+        return not node.args and set(keywords) <= {'columns', 'errors'}
+    if func.attr == 'dropna':
+        axis = keywords.get('axis')
+        return not (isinstance(axis, ast.Constant) and axis.value in (1, 'columns'))
+    if func.attr == 'fillna':
+        return 'method' not in keywords and 'limit' not in keywords
+    return True
+
+
+def _row_local(node):
+    if _literal_tree(node):
+        return True
+    if _is_df(node):
+        return True
+    if isinstance(node, ast.Name):
+        # astype(int) and the like
+        return node.id in _ROW_LOCAL_TYPES
+    if isinstance(node, ast.Dict):
+        # assign(**{'name': expr})
+        return all(key is not None and _literal_tree(key) for key in node.keys) \
+            and all(_row_local(value) for value in node.values)
+    if isinstance(node, ast.Attribute):
+        if _is_df(node.value):
+            return _is_column_attribute(node)
+        # expr.str / expr.dt, and properties such as expr.dt.year
+        return _accessor(node) is not None or _accessor(node.value) == 'dt'
+    if isinstance(node, ast.Subscript):
+        if _accessor(node.value) == 'str':
+            # expr.str[0], expr.str[1:3]
+            return isinstance(node.slice, ast.Slice) or _literal_tree(node.slice)
+        if isinstance(node.value, ast.Attribute) and node.value.attr == 'loc' and _is_df(node.value.value):
+            rows, *labels = node.slice.elts if isinstance(node.slice, ast.Tuple) else [node.slice]
+            # df.loc[mask] / df.loc[mask, columns] / df.loc[:, columns]
+            every_row = isinstance(rows, ast.Slice) and rows.lower is rows.upper is rows.step is None
+            return (every_row or (_row_local(rows) and not _literal_tree(rows))) and all(map(_literal_tree, labels))
+        if not _row_local(node.value):
+            return False
+        # Column names, column lists and boolean masks; an integer key would pick a row by position
+        if isinstance(node.slice, ast.Constant):
+            return isinstance(node.slice.value, str)
+        if isinstance(node.slice, ast.List):
+            return all(isinstance(element, ast.Constant) and isinstance(element.value, str) for element in node.slice.elts)
+        return _row_local(node.slice) and not _literal_tree(node.slice)
+    if isinstance(node, ast.BinOp):
+        return _row_local(node.left) and _row_local(node.right)
+    if isinstance(node, ast.UnaryOp):
+        return _row_local(node.operand)
+    if isinstance(node, ast.Compare):
+        return _row_local(node.left) and all(_row_local(c) for c in node.comparators)
+    if isinstance(node, ast.Call):
+        return _row_local_call(node)
+    return False
+
+
+def is_row_local(command):
+    """Whether a step command (df = ..., or df['col'] = ...) maps rows independently of each other."""
+    if not command:
+        return True
+    try:
+        tree = ast.parse(command)
+    except SyntaxError:
+        return False
+    if len(tree.body) != 1 or not isinstance(tree.body[0], ast.Assign) or len(tree.body[0].targets) != 1:
+        return False
+    target = tree.body[0].targets[0]
+    if not (_is_df(target) or (
+        isinstance(target, ast.Subscript) and _is_df(target.value)
+        and isinstance(target.slice, ast.Constant) and isinstance(target.slice.value, str)
+    )):
+        return False
+    return _row_local(tree.body[0].value)
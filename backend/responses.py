@@ -0,0 +1,125 @@
+import json
+import math
+from fastapi import HTTPException, Response
+
+# Response formats for the data preview endpoints, chosen with ?format= or the Accept header:
+#
+#   rows      the endpoint's usual JSON body, with row arrays (default)
+#   columns   columnar JSON: "columns" holds the names and "data" one value array per column
+#   arrow     an Arrow IPC stream; the JSON metadata fields are sent as X-Preview-* headers
+#
+# JSON is written column by column with pandas' C encoder, so cells are never turned into
+# Python objects. NaN and NaT become null and timestamps are ISO 8601 strings. pandas and
+# pyarrow are imported on first use so route modules can import this one at startup.
+
+ARROW_STREAM_TYPE = 'application/vnd.apache.arrow.stream'
+PREVIEW_FORMATS = ('rows', 'columns', 'arrow')
+MAX_PREVIEW_ROWS = 10000
+DOUBLE_PRECISION = 15
+
+
+class RawJSON(str):
+    """Already encoded JSON text that is written into a response body unchanged."""
+
+
+def preview_format(request, format=None):
+    """Resolves the requested preview format from ?format= or, failing that, the Accept header."""
+    if format is None:
+        accept = request.headers.get('accept', '')
+        format = 'arrow' if ARROW_STREAM_TYPE in accept else 'rows'
+    if format not in PREVIEW_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(PREVIEW_FORMATS)}")
+    return format
+
+
+def to_arrow(data):
+    """Converts a preview DataFrame to an Arrow table; Arrow tables are returned as they are."""
+    import pyarrow as pa
+    if isinstance(data, pa.Table):
+        return data
+    try:
+        return pa.Table.from_pandas(data, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Step output can hold mixed-type object columns, which Arrow cannot type
+        mixed = {c: str for c in data.columns[data.dtypes == object]}
+        return pa.Table.from_pandas(data.astype(mixed), preserve_index=False)
+
+
+def _to_frame(data):
+    import pandas as pd
+    if isinstance(data, pd.DataFrame):
+        return data
+    return data.to_pandas(date_as_object=False)
+
+
+def _encode_values(values):
+    return values.to_json(
+        orient='values', date_format='iso', double_precision=DOUBLE_PRECISION, default_handler=str
+    )
+
+
+def json_rows(data):
+    """JSON array of row arrays."""
+    frame = _to_frame(data)
+    if not len(frame.columns):
+        return RawJSON('[' + ','.join('[]' for _ in range(len(frame))) + ']')
+    return RawJSON(_encode_values(frame))
+
+
+def json_columns(data):
+    """JSON array holding one value array per column."""
+    frame = _to_frame(data)
+    return RawJSON('[' + ','.join(_encode_values(frame.iloc[:, i]) for i in range(len(frame.columns))) + ']')
+
+
+def json_line(values):
+    """Encodes a list of Python values (e.g. a row from datasets.table_rows) as one line of
+    JSON, with NaN and infinities as null like the column encoder writes them."""
+    return json.dumps(
+        [None if isinstance(value, float) and not math.isfinite(value) else value for value in values],
+        default=str, allow_nan=False
+    ) + "\n"
+
+
+def encode_object(fields):
+    """Encodes a dict as a JSON object, splicing RawJSON values in without re-parsing them."""
+    return '{' + ','.join(
+        json.dumps(str(key)) + ':' + (value if isinstance(value, RawJSON) else json.dumps(value, default=str))
+        for key, value in fields.items()
+    ) + '}'
+
+
+def json_response(fields):
+    return Response(content=encode_object(fields), media_type='application/json')
+
+
+def arrow_response(data, fields):
+    import pyarrow as pa
+    table = to_arrow(data)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    headers = {
+        'X-Preview-' + ''.join('-' + c.lower() if c.isupper() else c for c in key).title(): str(value)
+        for key, value in fields.items()
+    }
+    return Response(content=sink.getvalue().to_pybytes(), media_type=ARROW_STREAM_TYPE, headers=headers)
+
+
+def preview_response(format, data, rows, fields, header_row=False):
+    """Builds a preview response in the negotiated format.
+
+    `rows` names the field holding the row arrays in the default format and `fields` are the
+    remaining metadata fields, in order. With header_row the column names are sent as the first
+    row, as /objects/preview-data does.
+    """
+    if format == 'arrow':
+        return arrow_response(data, fields)
+    names = list(data.column_names if hasattr(data, 'column_names') else map(str, data.columns))
+    if format == 'columns':
+        return json_response({'columns': names, 'data': json_columns(data), **fields})
+    body = json_rows(data)
+    if header_row:
+        body = RawJSON('[' + json.dumps(names) + (']' if body == '[]' else ',' + body[1:]))
+        return json_response({rows: body, **fields})
+    return json_response({'columns': names, rows: body, **fields})
@@ -1,75 +1,31 @@
-from fastapi import APIRouter, HTTPException, Depends, Cookie, UploadFile
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, Request
 from sqlmodel import Session
-from backend.database import get_db_session
+from backend.database import get_session
 from backend.models import Object, System, User, Space
-import bcrypt
+from backend.listing import list_rows
 import sqlite3
-from fastapi.responses import JSONResponse
-import uuid
 from backend.objects import router as objects_router
-from backend.users import router as users_router
+from backend.users import router as users_router, auth_router
 from backend.systems import router as systems_router
 from backend.configurations import router as configurations_router
 from backend.transformations import router as transformations_router
+from backend.jobs import router as jobs_router
+from backend.metrics import router as metrics_router
 
 router = APIRouter()
 
 # Include routers from modularized files
 router.include_router(users_router, prefix="/users")
+router.include_router(auth_router)
 router.include_router(configurations_router, prefix="/configurations")
 router.include_router(systems_router, prefix="/systems")
 router.include_router(objects_router, prefix="/objects")
 router.include_router(transformations_router, prefix="/transformations")
-
-sessions = {}
-
-@router.post('/register')
-def register_user(user: User):
-    session = get_db_session()
-    hashed_password = bcrypt.hashpw(user.password.encode('utf-8'), bcrypt.gensalt())
-
-    new_user = User(
-        email=user.email,
-        password=hashed_password.decode('utf-8')
-    )
-
-    try:
-        session.add(new_user)
-        session.commit()
-    except Exception as e:
-        session.rollback()
-        raise HTTPException(status_code=400, detail="Email already registered")
-
-    return {"message": "User registered successfully"}
-
-@router.post('/login')
-def login_user(user: User):
-    session = get_db_session()
-    db_user = session.query(User).filter(User.email == user.email).first()
-
-    if not db_user or not bcrypt.checkpw(user.password.encode('utf-8'), db_user.password.encode('utf-8')):
-        raise HTTPException(status_code=401, detail="Invalid credentials")
-
-    session_id = str(uuid.uuid4())
-    sessions[session_id] = db_user.email
-    print(f"Session created: {session_id} for email: {db_user.email}\nCurrent sessions: {sessions}")
-
-    response = JSONResponse(content={"message": "Login successful"})
-    response.set_cookie(key="session_id", value=session_id, httponly=True, samesite="None")
-    return response
-
-@router.get('/validate-session')
-def validate_session(session_id: str = Cookie(None)):
-    print(f"Received session_id: {session_id}\nCurrent sessions: {sessions}")  # Log the session ID and all sessions
-    if session_id in sessions:
-        print(f"Session valid for email: {sessions[session_id]}")  # Log valid session
-        return {"email": sessions[session_id]}
-    print("Invalid session")  # Log invalid session
-    raise HTTPException(status_code=401, detail="Invalid session")
+router.include_router(jobs_router, prefix="/jobs")
+router.include_router(metrics_router)
 
 @router.get('/user-details')
-def get_user_details():
-    conn = get_db_session()
+def get_user_details(conn: Session = Depends(get_session)):
     user = conn.execute('SELECT * FROM users LIMIT 1').fetchone()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -106,28 +62,25 @@ def get_administration():
             {"id": 2, "title": "Administration Item 2", "details": "Details about administration item 2."}]
 
 @router.post('/systems')
-def add_system(system: System):
+def add_system(system: System, session: Session = Depends(get_session)):
     from backend.systems import add_system as add_system_logic
-    return add_system_logic(system)
+    return add_system_logic(system, session)
 
 @router.get('/systems')
-def get_systems():
+def get_systems(request: Request, session: Session = Depends(get_session)):
     from backend.systems import get_systems as get_systems_logic
-    return get_systems_logic()
+    return get_systems_logic(request, session)
 
 @router.put('/systems')
-def update_system(system: System):
+def update_system(system: System, session: Session = Depends(get_session)):
     from backend.systems import update_system as update_system_logic
-    return update_system_logic(system)
+    return update_system_logic(system, session)
 
 @router.get('/spaces')
-def get_spaces():
-    session = get_db_session()
-    spaces = session.query(Space).all()
-    return spaces
+def get_spaces(request: Request, session: Session = Depends(get_session)):
+    return list_rows(request, session, Space)
 
 @router.get('/user-spaces')
-def get_user_spaces(user_id: int):
-    session = get_db_session()
+def get_user_spaces(user_id: int, session: Session = Depends(get_session)):
     spaces = session.query(Space).filter(Space.owner == user_id).all()
     return spaces
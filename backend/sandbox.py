@@ -0,0 +1,254 @@
+import os
+import uuid
+import queue
+import atexit
+import pickle
+import signal
+import tempfile
+import threading
+import multiprocessing
+
+# Step commands run in a pool of pre-started worker processes rather than in the API process.
+#
+# Workers import pandas and pyarrow once at startup and then execute one command at a time
+# under per-execution CPU time and address space limits. DataFrames travel as Arrow IPC files
+# in shared memory (/dev/shm), which both sides memory-map instead of pickling the data; frames
+# Arrow cannot represent (mixed-type object columns) fall back to pickling over the pipe.
+# A worker that dies or overruns the wall-clock timeout is killed and replaced.
+
+STEP_SANDBOX = os.getenv('ODP_STEP_SANDBOX', '1') == '1'
+SANDBOX_WORKERS = int(os.getenv('ODP_SANDBOX_WORKERS', 2))
+STEP_CPU_SECONDS = int(os.getenv('ODP_STEP_CPU_SECONDS', 60))
+STEP_MEMORY_BYTES = int(os.getenv('ODP_STEP_MEMORY_BYTES', 4 * 1024 * 1024 * 1024))
+STEP_TIMEOUT_SECONDS = float(os.getenv('ODP_STEP_TIMEOUT_SECONDS', 120))
+SHM_DIR = os.getenv('ODP_SANDBOX_SHM_DIR', '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir())
+
+
+class StepSandboxError(Exception):
+    """Raised when a step command fails, exceeds its limits or kills its worker."""
+
+
+class StepLimitExceeded(Exception):
+    pass
+
+
+def step_result(df):
+    """Normalizes the index of a frame a step command left in df.
+
+    An unnamed index only holds row labels left over by filters or sorts and is replaced by a
+    fresh RangeIndex, which keeps results identical whether they come from a checkpoint, a
+    pushed-down scan or pandas. A named index (set_index, groupby) is data: it is kept, so a
+    later step can still select by it.
+    """
+    if all(name is None for name in df.index.names):
+        return df.reset_index(drop=True)
+    return df
+
+
+def index_as_columns(df):
+    """The frame with its named index levels turned back into columns, for output. Levels that
+    are unnamed or also kept as a column (set_index(..., drop=False)) are dropped."""
+    dropped = [i for i, name in enumerate(df.index.names) if name is None or name in df.columns]
+    if len(dropped) == df.index.nlevels:
+        return df.reset_index(drop=True)
+    if dropped:
+        df = df.reset_index(level=dropped, drop=True)
+    return df.reset_index()
+
+
+def _write_frame(df):
+    """Returns ('arrow', path) for a frame written to shared memory, or ('pickle', df)."""
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    try:
+        # The pandas metadata restores a kept index on the other side
+        table = pa.Table.from_pandas(df)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError):
+        return ('pickle', df)
+    path = os.path.join(SHM_DIR, f"odp-step-{uuid.uuid4().hex}.arrow")
+    with pa.OSFile(path, 'wb') as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return ('arrow', path)
+
+
+def _read_frame(payload):
+    kind, value = payload
+    if kind == 'pickle':
+        return value
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    # The mapping outlives the unlinked file for as long as Arrow buffers reference it
+    with pa.memory_map(value) as source:
+        table = ipc.open_file(source).read_all()
+    os.unlink(value)
+    return table.to_pandas()
+
+
+def _discard_frame(payload):
+    if payload and payload[0] == 'arrow':
+        try:
+            os.unlink(payload[1])
+        except FileNotFoundError:
+            pass
+
+
+def _on_cpu_limit(signum, frame):
+    raise StepLimitExceeded("CPU time limit exceeded")
+
+
+def _set_limits(resource, cpu_seconds, memory_bytes):
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = usage.ru_utime + usage.ru_stime
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(used + cpu_seconds) + 1
+    resource.setrlimit(resource.RLIMIT_CPU, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+    if memory_bytes and os.path.exists('/proc/self/statm'):
+        with open('/proc/self/statm') as f:
+            mapped = int(f.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        soft = mapped + memory_bytes
+        resource.setrlimit(resource.RLIMIT_AS, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+
+
+def _reset_limits(resource, defaults):
+    for limit, value in defaults.items():
+        resource.setrlimit(limit, value)
+
+
+def _execute(task, resource, defaults):
+    import pandas as pd
+    df = _read_frame(task['input'])
+    local_vars = {"df": df, "pd": pd}
+    try:
+        if resource is not None:
+            _set_limits(resource, task['cpu_seconds'], task['memory_bytes'])
+        try:
+            exec(task['command'], {}, local_vars)
+        finally:
+            if resource is not None:
+                _reset_limits(resource, defaults)
+        result = step_result(local_vars["df"])
+    except MemoryError:
+        return ('error', "Memory limit exceeded")
+    except Exception as e:
+        return ('error', str(e))
+    return ('ok', _write_frame(result))
+
+
+def _worker_main(conn):
+    # Pre-import everything a step needs so executions start immediately
+    import pandas  # noqa: F401
+    import pyarrow.ipc  # noqa: F401
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    defaults = {}
+    if resource is not None:
+        defaults = {limit: resource.getrlimit(limit) for limit in (resource.RLIMIT_CPU, resource.RLIMIT_AS)}
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            return
+        if task is None:
+            return
+        try:
+            reply = _execute(task, resource, defaults)
+        except BaseException as e:
+            reply = ('error', str(e) or e.__class__.__name__)
+        conn.send(reply)
+
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), name='odp-step-worker', daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def run(self, task, timeout):
+        self.conn.send(task)
+        if not self.conn.poll(timeout):
+            raise StepSandboxError(f"Step timed out after {timeout:g}s")
+        return self.conn.recv()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.kill()
+
+
+class StepSandbox:
+    """Fixed-size pool of step worker processes; callers wait for a free worker."""
+
+    def __init__(self, workers=SANDBOX_WORKERS, cpu_seconds=STEP_CPU_SECONDS, memory_bytes=STEP_MEMORY_BYTES,
+                 timeout=STEP_TIMEOUT_SECONDS):
+        self.workers = workers
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.timeout = timeout
+        self._context = multiprocessing.get_context('spawn')
+        self._idle = queue.LifoQueue()
+        self._started = False
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def warm(self):
+        """Starts the worker processes; they finish importing in the background."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            for _ in range(self.workers):
+                self._idle.put(_Worker(self._context))
+
+    def shutdown(self):
+        with self._lock:
+            self._started = False
+            while True:
+                try:
+                    self._idle.get_nowait().stop()
+                except queue.Empty:
+                    break
+
+    def run(self, df, command):
+        """Executes a step command on df in a worker and returns the resulting DataFrame."""
+        self.warm()
+        worker = self._idle.get()
+        payload = _write_frame(df)
+        task = {
+            "command": command,
+            "input": payload,
+            "cpu_seconds": self.cpu_seconds,
+            "memory_bytes": self.memory_bytes
+        }
+        try:
+            status, value = worker.run(task, self.timeout)
+        except (StepSandboxError, EOFError, OSError, pickle.PicklingError) as e:
+            # Timed out, or the worker died (e.g. killed by a limit); replace it
+            worker.kill()
+            worker = _Worker(self._context)
+            if isinstance(e, StepSandboxError):
+                raise
+            raise StepSandboxError(f"Step worker exited unexpectedly: {str(e) or e.__class__.__name__}")
+        finally:
+            _discard_frame(payload)
+            self._idle.put(worker)
+        if status == 'error':
+            raise StepSandboxError(value)
+        return _read_frame(value)
+
+
+step_sandbox = StepSandbox()
@@ -0,0 +1,178 @@
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import delete, insert, select
+from backend.database import engine as default_engine
+from backend.models import LoginSession
+
+# Where login sessions live: "database" (shared by every worker process) or "memory" (one process only)
+SESSION_STORE = os.getenv('ODP_SESSION_STORE', 'database')
+SESSION_TTL_SECONDS = int(os.getenv('ODP_SESSION_TTL_SECONDS', 8 * 3600))
+SESSION_SWEEP_SECONDS = int(os.getenv('ODP_SESSION_SWEEP_SECONDS', 300))
+# Sessions deleted by another process stay valid in this process's cache for at most this long
+SESSION_CACHE_SECONDS = float(os.getenv('ODP_SESSION_CACHE_SECONDS', 5))
+SESSION_CACHE_SIZE = int(os.getenv('ODP_SESSION_CACHE_SIZE', 10000))
+
+
+class SessionStore:
+    """Maps login session ids to user emails until they expire."""
+
+    name = None
+
+    def __init__(self, ttl=SESSION_TTL_SECONDS):
+        self.ttl = ttl
+
+    def create(self, email):
+        """Starts a session for email and returns its id."""
+        raise NotImplementedError
+
+    def get(self, session_id):
+        """Returns the email of a live session, or None."""
+        raise NotImplementedError
+
+    def delete(self, session_id):
+        raise NotImplementedError
+
+    def sweep(self):
+        """Removes expired sessions; returns how many were removed."""
+        raise NotImplementedError
+
+    @staticmethod
+    def new_id():
+        return secrets.token_urlsafe(32)
+
+
+class MemorySessionStore(SessionStore):
+    """Sessions in a dict; only valid while the server runs as a single process."""
+
+    name = 'memory'
+
+    def __init__(self, ttl=SESSION_TTL_SECONDS):
+        super().__init__(ttl)
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create(self, email):
+        session_id = self.new_id()
+        with self._lock:
+            self._sessions[session_id] = (email, time.time() + self.ttl)
+        return session_id
+
+    def get(self, session_id):
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            self.delete(session_id)
+            return None
+        return entry[0]
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def sweep(self):
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (_, expires_at) in self._sessions.items() if expires_at <= now]
+            for key in expired:
+                del self._sessions[key]
+        return len(expired)
+
+
+class DatabaseSessionStore(SessionStore):
+    """Sessions in the login_sessions table, with a small in-process LRU read-through cache.
+
+    Every process sees sessions created by the others because cache misses always go to the
+    database, and expiry is checked against the stored timestamp on each hit. Expired rows
+    are swept at most every SESSION_SWEEP_SECONDS, piggybacking on logins.
+    """
+
+    name = 'database'
+
+    def __init__(self, engine=None, ttl=SESSION_TTL_SECONDS, cache_size=SESSION_CACHE_SIZE,
+                 cache_seconds=SESSION_CACHE_SECONDS):
+        super().__init__(ttl)
+        self.engine = engine or default_engine
+        self.cache_size = cache_size
+        self.cache_seconds = cache_seconds
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    def _cache_put(self, session_id, email, expires_at, now):
+        with self._lock:
+            self._cache[session_id] = (email, expires_at, now + self.cache_seconds)
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _cache_drop(self, session_id):
+        with self._lock:
+            self._cache.pop(session_id, None)
+
+    def create(self, email):
+        session_id = self.new_id()
+        now = time.time()
+        expires_at = now + self.ttl
+        with self.engine.begin() as connection:
+            connection.execute(insert(LoginSession.__table__).values(id=session_id, email=email, expires_at=expires_at))
+        self._cache_put(session_id, email, expires_at, now)
+        if now >= self._next_sweep:
+            self.sweep()
+        return session_id
+
+    def get(self, session_id):
+        if not session_id:
+            return None
+        now = time.time()
+        entry = self._cache.get(session_id)
+        if entry is not None:
+            email, expires_at, valid_until = entry
+            if now < expires_at and now < valid_until:
+                with self._lock:
+                    if session_id in self._cache:
+                        self._cache.move_to_end(session_id)
+                return email
+            self._cache_drop(session_id)
+        table = LoginSession.__table__
+        with self.engine.connect() as connection:
+            row = connection.execute(
+                select(table.c.email, table.c.expires_at).where(table.c.id == session_id, table.c.expires_at > now)
+            ).first()
+        if row is None:
+            return None
+        self._cache_put(session_id, row.email, row.expires_at, now)
+        return row.email
+
+    def delete(self, session_id):
+        self._cache_drop(session_id)
+        with self.engine.begin() as connection:
+            connection.execute(delete(LoginSession.__table__).where(LoginSession.__table__.c.id == session_id))
+
+    def sweep(self):
+        now = time.time()
+        self._next_sweep = now + SESSION_SWEEP_SECONDS
+        with self.engine.begin() as connection:
+            result = connection.execute(
+                delete(LoginSession.__table__).where(LoginSession.__table__.c.expires_at <= now)
+            )
+        return result.rowcount
+
+
+SESSION_STORES = {
+    MemorySessionStore.name: MemorySessionStore,
+    DatabaseSessionStore.name: DatabaseSessionStore,
+}
+
+
+def get_session_store(name=None):
+    name = name or SESSION_STORE
+    if name not in SESSION_STORES:
+        raise ValueError(f"Unknown session store: {name!r}")
+    return SESSION_STORES[name]()
+
+
+session_store = get_session_store()
@@ -1,14 +1,21 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends, Request
 from sqlmodel import Session
-from backend.database import get_db_session
-from backend.models import System
+from backend.database import get_session
+from backend.models import System, SyncState
+from backend.listing import list_rows
+from pydantic import BaseModel
+from typing import Optional
 
 router = APIRouter()
 
-@router.post('/systems')
-def add_system(system: System):
-    session = get_db_session()
+class ExtractRequest(BaseModel):
+    table: str
+    watermark_column: Optional[str] = None
+    full: bool = False
+    chunk_rows: Optional[int] = None
 
+@router.post('/systems')
+def add_system(system: System, session: Session = Depends(get_session)):
     # Validation
     if not system.systemCategory or not system.systemName or not system.hostname or not system.port:
         raise HTTPException(status_code=400, detail="Missing required fields")
@@ -36,29 +43,11 @@ def add_system(system: System):
     return {"message": "System added successfully"}
 
 @router.get('/systems')
-def get_systems():
-    session = get_db_session()
-    systems = session.query(System).all()
-    return [
-        {
-            "id": system.id,
-            "systemCategory": system.systemCategory,
-            "systemName": system.systemName,
-            "hostname": system.hostname,
-            "port": system.port,
-            "sid": system.sid,
-            "schema": system.schema,
-            "username": system.username,
-            "password": system.password,
-            "url": system.url,
-            "connector": system.connector
-        }
-        for system in systems
-    ]
+def get_systems(request: Request, session: Session = Depends(get_session)):
+    return list_rows(request, session, System, aliases={"schema": "db_schema"})
 
 @router.put('/systems')
-def update_system(system: System):
-    session = get_db_session()
+def update_system(system: System, session: Session = Depends(get_session)):
     try:
         existing_system = session.query(System).filter(System.id == system.id).first()
         if not existing_system:
@@ -81,3 +70,41 @@ def update_system(system: System):
         raise HTTPException(status_code=500, detail=f"Failed to update system: {str(e)}")
 
     return {"message": "System updated successfully"}
+
+def _get_system(session, system_id):
+    system = session.get(System, system_id)
+    if not system:
+        raise HTTPException(status_code=404, detail="System not found")
+    return system
+
+@router.get('/{system_id}/tables')
+def get_system_tables(system_id: int, session: Session = Depends(get_session)):
+    from backend.connectors import get_connector, ConnectorError
+    try:
+        return get_connector(_get_system(session, system_id)).list_tables()
+    except ConnectorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post('/{system_id}/extract')
+def extract_system_table(system_id: int, payload: ExtractRequest, session: Session = Depends(get_session)):
+    # Streams the table into bronze; with a watermark column later calls only move new rows
+    from backend.connectors import sync_table, ConnectorError
+    system = _get_system(session, system_id)
+    try:
+        state = sync_table(session, system, payload.table, payload.watermark_column, payload.full, payload.chunk_rows)
+    except ConnectorError as e:
+        session.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "message": f"Extracted {state.last_rows} rows from {payload.table}.",
+        "objectId": state.object_id,
+        "rows": state.last_rows,
+        "totalRows": state.rows_extracted,
+        "watermarkColumn": state.watermark_column,
+        "watermark": state.watermark
+    }
+
+@router.get('/{system_id}/syncs')
+def get_system_syncs(system_id: int, session: Session = Depends(get_session)):
+    _get_system(session, system_id)
+    return session.query(SyncState).filter(SyncState.system_id == system_id).order_by(SyncState.source_table).all()
@@ -1,30 +1,67 @@
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Request, Depends, Query
 from sqlmodel import Session, select
 from pydantic import BaseModel
-from backend.database import get_db_session
-from backend.models import TransformationStep, Object
-import pandas as pd
+from typing import Optional
+from backend.database import get_session
+from backend.models import TransformationStep, Object, StepCode, PublishState
+from backend.jobs import submit_job
+from backend.responses import preview_format, preview_response, MAX_PREVIEW_ROWS
 import os
-import pyarrow as pa
-import pyarrow.parquet as pq
-from dotenv import load_dotenv
+import json
 
-load_dotenv()
+router = APIRouter()
 
-import openai
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# backend.pipeline, backend.delta and backend.codegen (pandas, pyarrow, openai, dotenv) are
+# imported by the endpoints that run steps or read tables, on first use
 
-router = APIRouter()
+class BuiltinStepPayload(BaseModel):
+    step_type: str
+    params: dict = {}
+    step_name: Optional[str] = None
+    step_description: Optional[str] = None
 
-@router.post('/steps/first-row-to-header/{object_id}')
-def add_first_row_to_header(object_id: int):
-    session = get_db_session()
+def _builtin_step(step_type, params):
+    from backend.catalog import Step, CatalogError
+
+    try:
+        return Step(step_type, params)
+    except CatalogError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+@router.post('/steps/first-row-to-header/{object_id}')
+def add_first_row_to_header(object_id: int, session: Session = Depends(get_session)):
     # Create a new transformation step
     transformation_step = TransformationStep(
         object_id=object_id,
         step_name="First Row Promote to Header",
         step_description="Skip the first row and use it as headers",
+        step_type="promote_header",
+        step_params="{}",
+        step_order=session.query(TransformationStep).filter(TransformationStep.object_id == object_id).count() + 1
+    )
+    session.add(transformation_step)
+    session.commit()
+
+    return {"message": "Transformation step added successfully.", "stepId": transformation_step.id}
+
+@router.get('/steps/catalog')
+def get_step_catalog():
+    # Built-in step types accepted by /steps/builtin/{object_id}
+    from backend.catalog import catalog
+    return catalog()
+
+@router.post('/steps/builtin/{object_id}')
+def add_builtin_step(object_id: int, payload: BuiltinStepPayload, session: Session = Depends(get_session)):
+    from backend.catalog import STEP_TYPES
+
+    step = _builtin_step(payload.step_type, payload.params)
+    description = payload.step_description or STEP_TYPES[step.step_type].description
+    transformation_step = TransformationStep(
+        object_id=object_id,
+        step_name=payload.step_name or description,
+        step_description=description,
+        step_type=step.step_type,
+        step_params=json.dumps(step.params),
         step_order=session.query(TransformationStep).filter(TransformationStep.object_id == object_id).count() + 1
     )
     session.add(transformation_step)
@@ -33,17 +70,14 @@ def add_first_row_to_header(object_id: int):
     return {"message": "Transformation step added successfully.", "stepId": transformation_step.id}
 
 @router.get('/steps/{object_id}')
-def get_transformation_steps(object_id: int):
-    session = get_db_session()
+def get_transformation_steps(object_id: int, session: Session = Depends(get_session)):
     steps = session.query(TransformationStep).filter(TransformationStep.object_id == object_id).order_by(TransformationStep.step_order).all()
 
     # Return an empty list if no steps are found
     return steps if steps else []
 
 @router.delete('/steps/delete/{step_id}')
-def remove_transformation_step(step_id: int):
-    session = get_db_session()
-
+def remove_transformation_step(step_id: int, session: Session = Depends(get_session)):
     # Find the step to delete
     step = session.query(TransformationStep).filter(TransformationStep.id == step_id).first()
 
@@ -56,9 +90,7 @@ def remove_transformation_step(step_id: int):
     return {"message": "Transformation step removed successfully."}
 
 @router.post('/steps/add-step/{object_id}')
-def add_step(object_id: int, payload: TransformationStep):
-    session = get_db_session()
-
+def add_step(object_id: int, payload: TransformationStep, session: Session = Depends(get_session)):
     # Create a new transformation step with provided name and description
     transformation_step = TransformationStep(
         object_id=object_id,
@@ -71,6 +103,31 @@ def add_step(object_id: int, payload: TransformationStep):
 
     return {"message": "Transformation step added successfully.", "stepId": transformation_step.id}
 
+@router.put('/steps/update/{step_id}')
+def update_step(step_id: int, payload: TransformationStep, session: Session = Depends(get_session)):
+    step = session.query(TransformationStep).filter(TransformationStep.id == step_id).first()
+
+    if not step:
+        raise HTTPException(status_code=404, detail="Transformation step not found")
+
+    # A new description invalidates the generated command unless one is supplied
+    if payload.step_type:
+        builtin = _builtin_step(payload.step_type, json.loads(payload.step_params) if payload.step_params else {})
+        step.step_type = builtin.step_type
+        step.step_params = json.dumps(builtin.params)
+        step.step_command = None
+    elif payload.step_command:
+        step.step_command = payload.step_command
+        step.step_type = step.step_params = None
+    elif payload.step_description != step.step_description:
+        step.step_command = None
+    step.step_name = payload.step_name
+    step.step_description = payload.step_description
+    step.status = "Open"
+    session.commit()
+
+    return {"message": "Transformation step updated successfully.", "stepId": step.id}
+
 def get_object_data_path(object_id: int):
     base_path = f"delta-lake/bronze/upload/{object_id}"
     parquet_path = base_path + ".parquet"
@@ -83,16 +140,28 @@ def get_object_data_path(object_id: int):
         raise HTTPException(status_code=404, detail=f"Data file not found for object {object_id}.")
 
 @router.post('/preview/steps/{step_id}')
-def preview_step_by_step_id(step_id: int, payload: dict, request: Request):
-    session = get_db_session()
+def preview_step_by_step_id(
+    step_id: int,
+    payload: dict,
+    request: Request,
+    limit: int = Query(100, ge=1, le=MAX_PREVIEW_ROWS, description="Number of rows to return"),
+    format: str = Query(None, description="Response format: rows, columns or arrow (default: from the Accept header)"),
+    session: Session = Depends(get_session)
+):
+    from backend.pipeline import run_steps, StepExecutionError
+    from backend.codegen import generate_step_code
+    from backend.catalog import Step, step_operation
+
+    format = preview_format(request, format)
     step = session.query(TransformationStep).filter(TransformationStep.id == step_id).first()
     if not step:
         raise HTTPException(status_code=404, detail="Transformation step not found")
     object_id = step.object_id
     step_description = step.step_description
 
-    steps = session.query(TransformationStep).filter(TransformationStep.object_id == object_id and TransformationStep.id <= step.obejct_id)
-    
+    # Steps that run before this one, in pipeline order
+    steps = session.query(TransformationStep).filter(TransformationStep.object_id == object_id).order_by(TransformationStep.step_order, TransformationStep.id).all()
+    previous_steps = steps[:[s.id for s in steps].index(step.id)]
 
     obj = session.query(Object).filter(Object.id == object_id).first()
     if not obj:
@@ -109,77 +178,159 @@ def preview_step_by_step_id(step_id: int, payload: dict, request: Request):
         session.commit()
         raise HTTPException(status_code=400, detail="Missing 'step_description' in step record.")
     try:
-        if file_path.endswith(".parquet"):
-            df = pd.read_parquet(file_path)
-        else:
-            df = pd.read_csv(file_path)
+        commands = [step_operation(s) for s in previous_steps]
+        operation = step_operation(step)
+        # Output of the previous steps, resumed from the deepest memoized prefix
+        df = run_steps(file_path, commands)
+    except StepExecutionError as e:
+        step.status = "Failed"
+        session.commit()
+        raise HTTPException(status_code=500, detail=f"Failed to apply step {previous_steps[e.index].id}: {e}")
     except Exception as e:
         step.status = "Failed"
         session.commit()
         raise HTTPException(status_code=500, detail=f"Failed to load data: {e}")
     try:
-        if step_description.strip() != "Show all rows":
-            prompt = (
-                f"You are a Python data scientist. "
-                f"Given the following pandas DataFrame 'df', write a single line of pandas code to {step_description}. "
-                f"The available columns in 'df' are: {list(df.columns)}. "
-                f"If the user makes a typo or mistake in a column name, use the closest matching column name from the available columns. "
-                f"Do not include any explanations, only the code. "
-                f"Example: df = df[df['column'] == 'value']"
-            )
+        if isinstance(operation, Step):
+            try:
+                df = run_steps(file_path, commands + [operation])
+            except StepExecutionError as e:
+                step.status = "Failed"
+                session.commit()
+                raise HTTPException(status_code=400, detail=f"Step could not be applied: {e}")
+        elif step.step_command or step_description.strip() != "Show all rows":
             try:
-                response = openai.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "You are a helpful assistant for pandas data transformations."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=100,
-                    temperature=0
-                )
-                code = response.choices[0].message.content.strip()
-                step.step_command = code
+                code = step.step_command
+                if not code:
+                    code = generate_step_code(session, step_description, df)
+                    step.step_command = code
                 if not code.startswith("df ="):
                     step.status = "Failed"
                     session.commit()
                     raise Exception("Generated code is not valid for execution.")
-                local_vars = {"df": df}
-                exec(code, {}, local_vars)
-                df = local_vars["df"]
+                # Only this step runs; the previous prefix comes from its checkpoint
+                df = run_steps(file_path, commands + [code])
             except Exception as e:
                 step.status = "Failed"
                 session.commit()
                 raise HTTPException(status_code=500, detail=f"OpenAI or code execution error: {e}")
         step.status = "Success"
         session.commit()
+    except HTTPException:
+        raise
     except Exception as e:
         step.status = "Failed"
         session.commit()
         raise HTTPException(status_code=500, detail=f"Unexpected error: {e}")
+    return preview_response(format, df.head(limit), "rows", {"message": "Step previewed successfully."})
+
+@router.get('/steps/{object_id}/scan-plan')
+def get_scan_plan(object_id: int, session: Session = Depends(get_session)):
+    # Shows which leading steps are pushed down into the Parquet scan
+    from backend.pipeline import scan_plan
+    from backend.catalog import step_operation
+
+    obj = session.query(Object).filter(Object.id == object_id).first()
+    if not obj or not obj.data_path or not os.path.exists(obj.data_path):
+        raise HTTPException(status_code=404, detail="Object data not found")
+    steps = session.query(TransformationStep).filter(TransformationStep.object_id == object_id).order_by(TransformationStep.step_order, TransformationStep.id).all()
+    plan = scan_plan(obj.data_path, [step_operation(step) for step in steps])
+    return plan.to_dict() if plan else {"pushedSteps": 0, "filter": None, "columns": None}
+
+@router.get('/codegen/stats')
+def get_codegen_stats(session: Session = Depends(get_session)):
+    from backend.codegen import get_generator, code_cache_stats
     return {
-        "columns": list(df.columns),
-        "rows": df.head(100).values.tolist(),
-        "message": "Step previewed successfully."
+        "generator": get_generator().name,
+        "hits": code_cache_stats.hits,
+        "misses": code_cache_stats.misses,
+        "entries": session.query(StepCode).count()
     }
 
 @router.get('/steps/object/{object_id}')
-def get_steps_for_object(object_id: int):
-    session = get_db_session()
+def get_steps_for_object(object_id: int, session: Session = Depends(get_session)):
     steps = session.query(TransformationStep).filter(TransformationStep.object_id == object_id).order_by(TransformationStep.step_order).all()
     return [
         {
             'id': step.id,
             'step_name': step.step_name,
             'step_description': step.step_description,
-            'step_order': step.step_order
+            'step_order': step.step_order,
+            'step_type': step.step_type
         }
         for step in steps
     ]
 
+def silver_table_path(input_path):
+    """Silver Delta table directory for a bronze data path."""
+    return os.path.splitext(input_path.replace('/bronze/', '/silver/'))[0]
+
 @router.post("/publish-to-silver/{object_id}")
-def publish_to_silver(object_id: int):
+def publish_to_silver(object_id: int, mode: str = "incremental", session: Session = Depends(get_session)):
+    if mode not in ("incremental", "overwrite", "append"):
+        raise HTTPException(status_code=400, detail="mode must be 'incremental', 'overwrite' or 'append'")
+    # Publishing runs on the job worker pool; poll /jobs/{jobId} for the outcome
+    job = submit_job(session, "publish-to-silver", object_id, mode=mode)
+    return {"status": "queued", "jobId": job.id, "message": "Publish to Silver Layer queued."}
+
+def _conform(table, schema):
+    # The new rows' table in the silver schema, or None when their column types differ from a rebuild's
+    import pyarrow as pa
+
+    if table.schema.names != schema.names:
+        return None
+    for field, target in zip(table.schema, schema):
+        # A column that is entirely missing in the new rows has no type of its own
+        if not (field.type.equals(target.type) or pa.types.is_null(field.type)):
+            return None
+    return table.cast(schema)
+
+def _publish_increment(session, object_id, input_path, commands, silver, snapshot, plan, fingerprint, progress):
+    """Runs the steps over the bronze rows after the high-water mark and appends them to silver.
+
+    Returns the job result, or None when the new rows would change the silver schema.
+    """
+    from backend.pipeline import run_rows, StepExecutionError, PipelineCancelled
+    from backend.incremental import clear_publish, record_publish
+    from backend.datasets import file_signature
+
+    signature = file_signature(input_path)
+    try:
+        table = run_rows(input_path, plan.start_row, commands, progress)
+    except PipelineCancelled:
+        raise
+    except StepExecutionError as e:
+        return {"status": "failed", "message": f"Failed to apply step {e.index + 1} to the new rows: {e}"}
+    except Exception as e:
+        return {"status": "failed", "message": f"Failed to load data: {e}"}
+    try:
+        table = _conform(table, snapshot.schema)
+        if table is None:
+            return None
+        version = silver.write(table, mode='append') if table.num_rows else snapshot.version
+        if version == snapshot.version + (1 if table.num_rows else 0) and file_signature(input_path) == signature:
+            record_publish(session, object_id, input_path, commands, version, fingerprint)
+        else:
+            # Something else changed the source or the table meanwhile; rebuild next time
+            clear_publish(session, object_id)
+        return {"status": "success", "message": f"Appended {table.num_rows} new rows to Silver Layer: {silver.table_path} (version {version})"}
+    except Exception as e:
+        return {"status": "failed", "message": f"Failed to write to silver layer: {e}"}
+
+def publish_object(session, object_id, progress=None, mode="incremental"):
+    """Runs every step of an object and commits the result to its silver Delta table.
+
+    'incremental' runs the steps only over bronze rows added since the last publish when that
+    gives the same table as a rebuild (see incremental.py), and rebuilds otherwise; 'overwrite'
+    always rebuilds and 'append' adds the whole result to the table again.
+    """
+    from backend.pipeline import run_steps, StepExecutionError, PipelineCancelled
+    from backend.delta import DeltaTable
+    from backend.datasets import file_signature
+    from backend.incremental import APPEND, CURRENT, clear_publish, plan_publish, record_publish, source_fingerprint
+    from backend.catalog import step_operation
+
     # Fetch the object and steps
-    session = get_db_session()
     obj = session.query(Object).filter(Object.id == object_id).first()
     if not obj:
         return {"status": "failed", "message": "Object not found."}
@@ -189,31 +340,86 @@ def publish_to_silver(object_id: int):
     input_path = obj.data_path or obj.objectName
     if not input_path or not os.path.exists(input_path):
         return {"status": "failed", "message": "Original file not found."}
-    # Load the data (CSV or Parquet)
     try:
-        if input_path.endswith('.parquet'):
-            df = pd.read_parquet(input_path)
-        else:
-            df = pd.read_csv(input_path)
+        commands = [step_operation(step) for step in steps]
+    except ValueError as e:
+        # CatalogError, or step_params that are not JSON
+        return {"status": "failed", "message": f"Invalid built-in step: {e}"}
+    silver_path = silver_table_path(input_path)
+    silver = DeltaTable(silver_path)
+    # Taken before reading, so rows appended while publishing count as new next time
+    signature = file_signature(input_path)
+    fingerprint = source_fingerprint(input_path)
+    rebuild = ""
+    if mode == "incremental":
+        snapshot = silver.snapshot()
+        plan = plan_publish(session.get(PublishState, object_id), input_path, commands, snapshot.version)
+        if plan.action == CURRENT:
+            return {"status": "success", "message": f"Silver Layer is up to date: {silver_path} (version {snapshot.version})"}
+        if plan.action == APPEND:
+            result = _publish_increment(session, object_id, input_path, commands, silver, snapshot, plan, fingerprint, progress)
+            if result is not None:
+                return result
+            plan.reason = "new rows change the column types"
+        rebuild = f", rebuilt: {plan.reason}"
+        mode = "overwrite"
+    # Load the data (CSV or Parquet) and apply each step's command, reusing memoized prefixes
+    try:
+        table = run_steps(input_path, commands, progress, as_table=True)
+    except PipelineCancelled:
+        raise
+    except StepExecutionError as e:
+        return {"status": "failed", "message": f"Failed to apply step {steps[e.index].id}: {e}"}
     except Exception as e:
         return {"status": "failed", "message": f"Failed to load data: {e}"}
-    # Apply each step's command
-    for step in steps:
-        if step.step_command:
-            try:
-                local_vars = {"df": df, "pd": pd}
-                exec(step.step_command, {}, local_vars)
-                df = local_vars["df"]
-            except Exception as e:
-                return {"status": "failed", "message": f"Failed to apply step {step.id}: {e}"}
-    # Write to silver layer as Parquet
+    # Commit to the silver layer as a new version of the object's Delta table
     try:
-        silver_dir = input_path.replace('/bronze/', '/silver/')
-        silver_dir = os.path.dirname(silver_dir)
-        os.makedirs(silver_dir, exist_ok=True)
-        silver_path = os.path.join(silver_dir, os.path.splitext(os.path.basename(input_path))[0] + '.parquet')
-        table = pa.Table.from_pandas(df)
-        pq.write_table(table, silver_path)
-        return {"status": "success", "message": f"Published to Silver Layer: {silver_path}"}
+        version = silver.write(table, mode=mode)
+        if mode == "overwrite" and file_signature(input_path) == signature:
+            record_publish(session, object_id, input_path, commands, version, fingerprint)
+        else:
+            clear_publish(session, object_id)
+        return {"status": "success", "message": f"Published to Silver Layer: {silver_path} (version {version}{rebuild})"}
     except Exception as e:
         return {"status": "failed", "message": f"Failed to write to silver layer: {e}"}
+
+def _silver_table(session, object_id):
+    from backend.delta import DeltaTable
+
+    obj = session.query(Object).filter(Object.id == object_id).first()
+    if not obj:
+        raise HTTPException(status_code=404, detail="Object not found")
+    table = DeltaTable(silver_table_path(obj.data_path or obj.objectName))
+    if not table.exists():
+        raise HTTPException(status_code=404, detail="Object has not been published to the silver layer")
+    return table
+
+@router.get('/silver/{object_id}')
+def get_silver_data(
+    object_id: int,
+    request: Request,
+    version: int = Query(None, ge=0, description="Table version to read (default: latest)"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(15, ge=1, le=MAX_PREVIEW_ROWS),
+    format: str = Query(None, description="Response format: rows, columns or arrow (default: from the Accept header)"),
+    session: Session = Depends(get_session)
+):
+    from backend.delta import DeltaError
+
+    format = preview_format(request, format)
+    table = _silver_table(session, object_id)
+    try:
+        snapshot = table.snapshot(version)
+        page = snapshot.read_page(offset, limit)
+    except DeltaError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return preview_response(format, page, "previewData", {
+        "version": snapshot.version,
+        "offset": offset,
+        "limit": limit,
+        "totalRows": snapshot.num_rows
+    }, header_row=True)
+
+@router.get('/silver/{object_id}/history')
+def get_silver_history(object_id: int, session: Session = Depends(get_session)):
+    return _silver_table(session, object_id).history()
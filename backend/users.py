@@ -1,25 +1,18 @@
-from fastapi import APIRouter, HTTPException, Cookie
+from fastapi import APIRouter, HTTPException, Cookie, Depends, Request
 from sqlmodel import Session
-from backend.database import get_db_session
+from backend.database import get_session
 from backend.models import User, Space
-import bcrypt
-import uuid
+from backend.listing import list_rows
+from backend.session_store import session_store
+from backend.passwords import password_hasher, hash_password, verify_password, PasswordHasherBusy
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 
 router = APIRouter()
+# Registration, login and session checks; served under /users and at the API root
+auth_router = APIRouter()
 
-sessions = {}
-
-@router.post('/register')
-def register_user(user: User):
-    session = get_db_session()
-    hashed_password = bcrypt.hashpw(user.password.encode('utf-8'), bcrypt.gensalt())
-
-    new_user = User(
-        email=user.email,
-        password=hashed_password.decode('utf-8')
-    )
-
+def _add_user(session, new_user):
     try:
         session.add(new_user)
         session.commit()
@@ -27,45 +20,65 @@ def register_user(user: User):
         session.rollback()
         raise HTTPException(status_code=400, detail="Email already registered")
 
+@auth_router.post('/register')
+async def register_user(user: User, session: Session = Depends(get_session)):
+    # Hashing runs on the bcrypt pool and database work on the request threadpool
+    new_user = User(
+        email=user.email,
+        password=await hash_password(user.password)
+    )
+
+    await run_in_threadpool(_add_user, session, new_user)
+
     return {"message": "User registered successfully"}
 
-@router.post('/login')
-def login_user(user: User):
-    session = get_db_session()
-    db_user = session.query(User).filter(User.email == user.email).first()
+def _find_credentials(session, email):
+    row = session.query(User.id, User.email, User.password).filter(User.email == email).first()
+    # End the transaction so no pooled connection is held while bcrypt runs
+    session.rollback()
+    return row
 
-    if not db_user or not bcrypt.checkpw(user.password.encode('utf-8'), db_user.password.encode('utf-8')):
+def _update_password(session, user_id, password):
+    session.query(User).filter(User.id == user_id).update({User.password: password})
+    session.commit()
+
+@auth_router.post('/login')
+async def login_user(user: User, session: Session = Depends(get_session)):
+    db_user = await run_in_threadpool(_find_credentials, session, user.email)
+
+    if not db_user or not await verify_password(user.password, db_user.password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    session_id = str(uuid.uuid4())
-    sessions[session_id] = db_user.email
+    if password_hasher.needs_rehash(db_user.password):
+        # Stored with another work factor; upgrade it now that the plain password is known
+        try:
+            password = await password_hasher.hash(user.password)
+            await run_in_threadpool(_update_password, session, db_user.id, password)
+        except PasswordHasherBusy:
+            pass
+
+    session_id = await run_in_threadpool(session_store.create, db_user.email)
 
     response = JSONResponse(content={"message": "Login successful"})
-    response.set_cookie(key="session_id", value=session_id, httponly=True, samesite="None")
+    response.set_cookie(
+        key="session_id", value=session_id, max_age=session_store.ttl, httponly=True, samesite="None"
+    )
     return response
 
-@router.get('/validate-session')
+@auth_router.get('/validate-session')
 def validate_session(session_id: str = Cookie(None)):
-    if session_id in sessions:
-        return {"email": sessions[session_id]}
+    email = session_store.get(session_id)
+    if email is not None:
+        return {"email": email}
     raise HTTPException(status_code=401, detail="Invalid session")
 
-@router.post('/create-user')
-def create_user(user: User):
-    session = get_db_session()
-    hashed_password = bcrypt.hashpw(user.password.encode('utf-8'), bcrypt.gensalt())
-
-    new_user = User(
-        email=user.email,
-        password=hashed_password.decode('utf-8')
-    )
-
+def _add_user_with_space(session, new_user):
     try:
         session.add(new_user)
         session.commit()
 
         # Automatically create a space for the user
-        space_name = f"space_{user.email.split('@')[0]}"
+        space_name = f"space_{new_user.email.split('@')[0]}"
         new_space = Space(name=space_name, owner=new_user.id)
         session.add(new_space)
         session.commit()
@@ -73,10 +86,19 @@ def create_user(user: User):
         session.rollback()
         raise HTTPException(status_code=400, detail="Email already registered")
 
+@router.post('/create-user')
+async def create_user(user: User, session: Session = Depends(get_session)):
+    new_user = User(
+        email=user.email,
+        password=await hash_password(user.password)
+    )
+
+    await run_in_threadpool(_add_user_with_space, session, new_user)
+
     return {"message": "User and space created successfully."}
 
+router.include_router(auth_router)
+
 @router.get('/list')
-def get_users():
-    session = get_db_session()
-    users = session.query(User).all()
-    return users
+def get_users(request: Request, session: Session = Depends(get_session)):
+    return list_rows(request, session, User, exclude=('password',))
@@ -0,0 +1,108 @@
+"""Auth throughput benchmark.
+
+Starts the app under uvicorn on a scratch copy of the database, then measures
+GET /objects/list latency on its own and while client threads log in
+continuously. Reports login throughput and how many logins were turned away
+with 503 by the bounded hashing queue.
+
+    ODP_BCRYPT_ROUNDS=12 python benchmarks/bench_auth.py --login-threads 32 --seconds 10
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_concurrency import free_port, start_server
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000 if ordered else float('nan')
+
+
+def measure_catalog(base, seconds):
+    import httpx
+
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    with httpx.Client(timeout=60) as client:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            client.get(f'{base}/objects/list')
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def login_load(base, credentials, threads, stop, counts):
+    import httpx
+
+    def worker():
+        with httpx.Client(timeout=60) as client:
+            while not stop.is_set():
+                status = client.post(f'{base}/login', json=credentials).status_code
+                with lock:
+                    counts[status] = counts.get(status, 0) + 1
+
+    lock = threading.Lock()
+    workers = [threading.Thread(target=worker, daemon=True) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    return workers
+
+
+def report(label, latencies):
+    print(f"{label:<28} requests={len(latencies):<6} p50={percentile(latencies, 0.5):8.2f} ms  "
+          f"p95={percentile(latencies, 0.95):8.2f} ms  p99={percentile(latencies, 0.99):8.2f} ms  "
+          f"mean={statistics.fmean(latencies) * 1000 if latencies else float('nan'):8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--login-threads', type=int, nargs='+', default=[8, 32])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--database', default='dna.db', help="SQLite file to copy as the benchmark database")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='odp-bench-')
+    database = os.path.join(workdir, 'bench.db')
+    if os.path.exists(args.database):
+        shutil.copy(args.database, database)
+    os.environ['DATABASE_URL'] = database
+    print(f"database: {os.environ['DATABASE_URL']}")
+
+    import httpx
+    from backend.passwords import password_hasher
+    print(f"bcrypt rounds={password_hasher.rounds} hash workers={password_hasher.workers}")
+
+    port = free_port()
+    server = start_server(port)
+    base = f'http://127.0.0.1:{port}'
+    credentials = {"email": f"bench-{uuid.uuid4().hex[:8]}@example.com", "password": "bench-password"}
+    try:
+        httpx.post(f'{base}/register', json=credentials, timeout=60).raise_for_status()
+        report('GET /objects/list idle', measure_catalog(base, args.seconds))
+        for threads in args.login_threads:
+            stop = threading.Event()
+            counts = {}
+            workers = login_load(base, credentials, threads, stop, counts)
+            latencies = measure_catalog(base, args.seconds)
+            stop.set()
+            for thread in workers:
+                thread.join()
+            report(f'GET /objects/list +{threads} login', latencies)
+            print(f"{'':<28} logins ok={counts.get(200, 0) / args.seconds:.1f}/s  "
+                  f"rejected (503)={counts.get(503, 0)}  other={sum(counts.values()) - counts.get(200, 0) - counts.get(503, 0)}")
+    finally:
+        server.should_exit = True
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
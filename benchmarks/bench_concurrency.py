@@ -0,0 +1,92 @@
+"""Concurrency benchmark for the catalog API.
+
+Starts the app under uvicorn on a scratch copy of the database and measures
+requests/sec for GET /objects/list and for transformation-step inserts while
+several client threads hit the server in parallel.
+
+    python benchmarks/bench_concurrency.py --threads 16 --requests 2000
+"""
+import argparse
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port):
+    import uvicorn
+    from backend.main import app
+
+    config = uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning', access_log=False)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def run(label, threads, total, request):
+    import httpx
+
+    local = threading.local()
+    errors = []
+
+    def call(i):
+        if not hasattr(local, 'client'):
+            local.client = httpx.Client(timeout=60)
+        response = request(local.client, i)
+        if response.status_code >= 400:
+            errors.append(response.status_code)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(call, range(total)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} threads={threads:<3} requests={total:<6} "
+          f"{total / elapsed:9.1f} req/s  errors={len(errors)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--database', default='dna.db', help="SQLite file to copy as the benchmark database")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='odp-bench-')
+    database = os.path.join(workdir, 'bench.db')
+    if os.path.exists(args.database):
+        shutil.copy(args.database, database)
+    os.environ['DATABASE_URL'] = database
+    print(f"database: {os.environ['DATABASE_URL']}")
+
+    port = free_port()
+    server = start_server(port)
+    base = f'http://127.0.0.1:{port}'
+    step = {"step_name": "bench", "step_description": "Show all rows", "step_order": 0, "object_id": 1}
+    try:
+        for threads in args.threads:
+            run('GET /objects/list', threads, args.requests,
+                lambda client, i: client.get(f'{base}/objects/list'))
+            run('POST add-step', threads, args.requests,
+                lambda client, i: client.post(f'{base}/transformations/steps/add-step/1', json=step))
+    finally:
+        server.should_exit = True
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Lineage benchmark for the object relation index.
+
+Fills a scratch SQLite database with a random relation graph and compares the
+cached adjacency index against direct queries: index build, the per-request
+refresh check, /object-relations/{id} lookups and multi-hop traversals.
+
+    python benchmarks/bench_lineage.py --edges 100000 --objects 20000 --depth 3
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def timed(label, count, func):
+    start = time.perf_counter()
+    for i in range(count):
+        func(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} runs={count:<6} {elapsed / count * 1000:9.3f} ms/op")
+
+
+def query_traverse(session, ObjectRelation, object_id, max_depth):
+    # Baseline: one query per frontier node, as a request handler would do without the index
+    seen, frontier, nodes = {object_id}, [object_id], 0
+    for _ in range(max_depth):
+        next_frontier = []
+        for current in frontier:
+            rows = session.query(ObjectRelation.related_object_id).filter(ObjectRelation.object_id == current).all()
+            for (neighbor,) in rows:
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    next_frontier.append(neighbor)
+        nodes += len(next_frontier)
+        frontier = next_frontier
+    return nodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--edges', type=int, default=100000)
+    parser.add_argument('--objects', type=int, default=20000)
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--lookups', type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='odp-bench-')
+    os.environ['DATABASE_URL'] = os.path.join(workdir, 'bench.db')
+
+    from sqlalchemy import insert
+    from sqlmodel import Session
+    from backend.database import engine, init_db
+    from backend.models import ObjectRelation
+    from backend.lineage import RelationIndex
+
+    rng = random.Random(42)
+    rows = [
+        {"object_id": rng.randrange(args.objects), "related_object_id": rng.randrange(args.objects),
+         "source_attribute_id": 0, "target_attribute_id": 0, "relation_type": "one-to-many", "status": "active"}
+        for _ in range(args.edges)
+    ]
+    init_db()
+    try:
+        with Session(engine) as session:
+            start = time.perf_counter()
+            session.execute(insert(ObjectRelation), rows)
+            session.commit()
+            print(f"inserted {args.edges} edges over {args.objects} objects in {time.perf_counter() - start:.2f}s")
+
+            index = RelationIndex()
+            start = time.perf_counter()
+            index.refresh(session)
+            print(f"index build: {time.perf_counter() - start:.2f}s")
+
+            targets = [rng.randrange(args.objects) for _ in range(args.lookups)]
+            timed('refresh (no changes)', args.lookups, lambda i: index.refresh(session))
+            timed('outgoing: query', args.lookups, lambda i: session.query(ObjectRelation)
+                  .filter(ObjectRelation.object_id == targets[i]).all())
+            timed('outgoing: index', args.lookups, lambda i: index.outgoing(targets[i]))
+            timed(f'downstream depth={args.depth}: query', min(args.lookups, 20),
+                  lambda i: query_traverse(session, ObjectRelation, targets[i], args.depth))
+            timed(f'downstream depth={args.depth}: index', args.lookups,
+                  lambda i: index.traverse(targets[i], 'downstream', args.depth))
+            timed(f'upstream depth={args.depth}: index', args.lookups,
+                  lambda i: index.traverse(targets[i], 'upstream', args.depth))
+            timed('all edges: index', 10, lambda i: index.all_edges())
+    finally:
+        engine.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
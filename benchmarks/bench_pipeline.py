@@ -0,0 +1,299 @@
+"""Ingest -> transform -> publish benchmark on synthetic customer data.
+
+For every dataset size (rows x width, see synthetic.py) the app is driven in-process
+on a scratch database and working directory:
+
+  upload         objects.upload_file on the generated CSV (called directly: the test
+                 client buffers whole request bodies, which would dominate memory)
+  preview        first GET /objects/preview-data page from the middle of the object
+  preview-warm   the same page again, averaged over --repeat calls
+  step-preview   POST /transformations/preview/steps for a filter + derived-column step
+  publish        POST /transformations/publish-to-silver, until the job has finished
+  publish-builtin  the same steps as built-in catalog steps (one fused Arrow scan), published
+                 again; unlike publish it has no step-preview checkpoint to start from
+
+Each stage records latency, rows/s and the peak RSS of this process and its workers
+(step sandbox, job pool), after an untimed pass over a small dataset has loaded the
+data modules and started the workers. Results are compared with a stored baseline and
+the exit status is 1 when a stage fails or gets slower / larger than the thresholds allow.
+Baselines are per machine: record one with --save-baseline before comparing.
+
+    python benchmarks/bench_pipeline.py --rows 10000 100000 --widths narrow wide
+    python benchmarks/bench_pipeline.py --rows 10000000 --save-baseline
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import WIDTHS, columns, dataset
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'pipeline.json')
+STEPS = [
+    ("Keep four countries", "df = df[df['Country'].isin(['Norway', 'Chile', 'India', 'Japan'])]"),
+    ("Add full name", "df = df.assign(**{'Full Name': df['First Name'] + ' ' + df['Last Name']})"),
+]
+# STEPS as built-in steps of backend.catalog
+BUILTIN_STEPS = [
+    ("filter", {"column": "Country", "op": "in", "value": ["Norway", "Chile", "India", "Japan"]}),
+    ("derive", {"column": "Full Name", "expression": {"function": "binary_join_element_wise", "args": [
+        {"column": "First Name"}, {"column": "Last Name"}, {"value": " "}]}}),
+]
+JOB_POLL_SECONDS = 0.01
+WARMUP_ROWS = 1000
+
+
+def _process_rss(pid):
+    with open(f'/proc/{pid}/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def tree_rss(pid):
+    """Resident memory of pid and all of its descendants, from /proc."""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            total += _process_rss(current)
+        except OSError:
+            continue
+        pending.extend(children.get(current, ()))
+    return total
+
+
+class PeakRss:
+    """Samples the process tree's RSS in the background while the block runs."""
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        if os.path.isdir('/proc'):
+            self.peak = max(self.peak, tree_rss(os.getpid()))
+        else:
+            # Lifetime peak of this process only
+            self.peak = max(self.peak, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+def measure(name, stage, rows, func, repeat=1):
+    error = None
+    with PeakRss() as rss:
+        start = time.perf_counter()
+        try:
+            for _ in range(repeat):
+                func()
+        except Exception as e:
+            error = f"{e.__class__.__name__}: {e}"
+        seconds = (time.perf_counter() - start) / repeat
+    return {
+        "dataset": name,
+        "stage": stage,
+        "rows": rows,
+        "seconds": seconds,
+        "rowsPerSecond": rows / seconds if seconds else 0,
+        "peakRssMb": rss.peak / 2 ** 20,
+        "error": error
+    }
+
+
+def checked(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+    return response
+
+
+def run_dataset(client, path, rows, width, repeat):
+    from fastapi import UploadFile
+    from sqlmodel import Session
+    from backend.database import engine
+    from backend.models import TransformationStep
+    from backend.objects import upload_file
+
+    name = f"{rows}x{len(columns(width))}"
+    results = []
+    state = {}
+
+    def upload():
+        with Session(engine) as session, open(path, 'rb') as f:
+            state['object_id'] = upload_file(UploadFile(f, filename=f'{name}.csv'), session)['objectId']
+
+    results.append(measure(name, 'upload', rows, upload))
+    if 'object_id' not in state:
+        return results
+    object_id = state['object_id']
+
+    page = {'offset': rows // 2, 'limit': 100}
+    preview = lambda: checked(client.get(f'/objects/preview-data/{object_id}', params=page))
+    results.append(measure(name, 'preview', rows, preview))
+    results.append(measure(name, 'preview-warm', rows, preview, repeat))
+
+    with Session(engine) as session:
+        steps = [
+            TransformationStep(object_id=object_id, step_name=step_name, step_description=step_name,
+                               step_command=command, step_order=order)
+            for order, (step_name, command) in enumerate(STEPS, 1)
+        ]
+        session.add_all(steps)
+        session.commit()
+        step_ids = [step.id for step in steps]
+    last_step = step_ids[-1]
+    results.append(measure(name, 'step-preview', rows, lambda: checked(
+        client.post(f'/transformations/preview/steps/{last_step}', json={}, params={'limit': 100})
+    )))
+
+    def publish():
+        job_id = checked(client.post(f'/transformations/publish-to-silver/{object_id}',
+                                     params={'mode': 'overwrite'})).json()['jobId']
+        while True:
+            job = checked(client.get(f'/jobs/{job_id}')).json()
+            if job['status'] not in ('queued', 'running'):
+                break
+            time.sleep(JOB_POLL_SECONDS)
+        if job['status'] != 'succeeded':
+            raise RuntimeError(job.get('message') or job['status'])
+
+    results.append(measure(name, 'publish', rows, publish))
+
+    with Session(engine) as session:
+        for step_id, (step_type, params) in zip(step_ids, BUILTIN_STEPS):
+            step = session.get(TransformationStep, step_id)
+            step.step_type = step_type
+            step.step_params = json.dumps(params)
+        session.commit()
+    results.append(measure(name, 'publish-builtin', rows, publish))
+    return results
+
+
+def compare(result, baseline, threshold, slack):
+    """Returns (note, regressed) for one result against its baseline entry."""
+    if result['error']:
+        return 'FAILED', True
+    base = baseline.get(f"{result['dataset']}/{result['stage']}")
+    if base is None:
+        return 'no baseline', False
+    notes = []
+    regressed = False
+    if result['seconds'] > base['seconds'] * (1 + threshold) + slack:
+        regressed = True
+        notes.append('SLOWER')
+    if result['peakRssMb'] > base['peakRssMb'] * (1 + threshold):
+        regressed = True
+        notes.append('LARGER')
+    change = (result['seconds'] / base['seconds'] - 1) * 100 if base['seconds'] else 0
+    return f"{change:+6.1f}% time {' '.join(notes)}".rstrip(), regressed
+
+
+def save_baseline(path, results, baseline):
+    for result in results:
+        if not result['error']:
+            baseline[f"{result['dataset']}/{result['stage']}"] = {
+                "seconds": result['seconds'], "peakRssMb": result['peakRssMb']
+            }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--widths', nargs='+', choices=sorted(WIDTHS), default=['narrow'])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=5, help="Calls averaged for preview-warm")
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'odp-bench-data'),
+                        help="Where generated datasets are kept between runs")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the baseline")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Allowed relative slowdown / RSS growth")
+    parser.add_argument('--slack-ms', type=float, default=20, help="Absolute slowdown always allowed")
+    parser.add_argument('--output', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    datasets = []
+    for width in args.widths:
+        for rows in args.rows:
+            start = time.perf_counter()
+            path = dataset(args.data_dir, rows, width, args.seed)
+            print(f"dataset {rows}x{len(columns(width))}: {path} ({time.perf_counter() - start:.1f}s)")
+            datasets.append((path, rows, width))
+
+    workdir = tempfile.mkdtemp(prefix='odp-bench-')
+    os.environ['DATABASE_URL'] = os.path.join(workdir, 'bench.db')
+    os.environ.setdefault('ODP_CODEGEN_BACKEND', 'rules')
+    cwd = os.getcwd()
+    # Bronze and silver files are written relative to the working directory
+    os.chdir(workdir)
+    results = []
+    try:
+        from fastapi.testclient import TestClient
+        from backend.main import app
+
+        with TestClient(app) as client:
+            run_dataset(client, dataset(args.data_dir, WARMUP_ROWS, 'narrow', args.seed), WARMUP_ROWS, 'narrow', 1)
+            for path, rows, width in datasets:
+                results.extend(run_dataset(client, path, rows, width, args.repeat))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = 0
+    for result in results:
+        note, regressed = compare(result, baseline, args.threshold, args.slack_ms / 1000)
+        regressions += regressed
+        print(f"{result['dataset']:<14} {result['stage']:<15} {result['seconds'] * 1000:10.1f} ms "
+              f"{result['rowsPerSecond']:13.0f} rows/s {result['peakRssMb']:8.0f} MB  {note}")
+        if result['error']:
+            print(f"    {result['error']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        save_baseline(args.baseline, results, baseline)
+        print(f"baseline saved to {args.baseline}")
+    elif regressions:
+        print(f"{regressions} regression(s) against {args.baseline}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""Cold start benchmark for the API server.
+
+Measures, in fresh interpreters on a scratch copy of the database:
+
+  import          time to import backend.main, and which data libraries it loaded
+  first response  time from launching uvicorn until GET /api/hello answers
+  first preview   latency of the first and second GET /objects/preview-data call
+
+with and without ODP_PREWARM (data modules imported while the app is built).
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_concurrency import free_port
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('pandas', 'pyarrow', 'numpy', 'openai', 'dotenv')
+
+IMPORT_SCRIPT = f"""
+import json, sys, time
+start = time.perf_counter()
+import backend.main
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def environment(workdir, prewarm):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    env['DATABASE_URL'] = os.path.join(workdir, 'bench.db')
+    env['ODP_PREWARM'] = '1' if prewarm else '0'
+    return env
+
+
+def measure_import(workdir, prewarm):
+    output = subprocess.run(
+        [sys.executable, '-c', IMPORT_SCRIPT], env=environment(workdir, prewarm), cwd=workdir,
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def launch(workdir, prewarm, port):
+    return subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'backend.main:app', '--host', '127.0.0.1', '--port', str(port),
+         '--log-level', 'warning'],
+        env=environment(workdir, prewarm), cwd=workdir
+    )
+
+
+def wait_until_up(client, url, timeout=60):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if client.get(url).status_code == 200:
+                return
+        except Exception:
+            pass
+        time.sleep(0.005)
+    raise RuntimeError(f"Server did not answer {url} within {timeout}s")
+
+
+def timed_get(client, url):
+    start = time.perf_counter()
+    response = client.get(url)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def measure_server(workdir, prewarm, object_id):
+    import httpx
+
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    start = time.perf_counter()
+    process = launch(workdir, prewarm, port)
+    try:
+        with httpx.Client(timeout=60) as client:
+            wait_until_up(client, base + '/api/hello')
+            first_response = time.perf_counter() - start
+            preview = f'{base}/objects/preview-data/{object_id}?limit=100'
+            return first_response, timed_get(client, preview), timed_get(client, preview)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def upload_fixture(workdir, rows):
+    """Uploads a generated CSV through a throwaway server and returns its object id."""
+    import httpx
+
+    path = os.path.join(workdir, 'startup.csv')
+    with open(path, 'w') as f:
+        f.write('id,name,amount\n')
+        for i in range(rows):
+            f.write(f'{i},name{i % 100},{i * 0.5}\n')
+    port = free_port()
+    process = launch(workdir, False, port)
+    try:
+        with httpx.Client(timeout=60) as client:
+            wait_until_up(client, f'http://127.0.0.1:{port}/api/hello')
+            with open(path, 'rb') as f:
+                response = client.post(f'http://127.0.0.1:{port}/objects/upload-file', files={'file': ('startup.csv', f)})
+            response.raise_for_status()
+            return response.json()['objectId']
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def median_ms(values):
+    return statistics.median(values) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--rows', type=int, default=100000, help="Rows in the previewed object")
+    parser.add_argument('--database', default='dna.db', help="SQLite file to copy as the benchmark database")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='odp-bench-')
+    if os.path.exists(args.database):
+        shutil.copy(args.database, os.path.join(workdir, 'bench.db'))
+    try:
+        object_id = upload_fixture(workdir, args.rows)
+        for prewarm in (False, True):
+            label = 'prewarm' if prewarm else 'lazy'
+            imports = [measure_import(workdir, prewarm) for _ in range(args.runs)]
+            servers = [measure_server(workdir, prewarm, object_id) for _ in range(args.runs)]
+            print(f"{label:<8} import {median_ms([i['seconds'] for i in imports]):8.1f} ms  "
+                  f"loaded={','.join(imports[-1]['loaded']) or '-'}")
+            print(f"{label:<8} first response {median_ms([s[0] for s in servers]):8.1f} ms  "
+                  f"first preview {median_ms([s[1] for s in servers]):8.1f} ms  "
+                  f"second preview {median_ms([s[2] for s in servers]):8.1f} ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
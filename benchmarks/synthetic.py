@@ -0,0 +1,153 @@
+"""Synthetic customer datasets for the benchmarks.
+
+Files have the columns of uploads/customers-10000.csv; wider variants append numeric,
+integer and categorical metric columns. Generation is seeded, so the same rows, width
+and seed always produce the same file, and it is written chunk by chunk with Arrow so
+that 10M-row files do not need to fit in memory.
+
+    python benchmarks/synthetic.py --rows 1000000 --width wide out.csv
+"""
+import argparse
+import os
+import sys
+
+CUSTOMER_COLUMNS = [
+    'Index', 'Customer Id', 'First Name', 'Last Name', 'Company', 'City', 'Country',
+    'Phone 1', 'Phone 2', 'Email', 'Subscription Date', 'Website'
+]
+# Number of metric columns added after the customer columns
+WIDTHS = {'narrow': 0, 'wide': 48}
+CHUNK_ROWS = 250000
+
+FIRST_NAMES = [
+    'Heather', 'Kristina', 'Briana', 'Russell', 'Michael', 'Olivia', 'Darius', 'Marcia', 'Yvonne', 'Jamal',
+    'Priya', 'Chen', 'Sofia', 'Mateo', 'Aisha', 'Lars', 'Ingrid', 'Kenji', 'Fatima', 'Diego'
+]
+LAST_NAMES = [
+    'Callahan', 'Ferrell', 'Shah', 'Mosley', 'Horn', 'Pugh', 'Escobar', 'Watson', 'Donovan', 'Reese',
+    'Nakamura', 'Okafor', 'Lindqvist', 'Moreau', 'Kowalski', 'Haddad', 'Silva', 'Novak', 'Gupta', 'Byrne'
+]
+CITIES = [
+    'Lake Jeffborough', 'Aaronville', 'East Jordan', 'Port Hannah', 'West Marcus', 'New Sandra',
+    'North Kevin', 'South Amy', 'Lisaland', 'Millerberg', 'Davisburgh', 'Brownmouth'
+]
+COUNTRIES = [
+    'Norway', 'Andorra', 'Chile', 'India', 'Japan', 'Kenya', 'Brazil', 'Germany', 'Canada', 'Poland',
+    'Egypt', 'Peru', 'Vietnam', 'Ireland', 'Morocco', 'Portugal'
+]
+DOMAINS = ['example.com', 'mail.net', 'post.org', 'inbox.info', 'corp.biz']
+CATEGORIES = ['bronze', 'silver', 'gold', 'platinum']
+
+
+def columns(width='narrow'):
+    extra = WIDTHS[width]
+    return CUSTOMER_COLUMNS + [f'Metric {i:02d}' for i in range(1, extra + 1)]
+
+
+def _pools(rng):
+    import pyarrow as pa
+
+    companies = [
+        f'{a}-{b}' if i % 3 else f'{a}, {b} and {c}'
+        for i, (a, b, c) in enumerate(zip(LAST_NAMES, LAST_NAMES[7:] + LAST_NAMES[:7], LAST_NAMES[13:] + LAST_NAMES[:13]))
+    ]
+    phones = [
+        f'{a:03d}-{b:03d}-{c:04d}' if i % 2 else f'({a:03d}){b:03d}-{c:04d}x{i % 9999}'
+        for i, (a, b, c) in enumerate(zip(rng.integers(200, 999, 5000), rng.integers(0, 999, 5000), rng.integers(0, 9999, 5000)))
+    ]
+    return {
+        'hex': pa.array([f'{v:08X}' for v in rng.integers(0, 2 ** 32, 65536)]),
+        'first': pa.array(FIRST_NAMES),
+        'last': pa.array(LAST_NAMES),
+        'company': pa.array(companies),
+        'city': pa.array(CITIES),
+        'country': pa.array(COUNTRIES),
+        'phone': pa.array(phones),
+        'user': pa.array([f'{f.lower()}.{l.lower()}' for f in FIRST_NAMES for l in LAST_NAMES]),
+        'domain': pa.array(DOMAINS),
+        'site': pa.array([f'https://www.{l.lower()}.com/' for l in LAST_NAMES] + [f'http://{l.lower()}.org/' for l in LAST_NAMES]),
+        'category': pa.array(CATEGORIES),
+    }
+
+
+def _chunk(rng, pools, start, rows, extra):
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    def pick(name):
+        pool = pools[name]
+        return pool.take(pa.array(rng.integers(0, len(pool), rows)))
+
+    arrays = [
+        pa.array(np.arange(start + 1, start + rows + 1)),
+        pc.binary_join_element_wise(pick('hex'), pick('hex'), ''),
+        pick('first'),
+        pick('last'),
+        pick('company'),
+        pick('city'),
+        pick('country'),
+        pick('phone'),
+        pick('phone'),
+        pc.binary_join_element_wise(pick('user'), pick('domain'), '@'),
+        pa.array(rng.integers(18262, 20089, rows).astype('int32')).cast(pa.date32()),
+        pick('site'),
+    ]
+    for i in range(extra):
+        kind = i % 3
+        if kind == 0:
+            arrays.append(pa.array(rng.normal(1000, 250, rows).round(2)))
+        elif kind == 1:
+            arrays.append(pa.array(rng.integers(0, 100000, rows)))
+        else:
+            arrays.append(pick('category'))
+    return arrays
+
+
+def write_customers(path, rows, width='narrow', seed=42, chunk_rows=CHUNK_ROWS):
+    """Writes a customer-shaped CSV with rows data rows to path and returns path."""
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.csv as pv
+
+    rng = np.random.default_rng(seed)
+    pools = _pools(rng)
+    names = columns(width)
+    tmp_path = path + '.tmp'
+    writer = None
+    try:
+        for start in range(0, rows, chunk_rows):
+            count = min(chunk_rows, rows - start)
+            table = pa.Table.from_arrays(_chunk(rng, pools, start, count, WIDTHS[width]), names=names)
+            if writer is None:
+                writer = pv.CSVWriter(tmp_path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, path)
+    return path
+
+
+def dataset(directory, rows, width='narrow', seed=42):
+    """Returns the path of a generated dataset in directory, generating it on first use."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'customers-{rows}-{width}-{seed}.csv')
+    if not os.path.exists(path):
+        write_customers(path, rows, width, seed)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--width', choices=sorted(WIDTHS), default='narrow')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    write_customers(args.path, args.rows, args.width, args.seed)
+    print(f"wrote {args.rows} rows x {len(columns(args.width))} columns to {args.path}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
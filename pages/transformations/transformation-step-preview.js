@@ -205,10 +205,17 @@ export default function TransformationPreviewData({ selectedObject, setSelectedO
       const res = await axios.post(
         `${process.env.NEXT_PUBLIC_API_URL}/transformations/publish-to-silver/${selectedObject.id}`
       );
-      if (res.data && (res.data.success || res.data.status === 'success')) {
-        toast.success(res.data.message || 'Published to Silver Layer!', { autoClose: 5000 });
+      // Publishing runs as a background job; poll it until it finishes
+      let job = res.data;
+      while (job && job.jobId && (job.status === 'queued' || job.status === 'running')) {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        const jobRes = await axios.get(`${process.env.NEXT_PUBLIC_API_URL}/jobs/${job.jobId}/progress`);
+        job = jobRes.data;
+      }
+      if (job && (job.success || job.status === 'success' || job.status === 'succeeded')) {
+        toast.success(job.message || 'Published to Silver Layer!', { autoClose: 5000 });
       } else {
-        toast.error(res.data.message || 'Failed to publish to Silver Layer', { autoClose: 5000 });
+        toast.error((job && job.message) || 'Failed to publish to Silver Layer', { autoClose: 5000 });
       }
     } catch (err) {
       toast.error('Failed to publish to Silver Layer', { autoClose: 5000 });
@@ -0,0 +1,25 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# The backend reads its configuration at import time: point it at a scratch database and run
+# step commands in-process
+_SCRATCH = tempfile.mkdtemp(prefix='odp-tests-')
+os.environ['DATABASE_URL'] = os.path.join(_SCRATCH, 'test.db')
+os.environ['ODP_STEP_SANDBOX'] = '0'
+os.environ['ODP_SPILL_CHECKPOINTS'] = '0'
+os.environ.setdefault('ODP_CODEGEN_BACKEND', 'rules')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    # Runs in a scratch directory, where delta-lake/ is created
+    from sqlmodel import Session
+    from backend.database import engine, init_db
+    monkeypatch.chdir(tmp_path)
+    init_db()
+    with Session(engine) as session:
+        yield session
@@ -0,0 +1,37 @@
+import os
+
+from backend.bronze import blob_path, link_blob, new_blob, release_blob, remove_files
+from backend.models import BronzeBlob, Object
+
+CONTENT_HASH = 'ab' * 32
+
+
+def _object(session, name):
+    obj = Object(objectCategory='File', objectName=name, connector='File', systemId=0, dataLayer='Bronze')
+    blob = new_blob(CONTENT_HASH, 3, [], 1)
+    obj.data_path = link_blob(session, blob, os.path.join('delta-lake', 'bronze', f'{name}.parquet'))
+    obj.content_hash = CONTENT_HASH
+    session.add(obj)
+    session.commit()
+    return obj
+
+
+def test_release_keeps_files_until_commit(session):
+    with open(blob_path(CONTENT_HASH), 'wb') as f:
+        f.write(b'abc')
+    first, second = _object(session, 'first'), _object(session, 'second')
+    paths = release_blob(session, second)
+    assert paths == [second.data_path]
+    session.rollback()
+    # Nothing is lost when the delete does not commit
+    assert os.path.exists(second.data_path)
+    assert session.get(BronzeBlob, CONTENT_HASH).ref_count == 2
+
+    for obj in (second, first):
+        paths = release_blob(session, obj)
+        session.delete(obj)
+        session.commit()
+        remove_files(paths)
+    assert paths == [first.data_path, blob_path(CONTENT_HASH)]
+    assert session.get(BronzeBlob, CONTENT_HASH) is None
+    assert not any(os.path.exists(path) for path in (first.data_path, second.data_path, blob_path(CONTENT_HASH)))
@@ -0,0 +1,26 @@
+import pandas as pd
+
+from backend import codegen
+from backend.codegen import code_cache_stats, flush_hits, generate_step_code
+from backend.models import StepCode
+
+
+def test_cache_hits_are_written_in_batches(session, monkeypatch):
+    monkeypatch.setattr(codegen, 'HIT_FLUSH_COUNT', 3)
+    code_cache_stats.take_pending()
+    df = pd.DataFrame({'id': [1], 'name': ['a']})
+    command = generate_step_code(session, "keep columns id", df)
+    key = session.query(StepCode).one().cache_key
+
+    def stored_hits():
+        session.expire_all()
+        return session.get(StepCode, key).hits
+
+    for _ in range(2):
+        assert generate_step_code(session, "keep columns id", df) == command
+    assert stored_hits() == 0
+    generate_step_code(session, "keep columns id", df)
+    assert stored_hits() == 3
+    generate_step_code(session, "keep columns id", df)
+    flush_hits(session)
+    assert stored_hits() == 4
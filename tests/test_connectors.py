@@ -0,0 +1,55 @@
+import os
+import sqlite3
+from types import SimpleNamespace
+import pytest
+import pyarrow.parquet as pq
+
+from backend import connectors
+from backend.connectors import ConnectorError, bronze_table_path, sync_table
+from backend.models import Object, System
+
+
+def test_bronze_path_stays_in_system_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    system = SimpleNamespace(connector='Postgres', id=7)
+    directory = os.path.realpath('delta-lake/bronze/postgres/7')
+    paths = [bronze_table_path(system, name) for name in ['../../x', '/etc/passwd', 'a/b', 'a_b', 'orders']]
+    assert all(os.path.dirname(os.path.realpath(path)) == directory for path in paths)
+    assert len(set(paths)) == len(paths)
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = str(tmp_path / 'source.db')
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE orders (id INTEGER, amount REAL)")
+        connection.executemany("INSERT INTO orders VALUES (?, ?)", [(i, i * 1.5) for i in range(10)])
+    system = System(
+        systemCategory='Database', systemName='shop', hostname=path, port=0, username='', password='',
+        connector='sqlite'
+    )
+    return path, system
+
+
+def test_incremental_sync_appends_row_groups(session, source):
+    path, system = source
+    session.add(system)
+    session.commit()
+    state = sync_table(session, system, 'orders', watermark_column='id')
+    with sqlite3.connect(path) as connection:
+        connection.executemany("INSERT INTO orders VALUES (?, ?)", [(i, i * 1.5) for i in range(10, 15)])
+    state = sync_table(session, system, 'orders')
+    assert state.last_rows == 5
+    data_path = session.get(Object, state.object_id).data_path
+    assert pq.read_table(data_path).column('id').to_pylist() == list(range(15))
+
+
+def test_incremental_sync_refuses_oversized_files(session, source, monkeypatch):
+    path, system = source
+    session.add(system)
+    session.commit()
+    sync_table(session, system, 'orders', watermark_column='id')
+    monkeypatch.setattr(connectors, 'APPEND_MAX_BYTES', 1)
+    with pytest.raises(ConnectorError, match='full sync'):
+        sync_table(session, system, 'orders')
+    assert sync_table(session, system, 'orders', full=True).last_rows == 10
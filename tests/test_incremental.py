@@ -0,0 +1,84 @@
+import os
+import pytest
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from backend.connectors import _append_parquet
+from backend.delta import DeltaTable
+from backend.models import Object, TransformationStep
+from backend.pushdown import is_row_local
+from backend.transformations import publish_object, silver_table_path
+
+# Commands accepted as row-local: publishing only the appended rows must give the same
+# silver table as rebuilding it from the whole source
+ROW_LOCAL_COMMANDS = [
+    "df = df[df['country'] == 'Norway']",
+    "df = df[(df['amount'] > 10) & df['country'].isin(['Chile', 'Peru'])]",
+    "df = df[['id', 'country']]",
+    "df = df.loc[df['id'] % 3 == 0, ['id', 'amount']]",
+    "df = df.rename(columns={'country': 'Country'})",
+    "df = df.drop(columns=['name'])",
+    "df = df.dropna(subset=['amount'])",
+    "df = df.assign(**{'label': df['name'] + '-' + df['country']})",
+    "df['amount'] = df['amount'].fillna(0).round(1) * 2",
+    "df['upper'] = df['name'].str.upper().str[:3]",
+    "df['code'] = df['country'].map({'Norway': 'NO', 'Chile': 'CL'})",
+    "df['country'] = df['country'].replace({'Peru': 'PE'})",
+    "df['big'] = df['amount'].where(df['amount'] > 50, 0)",
+    "df['n'] = pd.to_numeric(df['id']).astype(float)",
+]
+NOT_ROW_LOCAL_COMMANDS = [
+    "df = df[df['country'].isin(df['name'])]",
+    "df['x'] = df['country'].map(df['name'])",
+    "df['x'] = df['country'].replace(df['name'])",
+    "df['x'] = df['amount'] - df['amount'].mean()",
+    "df = df.drop_duplicates()",
+    "df = df.head(5)",
+]
+COUNTRIES = ['Norway', 'Chile', 'Peru', 'Japan']
+
+
+def _batch(start, stop):
+    ids = list(range(start, stop))
+    return pa.table({
+        'id': ids,
+        'name': [f'n{i % 7}' for i in ids],
+        'country': [COUNTRIES[i % len(COUNTRIES)] for i in ids],
+        'amount': [i * 1.5 if i % 5 else None for i in ids],
+    })
+
+
+def _silver(path):
+    return DeltaTable(silver_table_path(path)).snapshot().to_table()
+
+
+@pytest.mark.parametrize('command', ROW_LOCAL_COMMANDS)
+def test_incremental_publish_matches_rebuild(session, command):
+    assert is_row_local(command)
+    path = os.path.abspath('bronze/source.parquet')
+    os.makedirs(os.path.dirname(path))
+    pq.write_table(_batch(0, 200), path, row_group_size=64)
+    obj = Object(objectCategory='test', objectName='source', connector='test', systemId=0, data_path=path)
+    session.add(obj)
+    session.commit()
+    session.add(TransformationStep(object_id=obj.id, step_name='step', step_description='step',
+                                   step_command=command, step_order=1))
+    session.commit()
+
+    assert publish_object(session, obj.id)['status'] == 'success'
+    pq.write_table(_batch(200, 300), 'increment.parquet')
+    _append_parquet(path, 'increment.parquet')
+    result = publish_object(session, obj.id)
+    assert result['status'] == 'success'
+    assert result['message'].startswith('Appended'), result['message']
+    incremental = _silver(path)
+
+    assert publish_object(session, obj.id, mode='overwrite')['status'] == 'success'
+    rebuilt = _silver(path)
+    assert incremental.schema.equals(rebuilt.schema)
+    assert incremental.equals(rebuilt)
+
+
+@pytest.mark.parametrize('command', NOT_ROW_LOCAL_COMMANDS)
+def test_whole_column_commands_are_not_row_local(command):
+    assert not is_row_local(command)
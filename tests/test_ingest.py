@@ -0,0 +1,73 @@
+import io
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from backend import ingest
+from backend.ingest import IngestError, convert_batch, csv_to_parquet, ingest_csv, unique_names
+
+
+def _csv(rows, tail=b''):
+    return b"id,amount\n" + b"".join(b"%d,%d\n" % (i, i * 2) for i in range(rows)) + tail
+
+
+def test_later_non_numeric_value_widens_column_to_string(tmp_path):
+    path = str(tmp_path / 'out.parquet')
+    # Far beyond the first block, where the column types were inferred
+    source = io.BytesIO(_csv(200000, b"ABC,1\n"))
+    headers, rows = csv_to_parquet(source, path, block_size=1024 * 1024)
+    table = pq.read_table(path)
+    assert headers == ['id', 'amount'] and rows == 200001
+    assert table.schema.field('id').type == pa.string()
+    assert table.schema.field('amount').type == pa.int64()
+    assert table.column('id')[-1].as_py() == 'ABC' and table.column('id')[0].as_py() == '0'
+
+
+def test_widened_column_is_profiled_from_the_second_read(tmp_path):
+    csv_path = tmp_path / 'in.csv'
+    csv_path.write_bytes(_csv(200000, b"ABC,1\n"))
+    profiles, rows = ingest_csv(str(csv_path), str(tmp_path / 'out.parquet'))
+    assert rows == 200001
+    assert [profile['attribute_name'] for profile in profiles] == ['id', 'amount']
+
+
+def test_repeated_headers_are_renamed_like_pandas(tmp_path):
+    path = str(tmp_path / 'out.parquet')
+    headers, _ = csv_to_parquet(io.BytesIO(b"a,a,b,a.1,a\n1,2,3,4,5\n"), path)
+    assert headers == ['a', 'a.2', 'b', 'a.1', 'a.3']
+    assert pq.read_table(path).column_names == headers
+    assert unique_names(['x', 'x', 'x']) == ['x', 'x.1', 'x.2']
+
+
+def test_convert_batch_fails_only_the_broken_file(tmp_path):
+    good = tmp_path / 'good.csv'
+    good.write_text('a,b\n1,2\n3,4\n')
+    results = convert_batch([
+        (str(good), str(tmp_path / 'good.parquet')),
+        (str(good), str(tmp_path / 'missing' / 'bad.parquet')),
+        (str(tmp_path / 'absent.csv'), str(tmp_path / 'absent.parquet')),
+    ])
+    assert results[0][1] == 2
+    assert all(isinstance(result, IngestError) for result in results[1:])
+    assert 'worker failed' not in str(results[1])
+
+
+def test_all_failing_columns_are_widened_in_one_retry(tmp_path, monkeypatch):
+    calls = []
+    convert = ingest._convert
+    monkeypatch.setattr(ingest, '_convert', lambda *args: calls.append(args) or convert(*args))
+    rows = b"".join(b"%d,%d,%d\n" % (i, i * 2, i) for i in range(200000))
+    source = io.BytesIO(b"id,amount,flag\n" + rows + b"1,x,2\n" + rows + b"y,3,4\n" + b"5,6,NA\n")
+    path = str(tmp_path / 'out.parquet')
+    headers, row_count = csv_to_parquet(source, path, block_size=1024 * 1024)
+    schema = pq.read_schema(path)
+    assert row_count == 400003 and len(calls) == 2
+    assert [schema.field(name).type for name in headers] == [pa.string(), pa.string(), pa.int64()]
+
+
+def test_memory_cap_ignores_other_allocations(tmp_path):
+    # Memory another upload allocates meanwhile does not count against this conversion
+    held = []
+    headers, row_count = csv_to_parquet(io.BytesIO(_csv(200000)), str(tmp_path / 'out.parquet'),
+                                        block_size=1024 * 1024, max_memory=8 * 1024 * 1024,
+                                        on_batch=lambda batch: held.append(pa.allocate_buffer(16 * 1024 * 1024)))
+    assert row_count == 200000 and len(held) > 1
@@ -0,0 +1,56 @@
+import random
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from backend import joins
+from backend.joins import RelationJoin
+
+
+@pytest.fixture
+def sources(tmp_path):
+    rng = random.Random(7)
+    orders = pa.table({
+        'id': list(range(3000)),
+        'customer': [rng.choice([None] + list(range(60))) for _ in range(3000)],
+        'region': [rng.choice(['n', 's', None]) for _ in range(3000)],
+    })
+    customers = pa.table({
+        'customer': [rng.choice([None] + list(range(80))) for _ in range(400)],
+        'region': [rng.choice(['n', 's', None]) for _ in range(400)],
+        'name': [f'c{i}' for i in range(400)],
+    })
+    paths = str(tmp_path / 'orders.parquet'), str(tmp_path / 'customers.parquet')
+    pq.write_table(orders, paths[0])
+    pq.write_table(customers, paths[1])
+    return paths, orders, customers
+
+
+def _rows(table):
+    return sorted(zip(*(column.to_pylist() for column in table.columns)), key=repr)
+
+
+@pytest.mark.parametrize('how', ['inner', 'left'])
+@pytest.mark.parametrize('keys', [['customer'], ['customer', 'region']])
+@pytest.mark.parametrize('memory_bytes', [None, 1024])
+def test_join_matches_arrow(sources, monkeypatch, how, keys, memory_bytes):
+    monkeypatch.setattr(joins, 'JOIN_BATCH_ROWS', 500)
+    (orders_path, customers_path), orders, customers = sources
+    join = RelationJoin(
+        'orders', orders_path, [('customers', customers_path, [f'orders.{k}' for k in keys], keys)],
+        how=how, memory_bytes=memory_bytes
+    )
+    with join:
+        assert bool(join.spilled) == (memory_bytes is not None)
+        result = pa.concat_tables(join.batches(10 ** 6))
+    # Table.join over typed key copies, as the joins module did before hashing build sides once
+    left, right = orders.rename_columns([f'orders.{c}' for c in orders.column_names]), \
+        customers.rename_columns([f'customers.{c}' for c in customers.column_names])
+    for i, key in enumerate(keys):
+        left = left.append_column(f'k{i}', left.column(f'orders.{key}'))
+        right = right.append_column(f'k{i}', right.column(f'customers.{key}'))
+    copies = [f'k{i}' for i in range(len(keys))]
+    expected = left.join(right, keys=copies, join_type=joins.JOIN_TYPES[how]).drop_columns(copies)
+    assert result.num_rows > 0
+    assert _rows(result.select(sorted(result.column_names))) == \
+        _rows(expected.select(sorted(result.column_names)))
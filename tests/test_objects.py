@@ -0,0 +1,12 @@
+from fastapi.testclient import TestClient
+
+from backend.main import create_app
+from backend.models import TransformationStep
+
+
+def test_first_row_to_header_routes_create_builtin_steps(session):
+    client = TestClient(create_app())
+    for path in ('/objects/transformations/first-row-to-header/1', '/transformations/steps/first-row-to-header/1'):
+        step_id = client.post(path).json()['stepId']
+        step = session.get(TransformationStep, step_id)
+        assert (step.step_type, step.step_params) == ('promote_header', '{}')
@@ -0,0 +1,54 @@
+import os
+import pytest
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from backend import pipeline
+
+
+def test_spill_failure_is_swallowed(tmp_path, monkeypatch):
+    # A file in place of the checkpoint directory makes every write fail
+    blocked = tmp_path / 'checkpoints'
+    blocked.write_text('')
+    monkeypatch.setattr(pipeline, 'CHECKPOINT_DIR', str(blocked))
+    pipeline.spill_checkpoint('key', pa.table({'a': [1, 2]}))
+    assert blocked.is_file()
+
+
+def test_spill_leaves_no_temporary_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, 'CHECKPOINT_DIR', str(tmp_path))
+    table = pa.table({'a': [1, 2]})
+    pipeline.spill_checkpoint('key', table)
+    pipeline.spill_checkpoint('key', table)
+    assert os.listdir(tmp_path) == ['key.arrow']
+    pipeline.checkpoint_cache.clear()
+    assert pipeline.load_checkpoint('key').equals(table)
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = str(tmp_path / 'source.parquet')
+    pq.write_table(pa.table({'c': ['a', 'b', 'a', 'c'], 'v': [1, 2, 3, 4]}), path)
+    return path
+
+
+def test_groupby_keeps_grouping_column(source):
+    result = pipeline.run_steps(source, ["df = df.groupby('c').sum()"])
+    assert result.to_dict('list') == {'c': ['a', 'b', 'c'], 'v': [4, 2, 4]}
+    table = pipeline.run_steps(source, ["df = df.groupby('c').sum()"], as_table=True)
+    assert table.to_pydict() == {'c': ['a', 'b', 'c'], 'v': [4, 2, 4]}
+
+
+def test_index_carries_to_the_next_step(source):
+    commands = ["df = df.set_index('c')", "df = df.loc[['a']]"]
+    expected = {'c': ['a', 'a'], 'v': [1, 3]}
+    pipeline.checkpoint_cache.clear()
+    assert pipeline.run_steps(source, commands).to_dict('list') == expected
+    # Again from the checkpoint of the first step
+    assert pipeline.run_steps(source, commands[:1] + ["df = df.loc[['a', 'c']]"]).to_dict('list') == \
+        {'c': ['a', 'a', 'c'], 'v': [1, 3, 4]}
+
+
+def test_filtered_rows_get_a_fresh_index(source):
+    result = pipeline.run_steps(source, ["df = df[df['v'] > 2]", "df = df.loc[[0]]"])
+    assert result.to_dict('list') == {'c': ['a'], 'v': [3]}
@@ -0,0 +1,48 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from backend.pipeline import checkpoint_cache, run_steps, scan_plan
+
+# Leading filters and projections pushed into the Parquet scan must give what pandas gives
+COMMANDS = [
+    "df = df[df['amount'] > 10]",
+    "df = df[df.amount <= 50]",
+    "df = df[df.country == 'Norway']",
+    "df = df[(df['amount'] >= 5) & ~df['country'].isin(['Chile'])]",
+    "df = df[df['country'].notna()]",
+    "df = df[['id', 'size']]",
+    "df = df.drop(columns=['country'])",
+    "df = df[df['size'] > 2]",
+    # DataFrame attributes, not columns
+    "df = df[df.index > 2]",
+    "df = df[df['size'] < df.ndim]",
+]
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = str(tmp_path / 'source.parquet')
+    table = pa.table({
+        'id': list(range(20)),
+        'amount': [float(i * 3) if i % 7 else None for i in range(20)],
+        'country': [['Norway', 'Chile', None, 'Peru'][i % 4] for i in range(20)],
+        'size': [i % 5 for i in range(20)],
+    })
+    pq.write_table(table, path, row_group_size=6)
+    return path
+
+
+@pytest.mark.parametrize('command', COMMANDS)
+def test_pushdown_matches_pandas(source, command):
+    checkpoint_cache.clear()
+    local_vars = {'df': pd.read_parquet(source), 'pd': pd}
+    exec(command, {}, local_vars)
+    expected = local_vars['df'].reset_index(drop=True)
+    pd.testing.assert_frame_equal(run_steps(source, [command]), expected)
+
+
+@pytest.mark.parametrize('command', ["df = df[df.size > 2]", "df = df[df.index > 2]", "df = df[df.empty == False]"])
+def test_frame_attributes_are_not_pushed(source, command):
+    assert scan_plan(source, [command]).consumed == 0
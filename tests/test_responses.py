@@ -0,0 +1,13 @@
+import json
+import math
+import pyarrow as pa
+
+from backend.datasets import table_rows
+from backend.responses import json_line, json_rows
+
+
+def test_json_line_writes_null_for_nan():
+    table = pa.table({'a': [1.5, math.nan, math.inf, None], 'b': ['x', 'y', None, 'z']})
+    lines = [json.loads(json_line(row)) for row in table_rows(table)]
+    assert lines == [[1.5, 'x'], [None, 'y'], [None, None], [None, 'z']]
+    assert lines == json.loads(json_rows(table))
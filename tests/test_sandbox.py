@@ -0,0 +1,29 @@
+import pandas as pd
+import pytest
+
+from backend.pipeline import output
+from backend.sandbox import StepSandbox
+
+
+@pytest.fixture(scope='module')
+def sandbox():
+    sandbox = StepSandbox(workers=1)
+    yield sandbox
+    sandbox.shutdown()
+
+
+def test_groupby_keeps_grouping_column(sandbox):
+    df = pd.DataFrame({'c': ['a', 'b', 'a'], 'v': [1, 2, 3]})
+    result = sandbox.run(df, "df = df.groupby('c').sum()")
+    assert output(result).to_dict('list') == {'c': ['a', 'b'], 'v': [4, 2]}
+
+
+def test_index_carries_to_the_next_step(sandbox):
+    df = pd.DataFrame({'c': ['a', 'b', 'a'], 'v': [1, 2, 3]})
+    result = sandbox.run(sandbox.run(df, "df = df.set_index('c')"), "df = df.loc[['a']]")
+    assert output(result).to_dict('list') == {'c': ['a', 'a'], 'v': [1, 3]}
+
+
+def test_filtered_rows_get_a_fresh_index(sandbox):
+    df = pd.DataFrame({'v': [1, 2, 3]})
+    assert sandbox.run(df, "df = df[df['v'] > 1]").index.tolist() == [0, 1]
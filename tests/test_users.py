@@ -0,0 +1,27 @@
+from fastapi.testclient import TestClient
+
+from backend.main import create_app
+
+
+def test_auth_routes_are_served_at_root_and_under_users(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    client = TestClient(create_app())
+    credentials = {'email': 'ada@example.com', 'password': 'secret'}
+    assert client.post('/register', json=credentials).status_code == 200
+    assert client.post('/users/register', json=credentials).status_code == 400
+    for path in ('/login', '/users/login'):
+        response = client.post(path, json=credentials)
+        assert response.status_code == 200
+        client.cookies.set('session_id', response.cookies['session_id'])
+        for check in ('/validate-session', '/users/validate-session'):
+            assert client.get(check).json() == {'email': 'ada@example.com'}
+    assert client.post('/users/login', json=dict(credentials, password='wrong')).status_code == 401
+
+
+def test_user_list_omits_password_hashes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    client = TestClient(create_app())
+    client.post('/register', json={'email': 'grace@example.com', 'password': 'secret'})
+    users = client.get('/users/list').json()
+    assert 'grace@example.com' in str(users)
+    assert 'password' not in str(users)